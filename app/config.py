@@ -12,4 +12,83 @@ ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
 EMAIL_HOST = os.getenv("EMAIL_HOST")
 EMAIL_PORT = os.getenv("EMAIL_PORT")
 EMAIL_USER = os.getenv("EMAIL_USER")
-EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
\ No newline at end of file
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+
+# Number of IDs a worker reserves per round trip to the Counters collection (1 = strictly sequential)
+ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "1"))
+
+# Index bootstrap on startup: "" (create only), "report" (log missing/unused) or "explain" (fail on COLLSCAN)
+INDEX_CHECK_MODE = os.getenv("INDEX_CHECK_MODE", "")
+
+# Seconds the super-admin overview stays cached between Stores writes
+OVERVIEW_CACHE_TTL_SECONDS = float(os.getenv("OVERVIEW_CACHE_TTL_SECONDS", "30"))
+
+# Reorder point for products without their own Inventory.reorder_point (dashboard low-stock counts and alerts)
+LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+
+# Seconds a store's admin dashboard stays cached between inventory writes
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "60"))
+# Seconds after a store write during which its dashboard is served uncached (a secondary may not have the write yet)
+DASHBOARD_SETTLE_SECONDS = float(os.getenv("DASHBOARD_SETTLE_SECONDS", "5"))
+
+# Rows per ordered bulk_write when importing inventory files
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+# bcrypt cost for new hashes; existing hashes with a different cost are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Password hashes allowed to run at once (thread pool size); further calls wait in the event loop
+PASSWORD_HASH_CONCURRENCY = int(os.getenv("PASSWORD_HASH_CONCURRENCY", "4"))
+
+# Verified JWT payloads kept in memory (entries never outlive the token's exp)
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+# Outbound email: "smtp" (EMAIL_HOST) or "memory" (keeps messages in-process, for tests)
+EMAIL_BACKEND = os.getenv("EMAIL_BACKEND", "smtp")
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "5"))
+EMAIL_RETRY_BASE_SECONDS = float(os.getenv("EMAIL_RETRY_BASE_SECONDS", "30"))
+EMAIL_POLL_SECONDS = float(os.getenv("EMAIL_POLL_SECONDS", "5"))
+EMAIL_IDLE_NOOP_SECONDS = float(os.getenv("EMAIL_IDLE_NOOP_SECONDS", "60"))
+
+# Broadcasts to more recipients than this store the message once and one read-state row per recipient
+NOTIFICATION_FANOUT_THRESHOLD = int(os.getenv("NOTIFICATION_FANOUT_THRESHOLD", "500"))
+# Seconds before a user's unread counter is recounted on its next read, correcting any drift either way
+UNREAD_COUNTER_RESEED_SECONDS = int(os.getenv("UNREAD_COUNTER_RESEED_SECONDS", "3600"))
+
+# Seconds between SSE keep-alive comments on idle notification streams
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT_SECONDS", "15"))
+
+# List endpoints return everything unless paged: rows per page when ?cursor= comes without ?limit=, and the largest ?limit=
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "500"))
+
+# Motor connection pool, per uvicorn worker (size it from /api/super_admin/metrics/db-pool)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+# Idle pooled connections are closed after this many ms (0 keeps them forever)
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+# Wire compression, in order of preference; zstd/snappy need the zstandard/python-snappy packages
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+
+# Reads in the "analytics" consistency class (dashboards, exports, reports); writes always use the primary
+ANALYTICS_READ_PREFERENCE = os.getenv("ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+# Secondaries lagging more than this are skipped (minimum 90; 0 disables the bound)
+ANALYTICS_MAX_STALENESS_SECONDS = int(os.getenv("ANALYTICS_MAX_STALENESS_SECONDS", "120"))
+
+# User/store profiles cached per worker; entries older than the revalidate window are checked against profile_version
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "300"))
+PROFILE_CACHE_REVALIDATE_SECONDS = float(os.getenv("PROFILE_CACHE_REVALIDATE_SECONDS", "5"))
+
+# Seconds the in-memory category catalog is trusted when change streams are unavailable
+CATEGORY_CATALOG_TTL_SECONDS = float(os.getenv("CATEGORY_CATALOG_TTL_SECONDS", "60"))
+
+# Draft a RequestedOrders row (status "draft") whenever a product drops below its reorder point
+LOW_STOCK_AUTO_REQUEST = os.getenv("LOW_STOCK_AUTO_REQUEST", "false").lower() in ("1", "true", "yes")
+
+# Idempotency-Key records: replayable for this long, and a crashed request's key is reclaimed after the lock window
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
@@ -1,6 +1,263 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-from app.config import DATABASE_NAME, MONGO_URI
+import importlib.util
+import os
+import threading
+from collections import defaultdict
+from typing import List, Optional
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DATABASE_NAME]  # MentAI Cluster/Database
- 
\ No newline at end of file
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.read_preferences import Primary, make_read_preference, read_pref_mode_from_name
+
+from app.config import (
+    DATABASE_NAME,
+    MONGO_URI,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_COMPRESSORS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    ANALYTICS_READ_PREFERENCE,
+    ANALYTICS_MAX_STALENESS_SECONDS,
+)
+
+
+# ───────────────────────── POOL METRICS
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Per-server CMAP counters for this worker's pool.
+
+    Events are published from the driver's threads, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers = defaultdict(lambda: {
+            "open": 0,
+            "checked_out": 0,
+            "max_checked_out": 0,
+            "created": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "checkout_failures": 0,
+            "checkout_wait_ms_total": 0.0,
+            "checkout_wait_ms_max": 0.0,
+            "pool_cleared": 0,
+        })
+
+    def _server(self, event) -> dict:
+        host, port = event.address
+        return self._servers[f"{host}:{port}"]
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._server(event)["pool_cleared"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            stats = self._server(event)
+            stats["created"] += 1
+            stats["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            stats = self._server(event)
+            stats["closed"] += 1
+            stats["open"] -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._server(event)["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        # duration (seconds) is only reported by newer drivers
+        wait_ms = (getattr(event, "duration", None) or 0) * 1000
+        with self._lock:
+            stats = self._server(event)
+            stats["checkouts"] += 1
+            stats["checked_out"] += 1
+            stats["max_checked_out"] = max(stats["max_checked_out"], stats["checked_out"])
+            stats["checkout_wait_ms_total"] += wait_ms
+            stats["checkout_wait_ms_max"] = max(stats["checkout_wait_ms_max"], wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._server(event)["checked_out"] -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            servers = {}
+            for address, stats in self._servers.items():
+                servers[address] = dict(stats)
+                servers[address]["checkout_wait_ms_avg"] = round(
+                    stats["checkout_wait_ms_total"] / stats["checkouts"], 3
+                ) if stats["checkouts"] else 0.0
+        return servers
+
+
+pool_stats = PoolStatsListener()
+
+
+# ───────────────────────── CLIENT LIFECYCLE
+_client: Optional[AsyncIOMotorClient] = None
+
+# Optional libraries behind each wire compressor; zlib ships with Python
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy"}
+
+
+def _available_compressors(names: str) -> List[str]:
+    wanted = [name.strip() for name in names.split(",") if name.strip()]
+    return [
+        name for name in wanted
+        if name not in _COMPRESSOR_MODULES or importlib.util.find_spec(_COMPRESSOR_MODULES[name])
+    ]
+
+
+def _client_options() -> dict:
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "event_listeners": [pool_stats],
+    }
+    if MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+    compressors = _available_compressors(MONGO_COMPRESSORS)
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
+
+
+def get_client() -> AsyncIOMotorClient:
+    # Created on first use, normally from the app lifespan; CLI scripts get one on demand
+    global _client
+    if _client is None:
+        _client = AsyncIOMotorClient(MONGO_URI, **_client_options())
+    return _client
+
+
+def connect_db() -> AsyncIOMotorClient:
+    return get_client()
+
+
+def close_db():
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+# ───────────────────────── CONSISTENCY CLASSES
+# STRONG: writes and read-your-writes flows, always served by the primary.
+# ANALYTICS: dashboards, exports and reports; may lag the primary by up to
+# ANALYTICS_MAX_STALENESS_SECONDS and falls back to the primary when no secondary is fresh enough.
+STRONG = "strong"
+ANALYTICS = "analytics"
+
+
+def _analytics_read_preference():
+    mode = read_pref_mode_from_name(ANALYTICS_READ_PREFERENCE)
+    if mode == Primary.mode:
+        return Primary()
+    # The server rejects bounds under 90s; <= 0 means no bound
+    max_staleness = ANALYTICS_MAX_STALENESS_SECONDS if ANALYTICS_MAX_STALENESS_SECONDS > 0 else -1
+    return make_read_preference(mode, None, max_staleness)
+
+
+_READ_PREFERENCES = {
+    STRONG: Primary(),
+    ANALYTICS: _analytics_read_preference(),
+}
+
+
+def get_database(consistency: str = STRONG):
+    client = get_client()
+    if consistency == STRONG:
+        return client[DATABASE_NAME]
+    return client.get_database(DATABASE_NAME, read_preference=_READ_PREFERENCES[consistency])
+
+
+def get_pool_stats() -> dict:
+    return {
+        "pid": os.getpid(),
+        "connected": _client is not None,
+        "max_pool_size": MONGO_MAX_POOL_SIZE,
+        "min_pool_size": MONGO_MIN_POOL_SIZE,
+        "compressors": _available_compressors(MONGO_COMPRESSORS),
+        "servers": pool_stats.snapshot(),
+    }
+
+
+# ───────────────────────── LAZY HANDLES
+class _CollectionProxy:
+    """Stands in for a collection until the client exists.
+
+    Modules keep `outbox_collection = db.EmailOutbox` at import time; every
+    attribute access resolves against the current client.
+    """
+
+    def __init__(self, database: "_DatabaseProxy", name: str):
+        self._database = database
+        self._name = name
+
+    def _resolve(self):
+        return self._database._resolve()[self._name]
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __getitem__(self, name):
+        return _CollectionProxy(self._database, f"{self._name}.{name}")
+
+    def __repr__(self):
+        return f"<collection proxy {self._name}>"
+
+
+class _DatabaseProxy:
+    def __init__(self, consistency: str = STRONG):
+        self._consistency = consistency
+
+    def _resolve(self):
+        return get_database(self._consistency)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        # Database methods/properties (command, client, ...) pass through; any other name is a collection
+        if hasattr(AsyncIOMotorDatabase, name):
+            return getattr(self._resolve(), name)
+        return _CollectionProxy(self, name)
+
+    def __getitem__(self, name):
+        return _CollectionProxy(self, name)
+
+    def __repr__(self):
+        return f"<database proxy {DATABASE_NAME}>"
+
+
+db = _DatabaseProxy(STRONG)  # MentAI Cluster/Database
+
+_databases = {STRONG: db, ANALYTICS: _DatabaseProxy(ANALYTICS)}
+
+
+def db_for(consistency: str) -> _DatabaseProxy:
+    # Services declare the consistency their reads need; `db` is db_for(STRONG)
+    try:
+        return _databases[consistency]
+    except KeyError:
+        raise ValueError(f"Unknown consistency class '{consistency}'")
@@ -1,11 +1,39 @@
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, APIRouter
 from app.middlewares.jwt_middleware import JWTAuthMiddleware
 from app.routes import admin_routes, auth_routes, sales_routes, super_admin_routes, procurement_routes
 from fastapi.middleware.cors import CORSMiddleware
 from app.utils.auth import decode_token
- 
-app = FastAPI(title="Optiven Backend")
+from app.utils.indexes import bootstrap_indexes
+from app.utils.email_outbox import email_dispatcher
+from app.services.notification_stream import notification_broker
+from app.services.category_catalog import category_catalog
+from app.services.low_stock_engine import low_stock_engine
+from app.config import INDEX_CHECK_MODE
+from app.db import connect_db, close_db
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One Motor client (and pool) per uvicorn worker, created on the worker's event loop
+    connect_db()
+    await bootstrap_indexes(INDEX_CHECK_MODE)
+    email_dispatcher.start()
+    notification_broker.start()
+    category_catalog.start()
+    low_stock_engine.start()
+    try:
+        yield
+    finally:
+        await low_stock_engine.stop()
+        await category_catalog.stop()
+        await notification_broker.stop()
+        await email_dispatcher.stop()
+        close_db()
+
+
+app = FastAPI(title="Optiven Backend", lifespan=lifespan)
 router = APIRouter()
 
 # Include routes
@@ -28,12 +56,12 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
     allow_credentials=True,
+    expose_headers=["X-Next-Cursor", "Idempotent-Replayed"],
 )
 
 app.add_middleware(JWTAuthMiddleware)
 
 
-
 @app.api_route("/", methods=["GET", "HEAD"])
 def root():
     return {"message": "Welcome to Optiven Backend"}
@@ -1,34 +1,84 @@
+import hashlib
+import re
+import time
+from typing import Optional
+from urllib.parse import parse_qs
 
-from fastapi import Request, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL_SECONDS
 from app.utils.auth import decode_token
- 
-class JWTAuthMiddleware(BaseHTTPMiddleware):    
-    async def dispatch(self, request: Request, call_next):
-        
-        
-        if request.method == "OPTIONS":
-            return await call_next(request)
-        # Define routes to bypass the middleware
-        bypass_routes = ["/","/docs", "/openapi.json", "/redoc"]
-    
-        # Bypass routes if the path matches an exact route or contains "system"
-        if request.url.path in bypass_routes or "/register" in request.url.path or "/login" in request.url.path:
-            return await call_next(request)
- 
-        # Check for the Authorization header
-        token = request.headers.get("Authorization")
-
-        if not token or not token.startswith("Bearer "):
-            raise HTTPException(status_code=401, detail="Token missing or invalid.")
- 
+from app.utils.cache import TTLCache
+
+# Routes that skip authentication: the docs pages exactly, and any login/register path segment
+BYPASS_ROUTES = re.compile(r"^(?:/|/docs|/openapi\.json|/redoc)$|(?:^|/)(?:login|register)(?:/|$)")
+
+# Server-sent event streams: browsers' EventSource can't set headers, so ?token= is accepted here only
+QUERY_TOKEN_ROUTES = re.compile(r"^/api/admin/notifications/stream$")
+
+# sha256(token) -> verified payload; raw tokens are never kept in memory
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+
+def _unauthorized(detail: str) -> JSONResponse:
+    return JSONResponse({"detail": detail}, status_code=401)
+
+
+def _bearer_token(scope: Scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            header = value.decode("latin-1")
+            if header.startswith("Bearer "):
+                return header.split(" ")[1]
+            return None
+
+    if QUERY_TOKEN_ROUTES.match(scope["path"]):
+        tokens = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("token")
+        return tokens[0] if tokens else None
+    return None
+
+
+def verify_token_cached(token: str) -> Optional[dict]:
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _token_cache.get(key)
+    if payload is None:
         try:
-            # Extract and verify the token
-            token = token.split(" ")[1]
             payload = decode_token(token)
-            request.state.user = payload  # Attach user data to request state
-            
         except Exception:
-            raise HTTPException(status_code=401, detail="Invalid or expired token.")
- 
-        return await call_next(request)
+            return None
+
+        ttl = TOKEN_CACHE_TTL_SECONDS
+        if isinstance(payload.get("exp"), (int, float)):
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            _token_cache.set(key, payload, ttl=ttl)
+
+    # Handlers get their own copy so they can't alter the cached payload
+    return dict(payload)
+
+
+class JWTAuthMiddleware:
+    """Pure ASGI auth layer: no per-request task or body copy, so streaming responses pass straight through."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or BYPASS_ROUTES.search(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = _bearer_token(scope)
+        if not token:
+            await _unauthorized("Token missing or invalid.")(scope, receive, send)
+            return
+
+        payload = verify_token_cached(token)
+        if payload is None:
+            await _unauthorized("Invalid or expired token.")(scope, receive, send)
+            return
+
+        # Read back by routes as request.state.user
+        scope.setdefault("state", {})["user"] = payload
+        await self.app(scope, receive, send)
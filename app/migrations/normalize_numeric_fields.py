@@ -0,0 +1,82 @@
+import asyncio
+import sys
+from typing import Dict
+
+from pymongo import UpdateOne
+
+from app.db import db
+from app.utils.numeric_fields import NUMERIC_FIELDS, parse_number
+
+BATCH_SIZE = 500
+MAX_REPORTED_ROWS = 100
+
+
+async def normalize_collection(collection_name: str, batch_size: int = BATCH_SIZE, dry_run: bool = False) -> Dict:
+    # Streams the rows that still hold a numeric field as a string and rewrites them in batches.
+    # Each update is guarded by the value it read, so the migration is safe to run while the app is live
+    # and a re-run only touches what is left.
+    fields = NUMERIC_FIELDS[collection_name]
+    collection = db[collection_name]
+    report = {"scanned": 0, "converted": 0, "unparseable": 0, "unparseable_rows": []}
+
+    cursor = collection.find(
+        {"$or": [{field: {"$type": "string"}} for field in fields]},
+        {field: 1 for field in fields},
+        batch_size=batch_size,
+    )
+
+    operations = []
+    async for doc in cursor:
+        report["scanned"] += 1
+        update = {}
+        for field, kind in fields.items():
+            value = doc.get(field)
+            if not isinstance(value, str):
+                continue
+            number = parse_number(value, kind)
+            if number is None:
+                # Left as is; these need a human decision
+                report["unparseable"] += 1
+                if len(report["unparseable_rows"]) < MAX_REPORTED_ROWS:
+                    report["unparseable_rows"].append({"_id": str(doc["_id"]), "field": field, "value": value})
+                continue
+            update[field] = number
+
+        if update:
+            guard = {"_id": doc["_id"], **{field: doc[field] for field in update}}
+            operations.append(UpdateOne(guard, {"$set": update}))
+
+        if len(operations) >= batch_size:
+            report["converted"] += await _flush(collection, operations, dry_run)
+            operations = []
+
+    if operations:
+        report["converted"] += await _flush(collection, operations, dry_run)
+    return report
+
+
+async def _flush(collection, operations: list, dry_run: bool) -> int:
+    if dry_run:
+        return len(operations)
+    result = await collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+async def normalize_numeric_fields(batch_size: int = BATCH_SIZE, dry_run: bool = False) -> Dict[str, Dict]:
+    return {
+        collection_name: await normalize_collection(collection_name, batch_size, dry_run)
+        for collection_name in NUMERIC_FIELDS
+    }
+
+
+# python -m app.migrations.normalize_numeric_fields [--dry-run]
+if __name__ == "__main__":
+    async def _main(dry_run):
+        for collection_name, report in (await normalize_numeric_fields(dry_run=dry_run)).items():
+            print(f"{collection_name}: scanned {report['scanned']}, "
+                  f"{'would convert' if dry_run else 'converted'} {report['converted']}, "
+                  f"unparseable {report['unparseable']}")
+            for row in report["unparseable_rows"]:
+                print(f"  {row['_id']} {row['field']}={row['value']!r}")
+
+    asyncio.run(_main("--dry-run" in sys.argv[1:]))
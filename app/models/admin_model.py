@@ -14,7 +14,7 @@ class Product(BaseModel):
     consumer_return_conditions: Optional[List[str]] = Field(default_factory=list)
     is_seller_returnable: Optional[bool] = False
     seller_return_conditions: Optional[List[str]] = Field(default_factory=list)
-    unit_price: Optional[str] = "0"
+    unit_price: Optional[float] = 0.0
     unit: Optional[str] = None
     quantity: Optional[int] = 0
     category: Optional[str] = None
@@ -25,6 +25,9 @@ class Product(BaseModel):
     warranty_tenure: Optional[int] = 0
     warranty_unit: Optional[str] = ""
     last_updated: Optional[datetime] = Field(default_factory=datetime.utcnow)
+    # Low stock alerts fire below this quantity (LOW_STOCK_THRESHOLD when unset)
+    reorder_point: Optional[int] = None
+    reorder_quantity: Optional[int] = None
     status: Optional[str] = None
 
 
@@ -36,17 +39,19 @@ class ProductUpdate(BaseModel):  # <- now this is importable
     consumer_return_conditions: Optional[List[str]] = None
     is_seller_returnable: Optional[bool] = None
     seller_return_conditions: Optional[List[str]] = None
-    unit_price: Optional[str] = None
+    unit_price: Optional[float] = None
     unit: Optional[str] = None
     quantity: Optional[int] = None
     category: Optional[str] = None
     sub_category: Optional[str] = None
     tags: Optional[List[str]] = None
-    tax: Optional[int] = None
+    tax: Optional[float] = None
     has_warranty: Optional[bool] = None
     warranty_tenure: Optional[int] = None
     warranty_unit: Optional[str] = None
     last_updated: Optional[str] = None
+    reorder_point: Optional[int] = None
+    reorder_quantity: Optional[int] = None
     status: Optional[str] = None
 
    
@@ -239,7 +239,7 @@ class Product(BaseModel):
     consumer_return_conditions: List[str]
     is_seller_returnable: bool
     seller_return_conditions: List[str]
-    unit_price: str
+    unit_price: float
     unit: str
     quantity: int
     category: str
@@ -250,6 +250,8 @@ class Product(BaseModel):
     warranty_tenure: int
     warranty_unit: str
     last_updated: str
+    reorder_point: Optional[int] = None
+    reorder_quantity: Optional[int] = None
     status: Optional[str] = None    
 
 
@@ -11,8 +11,8 @@ class Product(BaseModel):
     consumer_return_conditions: List[str]
     is_seller_returnable: bool
     seller_return_conditions: List[str]
-    unit_price: str
-    quantity: str
+    unit_price: float
+    quantity: int
     category: str
     sub_category: str
     tags: List[str]
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Body, HTTPException, Query, Request
+from fastapi import APIRouter, Body, Depends, File, HTTPException, Query, Request, UploadFile
 
 # from app.models.super_admin_models import HTTPException, Request, Query, Body
 from app.models.admin_login_model import LoginModel
@@ -11,7 +11,8 @@ from bson import ObjectId
 import os
 from app.models.admin_model import DepartmentUserCreate, EditOrderModel, LoginModel, NewRaiseOrderRequest, Product, RaiseRequestOrderModel, ResetPasswordRequest, SalesOrderModel ,ProductUpdate
 from app.services import notification_service
-from app.services.admin_inventory_service import delete_product_service, update_product_by_id, export_inventory_csv, get_product_by_id, get_all_products, add_product_service 
+from app.utils.idempotency import idempotent
+from app.services.admin_inventory_service import delete_product_service, update_product_by_id, export_inventory_csv, get_product_by_id, get_all_products, add_product_service, import_inventory
 from app.services.admin_lossOrders_service import export_loss_orders_csv, get_all_loss_orders_with_metrics 
 from app.services.admin_receivedOrders_service import delete_order_by_id, get_all_sales_orders, update_sales_order
 from app.services.admin_requested_order_service import get_all_requested_orders, raise_order_request_service, raise_request_order_service
@@ -24,6 +25,8 @@ from app.models.notification_model import NotificationUpdate, NotificationBase
 from app.services.notification_service import (
     create_notification,   
     get_all_notifications,
+    get_notification_inbox,
+    get_unread_count,
     update_notification_by_id,
     delete_notification_by_id
 )
@@ -31,6 +34,7 @@ from app.services.notification_service import (
 # Importing the admin setup model and service
 from app.models.admin_setting_model import AdminSetupSettingRequest
 from app.services.admin_setting_service import update_admin_setting, get_admin_setting
+from app.utils.pagination import Page
 
 # Importing the category model and service
 from app.models.category_model import CategoryCreate, CategoryUpdate
@@ -50,6 +54,9 @@ from app.models.store_model import StoreUpdate, StaffInput
 from app.services.store_service import update_store_by_token, add_staff_to_department, update_staff_in_department, delete_staff_from_department
 from app.services.dashboard_service import get_dashboard_data
 from app.models.dashboard_model import DashboardResponse
+from app.utils.export_stream import DEFAULT_BATCH_SIZE
+from app.services.notification_stream import notification_events
+from fastapi.responses import StreamingResponse
 router = APIRouter()
 
 # ================== ROOT ==================
@@ -59,7 +66,13 @@ def root():
 
 # ================== Dashboard ==================
 @router.get("/dashboard")
-async def fetch_dashboard_data(request: Request):
+async def fetch_dashboard_data(
+    request: Request,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=200),
+    top_n: int = Query(5, ge=1, le=50),
+    loss_limit: int = Query(20, ge=1, le=200)
+):
     # You can now access role like this:
     user = request.state.user
     role = user.get("role")
@@ -68,7 +81,11 @@ async def fetch_dashboard_data(request: Request):
     if role != "admin":
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    data = await get_dashboard_data()
+    store_id = user.get("store_id")
+    if not store_id:
+        raise HTTPException(status_code=400, detail="Missing store_id in token")
+
+    data = await get_dashboard_data(store_id, page, page_size, top_n, loss_limit)
     return data
 
 
@@ -121,6 +138,32 @@ async def get_notifications(request: Request, status: Optional[int] = None):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+@router.get("/notifications/inbox")
+async def get_notifications_inbox(
+    request: Request,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    status: Optional[int] = None
+):
+    user = request.state.user
+    return await get_notification_inbox(user, limit, cursor, status)
+
+@router.get("/notifications/stream")
+async def stream_notifications(request: Request):
+    # Server-sent events: one "notification" event per new row for this user, replacing polling.
+    # EventSource can't send headers, so this path also accepts ?token=<jwt>
+    user = request.state.user
+    return StreamingResponse(
+        notification_events(request, user, request.headers.get("Last-Event-ID")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/notifications/unread-count")
+async def get_notifications_unread_count(request: Request):
+    user = request.state.user
+    return {"unread": await get_unread_count(user)}
+
 # update the notifaction like read or delete
 @router.patch("/notifications/{notification_id}")
 async def update_notification(request: Request, notification_id: str, update_data: NotificationUpdate):
@@ -247,7 +290,7 @@ async def add_product(request: Request, product: Product):
 
    
 @router.get("/all/product")
-async def fetch_all_products_route(request: Request):
+async def fetch_all_products_route(request: Request, page: Page = Depends()):
     # Role check
     user = request.state.user
     if not user or user.get("role") not in ["admin","procurement"]:
@@ -256,7 +299,7 @@ async def fetch_all_products_route(request: Request):
     store_id = user.get("store_id")
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID missing in token.")
-    response = await get_all_products(store_id)
+    response = await get_all_products(store_id, page)
     print("Fetched products:", response)
     return response
 
@@ -315,8 +358,13 @@ async def delete_product(request: Request, product_id: str):
 
 
 #export My Inventory sheet csv file
-@router.get("/export_inventory", summary="Export My Inventory as CSV")
-async def export_inventory(request: Request):
+@router.get("/export_inventory", summary="Export My Inventory as CSV, NDJSON or Parquet")
+async def export_inventory(
+    request: Request,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    compression: Optional[str] = Query(None, pattern="^gzip$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000)
+):
     try:
         user = request.state.user
         store_id = user.get("store_id")
@@ -325,15 +373,41 @@ async def export_inventory(request: Request):
         if not store_id or not org_id:
             raise HTTPException(status_code=400, detail="Missing store_id or org_id in token")
 
-        return await export_inventory_csv(store_id, org_id)
+        return await export_inventory_csv(store_id, org_id, fmt, compression, batch_size)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
 
+#import My Inventory sheet (csv / ndjson)
+@router.post("/import_inventory", summary="Import Inventory from CSV or NDJSON")
+async def import_inventory_route(
+    request: Request,
+    file: UploadFile = File(...),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(csv|ndjson)$")
+):
+    user = request.state.user
+    if user.get("role") not in ["admin", "procurement"]:
+        raise HTTPException(status_code=403, detail="Forbidden: Admin access required.")
+
+    store_id = user.get("store_id")
+    org_id = user.get("org_id")
+    if not store_id or not org_id:
+        raise HTTPException(status_code=400, detail="Missing store_id or org_id in token")
+
+    return await import_inventory(file, store_id, org_id, fmt)
+
+
 #export loss sheet csv file
-@router.get("/export_lossSheet", summary="Export Loss Orders as CSV")
-async def export_loss_orders(request: Request):
+@router.get("/export_lossSheet", summary="Export Loss Orders as CSV, NDJSON or Parquet")
+async def export_loss_orders(
+    request: Request,
+    fmt: str = Query("csv", alias="format", pattern="^(csv|ndjson|parquet)$"),
+    compression: Optional[str] = Query(None, pattern="^gzip$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=10000)
+):
     try:
         user = request.state.user
         store_id = user.get("store_id")
@@ -342,8 +416,10 @@ async def export_loss_orders(request: Request):
         if not store_id or not org_id:
             raise HTTPException(status_code=400, detail="Missing store_id or org_id in token")
 
-        return await export_loss_orders_csv(store_id, org_id)
+        return await export_loss_orders_csv(store_id, org_id, fmt, compression, batch_size)
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))    
 
@@ -371,17 +447,17 @@ async def fetch_loss_orders_and_metrics(
 
 
 @router.get("/requested-orders")
-async def get_orders(request: Request): # type: ignore
+async def get_orders(request: Request, page: Page = Depends()): # type: ignore
     user = request.state.user
 
     if user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Only admins are allowed.")
     storeId = user.get("store_id")
-    return await get_all_requested_orders(storeId)
+    return await get_all_requested_orders(storeId, page)
 
 
 @router.get("/orders/sold")
-async def get_sold_orders_admin(request: Request):
+async def get_sold_orders_admin(request: Request, page: Page = Depends()):
     user = request.state.user
     print("User in route:", user)
     if not user or user.get("role") != "admin":
@@ -389,7 +465,7 @@ async def get_sold_orders_admin(request: Request):
     store_id = user.get("store_id")
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID missing in token.")
-    orders = await get_all_sold_orders(store_id)
+    orders = await get_all_sold_orders(store_id, page)
 
     return {"orders": orders}
 
@@ -453,8 +529,8 @@ async def raise_order_request_api(data: NewRaiseOrderRequest, request: Request):
         "id": user.get("user_id", "unknown")
     }
 
-    response = await raise_order_request_service(data.dict(), org_id, store_id, requested_by)
-    return response
+    return await idempotent(request, "admin.orders.raise_request", data,
+                            lambda: raise_order_request_service(data.dict(), org_id, store_id, requested_by))
 
 @router.post("/orders/received/add")
 async def add_order(order: SalesOrderModel, request: Request):
@@ -471,8 +547,11 @@ async def add_order(order: SalesOrderModel, request: Request):
     order_dict.pop("order_id", None)
     order_dict["store_id"] = store_id
 
-    inserted_order_id = await add_sales_order(order_dict, store_id)
-    return {"message": "Order added successfully", "order_id": inserted_order_id}
+    async def create():
+        inserted_order_id = await add_sales_order(order_dict, store_id)
+        return {"message": "Order added successfully", "order_id": inserted_order_id}
+
+    return await idempotent(request, "admin.orders.add", order_dict, create)
 
 
 
@@ -542,13 +621,13 @@ async def reset_password_route(payload: ResetPasswordRequest):
 
 # sold orders
 @router.get("/orders/sold") 
-async def get_sold_orders(request: Request):
+async def get_sold_orders(request: Request, page: Page = Depends()):
     user = request.state.user
     if not user or user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Forbidden: Sales access required.")
     store_id = user.get("store_id")
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID missing in token.")
-    orders = await get_all_sold_orders(store_id)
+    orders = await get_all_sold_orders(store_id, page)
 
     return {"orders": orders}
\ No newline at end of file
@@ -1,5 +1,7 @@
 import logging
-from fastapi import APIRouter, HTTPException, Path, Request, Body
+from fastapi import APIRouter, Depends, HTTPException, Path, Request, Body
+from app.utils.idempotency import idempotent
+from app.utils.pagination import Page
 from typing import Dict
 
 from jose import JWTError
@@ -47,13 +49,13 @@ def root():
 
 #RequestedOrders
 @router.get("/requested-orders")
-async def get_orders(request: Request):
+async def get_orders(request: Request, page: Page = Depends()):
     user = request.state.user
 
     if user.get("role") != "procurement":
         raise HTTPException(status_code=403, detail="Only procurement users are allowed.")
     storeId = user.get("store_id")
-    return await procurement_requestedOrder_service.get_all_requested_orders(storeId)
+    return await procurement_requestedOrder_service.get_all_requested_orders(storeId, page)
 
 
 # Add contract route
@@ -65,7 +67,11 @@ async def add_contract_route(contract: Contract, request: Request):
             raise HTTPException(status_code=403, detail="Only procurement users are allowed.")
 
         store_id = user.get("store_id")
-        return await add_contract(contract, store_id)
+        return await idempotent(request, "procurement.contracts.add", contract,
+                                lambda: add_contract(contract, store_id))
+
+    except HTTPException:
+        raise
 
     except ValidationError as e:
         logging.error("Validation error in route: %s", e.json())
@@ -139,13 +145,13 @@ async def get_contract_by_id_route(
 
 #ReturnToVendor List
 @router.get("/returnToVendor-list")
-async def get_return_list(request: Request):
+async def get_return_list(request: Request, page: Page = Depends()):
     user = request.state.user
     if user.get("role") != "procurement":
         raise HTTPException(status_code=403, detail="Only procurement users are allowed.")
 
     store_id = user.get("store_id")
-    return await procurement_return_services.get_all_returns(store_id)
+    return await procurement_return_services.get_all_returns(store_id, page)
 
 
 #ReturnToVendor Details
@@ -161,13 +167,13 @@ async def get_return_detail_by_id(request: Request, return_id: str):
 
 #List of Purchase Orders
 @router.get("/purchase-orders")
-async def get_purchase_orders(request: Request):
+async def get_purchase_orders(request: Request, page: Page = Depends()):
     user = request.state.user
     if user.get("role") != "procurement":
         raise HTTPException(status_code=403, detail="Only procurement users are allowed.")
 
     store_id = user.get("store_id")
-    return await procurement_purchase_services.get_all_purchase_orders(store_id)
+    return await procurement_purchase_services.get_all_purchase_orders(store_id, page)
 
 
 #Veiw the details of purchase order
@@ -232,7 +238,7 @@ async def validate_return_order_route(
 
 #List of loss orders 
 @router.get("/loss-orders")
-async def get_loss_orders(request: Request):
+async def get_loss_orders(request: Request, page: Page = Depends()):
     user = request.state.user
 
     if not user or "store_id" not in user:
@@ -243,7 +249,7 @@ async def get_loss_orders(request: Request):
 
     store_id = user["store_id"]
 
-    return await procurement_loss_services.get_loss_orders_by_store(store_id)
+    return await procurement_loss_services.get_loss_orders_by_store(store_id, page)
 
 
 #Veiw loss  orders details by product_id
@@ -273,7 +279,7 @@ async def add_product(request: Request, product: Product):
     return {"message": "Product added successfully", "id": inserted_id}
 
 @router.get("/all")
-async def fetch_all_products_route(request: Request):
+async def fetch_all_products_route(request: Request, page: Page = Depends()):
     # Role check
     user = request.state.user
     if not user or user.get("role") not in ["admin", "procurement"]:
@@ -282,7 +288,7 @@ async def fetch_all_products_route(request: Request):
     store_id = user.get("store_id")
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID missing in token.")
-    response = await get_all_products(store_id)
+    response = await get_all_products(store_id, page)
     print("Fetched products:", response)
     return response
 
@@ -1,4 +1,6 @@
-from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from app.utils.idempotency import idempotent
+from app.utils.pagination import Page
 from app.models.sales_model import EditOrderModel, ProductDetails, ReturnOrderRequest, ReturnedOrderModel, SalesOrderDetails, SalesOrderModel, LoginModel, RequestOrderModel, SendToProcurement
 from app.services import sales_get_update_services
 from typing import Any, Optional
@@ -25,14 +27,14 @@ async def get_orders(request: Request):
     return {"orders": orders}
 
 @router.get("/orders/sold") 
-async def get_sold_orders(request: Request):
+async def get_sold_orders(request: Request, page: Page = Depends()):
     user = request.state.user
     if not user or user.get("role") not in ["admin", "sales"]:
         raise HTTPException(status_code=403, detail="Forbidden: Sales access required.")
     store_id = user.get("store_id")
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID missing in token.")
-    orders = await sales_get_update_services.get_all_sold_orders(store_id)
+    orders = await sales_get_update_services.get_all_sold_orders(store_id, page)
 
     return {"orders": orders}
 
@@ -52,8 +54,11 @@ async def add_order(order: SalesOrderModel, request: Request):
     order_dict.pop("order_id", None)
     order_dict["store_id"] = store_id
 
-    inserted_order_id = await sales_add_raise_services.add_sales_order(order_dict, store_id)
-    return {"message": "Order added successfully", "order_id": inserted_order_id}
+    async def create():
+        inserted_order_id = await sales_add_raise_services.add_sales_order(order_dict, store_id)
+        return {"message": "Order added successfully", "order_id": inserted_order_id}
+
+    return await idempotent(request, "sales.orders.add", order_dict, create)
 
 #successfully login notification
 @router.post("/auth/login") 
@@ -144,7 +149,7 @@ async def get_sold_order_by_id(order_id: str, request: Request):
 
 
 @router.get("/all") 
-async def fetch_all_products_route(request: Request):
+async def fetch_all_products_route(request: Request, page: Page = Depends()):
     user = request.state.user
 
     if not user or user.get("role") != "sales":
@@ -154,7 +159,7 @@ async def fetch_all_products_route(request: Request):
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID missing in token.")
 
-    response = await sales_get_update_services.get_all_products(store_id)
+    response = await sales_get_update_services.get_all_products(store_id, page)
     print("Fetched products:", response)
     return {"products": response}
 
@@ -198,10 +203,11 @@ async def create_return_order(data: ReturnOrderRequest, request: Request):
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID not found in token")
 
-    return await sales_add_raise_services.add_return(data, store_id)
+    return await idempotent(request, "sales.returns.add", data,
+                            lambda: sales_add_raise_services.add_return(data, store_id))
 
 @router.get("/orders/returns", tags=["Sales"]) 
-async def get_all_return_orders(request: Request):
+async def get_all_return_orders(request: Request, page: Page = Depends()):
     user = request.state.user
     if not user or user.get("role") != "sales":
         raise HTTPException(status_code=403, detail="Forbidden: Sales access required.")
@@ -209,7 +215,7 @@ async def get_all_return_orders(request: Request):
     store_id = user.get("store_id")
     if not store_id:
         raise HTTPException(status_code=400, detail="Store ID not found in token")
-    returns = await sales_get_update_services.get_all_returns(store_id=store_id)
+    returns = await sales_get_update_services.get_all_returns(store_id=store_id, page=page)
     return {"returns": returns}
 
 # GET /orders/returns/{return_id} -> View More popup
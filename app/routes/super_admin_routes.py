@@ -1,5 +1,6 @@
 from typing import List
-from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.utils.pagination import Page
 
 from app.models.super_admin_models import (
     SignupModel, LoginModel, StoreIdsModel, StoreUpdate, UpdateProfileModel, ChangePasswordModel,
@@ -10,6 +11,8 @@ from app.models.super_admin_models import (
 )
 from app.services import super_admin_service as svc
 from app.services.super_admin_dashboard import get_dashboard_overview
+from app.utils.auth import get_hash_metrics
+from app.db import get_pool_stats
 
 router = APIRouter()
 
@@ -104,13 +107,29 @@ async def dashboard_overview(request: Request):
         print(f"[DASHBOARD ERROR] {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate dashboard data: {str(e)}")
 
+@router.get("/metrics/password-hashing")
+async def password_hashing_metrics(request: Request):
+    # Per-worker counters: hash latency and how many logins are waiting for a hashing slot
+    user = request.state.user
+    if not user.get("role") == "super_admin":
+        raise HTTPException(403, "Access denied")
+    return get_hash_metrics()
+
+@router.get("/metrics/db-pool")
+async def db_pool_metrics(request: Request):
+    # Per-worker CMAP counters: open / checked-out connections and checkout waits per server
+    user = request.state.user
+    if not user.get("role") == "super_admin":
+        raise HTTPException(403, "Access denied")
+    return get_pool_stats()
+
 # ── STORE CRUD ────────────────────────────
 @router.get("/stores")
-async def list_stores(request: Request):
+async def list_stores(request: Request, page: Page = Depends()):
     user = request.state.user
     if not user.get("role") == "super_admin":
         raise HTTPException(403, "Access denied")
-    return {"stores": await svc.get_stores()}
+    return {"stores": await svc.get_stores(page)}
 
 @router.post("/store")
 async def create_store(store_data: CreateStoreModel , send_email: bool = Query(False)):
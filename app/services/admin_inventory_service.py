@@ -1,10 +1,25 @@
-from fastapi import HTTPException
-from app.models.admin_model import Product
-from app.db import db
 import csv
 import io
-from fastapi.responses import StreamingResponse
+import json
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.models.admin_model import Product
+from app.db import ANALYTICS, db, db_for
+from typing import Optional
+from app.config import IMPORT_BATCH_SIZE
 from app.utils.raise_order import _next_id
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.low_stock_engine import low_stock_engine
+from app.utils.export_stream import DEFAULT_BATCH_SIZE, stream_export
+from app.utils.id_sequence import advance_ids, reserve_ids
+from app.utils.numeric_fields import to_int, typed_doc
+from app.utils.pagination import Page, find_page, shape_row
+
+
+PRODUCT_SORT_FIELDS = ("product_name", "product_id")
 
 
 async def add_product_service(product: Product, store_id: str, org_id: str):
@@ -14,43 +29,45 @@ async def add_product_service(product: Product, store_id: str, org_id: str):
         new_product_id = await _next_id(db.Inventory, "product_id", "P", store_id)
 
         # Build the final product document
-        product_dict = product.model_dump()
+        product_dict = typed_doc("Inventory", product.model_dump())
         product_dict["product_id"] = new_product_id
         product_dict["store_id"] = store_id
         product_dict["org_id"] = org_id
 
         # Insert the product into the collection
         await db.Inventory.insert_one(product_dict)
+        invalidate_store_dashboard(store_id)
+        low_stock_engine.track(store_id, [new_product_id])
 
         return {
             "message": "Product added successfully",
             "product_id": new_product_id
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error adding product: {str(e)}")
 
 
-async def get_all_products(store_id: str):
+async def get_all_products(store_id: str, page: Optional[Page] = None):
     try:
-        products_cursor = db.Inventory.find({"store_id": store_id}, {"_id": 0})
+        products_cursor = await find_page(page, db.Inventory, {"store_id": store_id}, {"_id": 0},
+                                          sort_fields=PRODUCT_SORT_FIELDS, required=("quantity",))
         products = []
-        async for product in products_cursor:
+        for product in products_cursor:
            
             # product["_id"] = str(product["_id"])  # Convert ObjectId to string
             
-            try:
-                quantity = int(product.get("quantity", 0))
-            except (ValueError, TypeError):
-                quantity = 0
-
-            product["status"] = "Stock-in" if quantity > 0 else "Stock-out"
+            product["status"] = "Stock-in" if to_int(product.get("quantity")) > 0 else "Stock-out"
             # Remove _id if present
             if "_id" in product:
                 del product["_id"]
-            products.append(product)
+            products.append(shape_row(page, product))
 
         return products
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving products: {str(e)}")
 
@@ -67,14 +84,8 @@ async def get_product_by_id(product_id: str, store_id: str):
             raise HTTPException(status_code=404, detail="Product not found for this store.")
 
 
-        raw_quantity = product_data.get("quantity", 0)
-        try:
-            quantity = int(raw_quantity)
-        except (ValueError, TypeError):
-            quantity = 0
-
         # Compute status without storing in DB
-        status = "Stock-in" if quantity > 0 else "Stock-out"
+        status = "Stock-in" if to_int(product_data.get("quantity")) > 0 else "Stock-out"
 
         product = Product(**product_data)
         product.status = status
@@ -118,8 +129,10 @@ async def update_product_by_id(product_id: str, update_data: dict):
 
     await db["Inventory"].update_one(
         {"product_id": product_id},
-        {"$set": update_data}
+        {"$set": typed_doc("Inventory", update_data)}
     )
+    invalidate_store_dashboard(product.get("store_id"))
+    low_stock_engine.track(product.get("store_id"), [product_id])
 
     updated = await db["Inventory"].find_one({"product_id": product_id})
     # Remove or convert _id before returning
@@ -134,52 +147,200 @@ async def delete_product_service(product_id: str):
         result = await db.Inventory.delete_one({"product_id": product_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Product not found.")
+        invalidate_store_dashboard()
         return True
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting product: {str(e)}")
     
 
 #export my inventory sheet
-async def export_inventory_csv(store_id: str, org_id: str):
-    cursor = db.Inventory.find({
+INVENTORY_EXPORT_COLUMNS = [
+    "org_id", "store_id", "product_id", "product_name", "is_consumer_returnable",
+    "consumer_return_conditions", "is_seller_returnable", "seller_return_conditions",
+    "unit_price", "unit", "quantity", "category", "sub_category", "tags",
+    "tax", "has_warranty", "warranty_tenure", "warranty_unit", "last_updated"
+]
+
+
+def inventory_export_row(doc: dict) -> list:
+    return [
+        doc.get("org_id", ""),
+        doc.get("store_id", ""),
+        doc.get("product_id", ""),
+        doc.get("product_name", ""),
+        doc.get("is_consumer_returnable", False),
+        "|".join(doc.get("consumer_return_conditions") or []),
+        doc.get("is_seller_returnable", False),
+        "|".join(doc.get("seller_return_conditions") or []),
+        doc.get("unit_price", "0"),
+        doc.get("unit", ""),
+        doc.get("quantity", 0),
+        doc.get("category", ""),
+        doc.get("sub_category", ""),
+        "|".join(doc.get("tags") or []),
+        doc.get("tax", 0.0),
+        doc.get("has_warranty", False),
+        doc.get("warranty_tenure", 0),
+        doc.get("warranty_unit", ""),
+        str(doc.get("last_updated", "")),  # convert datetime to string
+    ]
+
+
+# Exports are reports: they read from a secondary when one is fresh enough
+EXPORT_CONSISTENCY = ANALYTICS
+
+
+async def export_inventory_csv(store_id: str, org_id: str, fmt: str = "csv",
+                               compression: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    cursor = db_for(EXPORT_CONSISTENCY).Inventory.find({
         "store_id": store_id,
         "org_id": org_id
-    })
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write CSV headers
-    writer.writerow([
-        "org_id", "store_id", "product_id", "product_name", "is_consumer_returnable",
-        "consumer_return_conditions", "is_seller_returnable", "seller_return_conditions",
-        "unit_price", "unit", "quantity", "category", "sub_category", "tags",
-        "tax", "has_warranty", "warranty_tenure", "warranty_unit", "last_updated"
-    ])
-
-    async for doc in cursor:
-        writer.writerow([
-            doc.get("org_id", ""),
-            doc.get("store_id", ""),
-            doc.get("product_id", ""),
-            doc.get("product_name", ""),
-            doc.get("is_consumer_returnable", False),
-            "|".join(doc.get("consumer_return_conditions") or []),
-            doc.get("is_seller_returnable", False),
-            "|".join(doc.get("seller_return_conditions") or []),
-            doc.get("unit_price", "0"),
-            doc.get("unit", ""),
-            doc.get("quantity", 0),
-            doc.get("category", ""),
-            doc.get("sub_category", ""),
-            "|".join(doc.get("tags") or []),
-            doc.get("tax", 0.0),
-            doc.get("has_warranty", False),
-            doc.get("warranty_tenure", 0),
-            doc.get("warranty_unit", ""),
-            str(doc.get("last_updated", "")),  # convert datetime to string
-        ])
-
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv", headers={
-        "Content-Disposition": "attachment; filename=inventory_export.csv"
-    })
\ No newline at end of file
+    }, {"_id": 0})
+    return stream_export(cursor, INVENTORY_EXPORT_COLUMNS, inventory_export_row, "inventory_export",
+                         fmt, compression, batch_size)
+
+
+#import inventory sheet (csv / ndjson, same columns as the export)
+IMPORT_LIST_FIELDS = ("consumer_return_conditions", "seller_return_conditions", "tags")
+MAX_REPORTED_ERRORS = 1000
+
+
+def _clean_import_row(row: dict) -> dict:
+    doc = {}
+    for key, value in row.items():
+        if key is None:  # csv row with more cells than headers
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if value == "":
+                continue
+            if key in IMPORT_LIST_FIELDS:
+                value = [v for v in value.split("|") if v]
+        doc[key] = value
+    return doc
+
+
+def _iter_import_rows(file, fmt: str):
+    # Yields (row number, raw dict or parse error message); reads the spooled upload lazily
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, f"Invalid JSON: {e}"
+            continue
+        yield line_number, row if isinstance(row, dict) else "Each line must be a JSON object"
+
+
+def _add_import_error(report: dict, row_number: int, errors):
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row_number, "errors": errors})
+
+
+def _parse_import_batch(rows, store_id: str, org_id: str, batch_size: int, report: dict):
+    # Blocking (spooled file reads, validation): returns the next batch and whether the file is done
+    batch = []
+    try:
+        for row_number, raw in rows:
+            report["received"] += 1
+            if isinstance(raw, str):
+                _add_import_error(report, row_number, [raw])
+                continue
+
+            raw = _clean_import_row(raw)
+            product_id = raw.pop("product_id", None)
+            try:
+                product = Product(**raw)
+            except ValidationError as e:
+                _add_import_error(report, row_number, [
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+                ])
+                continue
+
+            doc = typed_doc("Inventory", product.model_dump(exclude={"status"}, exclude_unset=True))
+            doc.update({"product_id": product_id, "store_id": store_id, "org_id": org_id,
+                        "last_updated": product.last_updated})
+            defaults = {
+                key: value for key, value in typed_doc("Inventory", product.model_dump(exclude={"status"})).items()
+                if key not in doc
+            }
+            batch.append((row_number, doc, defaults))
+
+            if len(batch) >= batch_size:
+                return batch, False
+    except (UnicodeDecodeError, csv.Error) as e:
+        # Rows already parsed are still written; the report says where parsing stopped
+        _add_import_error(report, report["received"] + 1, [f"Could not parse file: {e}"])
+    return batch, True
+
+
+async def _write_import_batch(batch: list, store_id: str, report: dict):
+    # IDs given in the file move the counter past them, so later allocations can't reuse them
+    await advance_ids(db.Inventory, "product_id", "P", [doc.get("product_id") for _, doc, _ in batch], store_id)
+
+    # Rows without a product_id get fresh IDs from the counter in one reservation
+    new_ids = iter(await reserve_ids(
+        db.Inventory, "product_id", "P", sum(1 for _, doc, _ in batch if not doc.get("product_id")), store_id
+    ))
+    for _, doc, _ in batch:
+        if not doc.get("product_id"):
+            doc["product_id"] = next(new_ids)
+
+    # Only the cells present in the file overwrite an existing product; defaults apply to new ones
+    operations = [
+        UpdateOne(
+            {"store_id": store_id, "product_id": doc["product_id"]},
+            {"$set": doc, "$setOnInsert": defaults},
+            upsert=True
+        )
+        for _, doc, defaults in batch
+    ]
+
+    start = 0
+    while start < len(operations):
+        try:
+            result = await db.Inventory.bulk_write(operations[start:], ordered=True)
+            details = result.bulk_api_result
+            start = len(operations)
+        except BulkWriteError as e:
+            # Ordered writes stop at the first failure: report that row and resume after it
+            details = e.details
+            failed = details["writeErrors"][0]
+            _add_import_error(report, batch[start + failed["index"]][0], [failed.get("errmsg", "Write failed")])
+            start += failed["index"] + 1
+
+        report["inserted"] += details.get("nUpserted", 0)
+        report["updated"] += details.get("nMatched", 0)
+
+
+async def import_inventory(file: UploadFile, store_id: str, org_id: str, fmt: Optional[str] = None,
+                           batch_size: int = IMPORT_BATCH_SIZE):
+    filename = (file.filename or "").lower()
+    fmt = fmt or ("ndjson" if filename.endswith((".ndjson", ".jsonl")) else "csv")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail=f"Unsupported import format '{fmt}'")
+
+    report = {"received": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    rows = _iter_import_rows(file.file, fmt)
+    finished = False
+    while not finished:
+        # Parsing and validation are CPU-bound: each batch is parsed in the threadpool, then written
+        batch, finished = await run_in_threadpool(_parse_import_batch, rows, store_id, org_id, batch_size, report)
+        if batch:
+            await _write_import_batch(batch, store_id, report)
+
+    if report["inserted"] or report["updated"]:
+        invalidate_store_dashboard(store_id)
+        # Alert state of imported rows is caught up in one pass
+        if low_stock_engine.mode == "local":
+            await low_stock_engine.sweep()
+    return report
@@ -1,43 +1,30 @@
 from fastapi import HTTPException
-from app.db import db
+from app.db import ANALYTICS, db_for
 from app.models.admin_model import LossOrder
-import csv
-import io
-from fastapi.responses import StreamingResponse
 from collections import defaultdict
-from typing import List, Dict
-
-
-async def export_loss_orders_csv(store_id: str, org_id: str):
-    cursor = db.LossOrders.find({"store_id": store_id, "org_id": org_id})
-    output = io.StringIO()
-    writer = csv.writer(output)
-
-    # Write CSV headers
-    writer.writerow([
-        "product_id", "org_id", "store_id", "product_name", "category",
-        "date_reported", "quantity_lost", "unit", "unit_price", "reason"
-    ])
-
-    # Write data rows
-    async for doc in cursor:
-        writer.writerow([
-            doc.get("product_id", ""),
-            doc.get("org_id", ""),
-            doc.get("store_id", ""),
-            doc.get("product_name", ""),
-            doc.get("category", ""),
-            doc.get("date_reported", ""),
-            doc.get("quantity_lost", ""),
-            doc.get("unit", ""),
-            doc.get("unit_price", ""),
-            doc.get("reason", ""),
-        ])
-
-    output.seek(0)
-    return StreamingResponse(output, media_type="text/csv", headers={
-        "Content-Disposition": "attachment; filename=loss_orders.csv"
-    })
+from typing import List, Dict, Optional
+from app.utils.export_stream import DEFAULT_BATCH_SIZE, stream_export
+
+# Consistency class: read-only loss report and exports, may lag the primary (see app/db.py)
+CONSISTENCY = ANALYTICS
+db = db_for(CONSISTENCY)
+
+
+LOSS_EXPORT_COLUMNS = [
+    "product_id", "org_id", "store_id", "product_name", "category",
+    "date_reported", "quantity_lost", "unit", "unit_price", "reason"
+]
+
+
+def loss_export_row(doc: dict) -> list:
+    return [doc.get(column, "") for column in LOSS_EXPORT_COLUMNS]
+
+
+async def export_loss_orders_csv(store_id: str, org_id: str, fmt: str = "csv",
+                                 compression: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    cursor = db.LossOrders.find({"store_id": store_id, "org_id": org_id}, {"_id": 0})
+    return stream_export(cursor, LOSS_EXPORT_COLUMNS, loss_export_row, "loss_orders",
+                         fmt, compression, batch_size)
 
 
 async def get_all_loss_orders_with_metrics(store_id: str, org_id: str, total_inventory_value: float = 100000.0) -> Dict:
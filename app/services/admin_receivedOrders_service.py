@@ -1,7 +1,11 @@
 
 from fastapi import HTTPException
 from app.db import db
-from app.utils.raise_order import build_product_detail, fetch_inventory_details, parse_status_string
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.sales_dashboard_rollup import record_order_removed, record_order_total_changed
+from app.utils.raise_order import build_product_detail, parse_status_string
+from app.utils.line_items import require_priced_item, resolve_line_items
+from app.utils.sales_utils import attach_product_status
 
 # recieved orders by customer
 
@@ -12,35 +16,10 @@ async def get_all_sales_orders(store_id: str):
         {"_id": 0}
     ).to_list(length=None)
 
-    for order in orders:
-        updated_products = []
-
-        for product in order.get("products", []):
-            product_id = product.get("product_id")
-            ordered_quantity = int(product.get("order_quantity", 0))
-
-            # Fetch from Inventory
-            inventory_item = await db.Inventory.find_one({
-                "store_id": store_id,
-                "product_id": product_id
-            },
-            {"_id":0})
-
-            try:
-                inventory_quantity = int(inventory_item.get("quantity", 0)) if inventory_item else 0
-            except (ValueError, TypeError):
-                inventory_quantity = 0
-
-            # Compare and determine product_status
-            product_status = "Stock-out" if inventory_quantity < ordered_quantity else "Stock-in"
-
-            # Add product_status to product
-            product["product_status"] = product_status
-            updated_products.append(product)
-
-        # Update products list
-        order["products"] = updated_products
+    # Resolve stock status for every product line with a single inventory query
+    await attach_product_status(orders, store_id)
 
+    for order in orders:
         # Convert status field
         order["status"] = parse_status_string(order.get("status", "0"))
 
@@ -51,11 +30,16 @@ async def get_all_sales_orders(store_id: str):
     return orders
 
 async def delete_order_by_id(order_id: str, store_id: str) -> int:
-    result = await db.SalesOrders.delete_one({
+    deleted = await db.SalesOrders.find_one_and_delete({
         "order_id": order_id,
         "store_id": store_id
-    })
-    return result.deleted_count
+    }, {"_id": 0, "order_status": 1, "order_date": 1, "total_order_price": 1})
+    if not deleted:
+        return 0
+
+    await record_order_removed(deleted, store_id)
+    invalidate_store_dashboard(store_id)
+    return 1
 
 
 async def update_sales_order(order_id: str, store_id: str, updated_data: dict):
@@ -73,6 +57,9 @@ async def update_sales_order(order_id: str, store_id: str, updated_data: dict):
         {"order_id": order_id, "store_id": store_id},
         {"$set": final_update_data}
     )
+    if result.modified_count:
+        await record_order_total_changed(order, final_update_data["total_order_price"], store_id)
+        invalidate_store_dashboard(store_id)
 
     return result.modified_count
 
@@ -80,25 +67,29 @@ async def rebuild_products_list(original_products: list, updated_products_input:
     updated_products = []
     subtotal = 0.0
 
+    items = await resolve_line_items((prod.get("product_id") for prod in original_products), store_id)
+
     for prod in original_products:
         product_id = prod.get("product_id")
         default_quantity = prod.get("order_quantity", 0)
         new_quantity = get_new_quantity_for_product(product_id, updated_products_input, default_quantity)
 
-        inventory_data = await fetch_inventory_details(product_id, store_id)
+        item = require_priced_item(items, product_id)
 
         product_detail, total_with_tax = build_product_detail(
-            inventory_item=inventory_data["inventory_item"],
+            inventory_item=item.inventory_item,
             product_id=product_id,
-            unit_price=inventory_data["unit_price"],
-            product_tax=inventory_data["product_tax"],
+            unit_price=item.unit_price,
+            product_tax=item.tax,
             order_quantity=new_quantity,
-            inventory_quantity=inventory_data["inventory_quantity"]
+            inventory_quantity=item.quantity
         )
 
         subtotal += total_with_tax
         updated_products.append(product_detail)
 
+    return updated_products, subtotal
+
 def get_new_quantity_for_product(product_id: str, updated_products: list, default_quantity: int) -> int:
     for p in updated_products:
         if p["product_id"] == product_id:
@@ -2,20 +2,26 @@ from datetime import datetime
 from fastapi import HTTPException
 from app.db import db
 from app.services.notification_service import create_notification
-from app.utils.raise_order import generate_request_id  # Motor async MongoDB client
+from app.utils.id_sequence import next_id
+from typing import Optional
+from app.utils.pagination import Page, find_page, shape_row
 
 
-async def get_all_requested_orders(store_id: str):
+async def get_all_requested_orders(store_id: str, page: Optional[Page] = None):
     try:
-        cursor = db.RequestedOrders.find({"store_id": store_id})
+        cursor = await find_page(page, db.RequestedOrders, {"store_id": store_id},
+                                 sort_fields=("request_id", "created_at"))
         orders = []
 
-        async for doc in cursor:
-            doc["_id"] = str(doc["_id"])
+        for doc in cursor:
+            if "_id" in doc:
+                doc["_id"] = str(doc["_id"])
             orders.append(doc)
 
         return orders
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise Exception(f"Error fetching requested orders: {str(e)}")
     
@@ -72,12 +78,7 @@ async def raise_request_order_service(order_id: str, estimate_date: str, org_id:
 
 
 async def generate_request_id():
-    latest = await db.RequestedOrders.find_one({}, sort=[("request_id", -1)])
-    if latest and "request_id" in latest:
-        last_num = int(latest["request_id"].replace("REQ", ""))
-        return f"REQ{last_num + 1:03d}"
-    else:
-        return "REQ001"
+    return await next_id(db.RequestedOrders, "request_id", "REQ")
 
 async def raise_order_request_service(data: dict, org_id: str, store_id: str, requested_by: dict):
     request_id = await generate_request_id()
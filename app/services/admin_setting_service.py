@@ -3,6 +3,7 @@ from datetime import datetime
 from passlib.context import CryptContext
 from app.db import db
 from app.models.admin_setting_model import AdminSetupSettingRequest
+from app.utils.profile_cache import VERSION_BUMP, user_profiles
 
 # 🔐 Setup for password hashing using bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -18,8 +19,9 @@ async def update_admin_setting(admin_id, update_data: dict):
     update_data["updated_at"] = datetime.utcnow()
     result = await db.Users.update_one(
         {"id": admin_id},
-        {"$set": update_data}
+        {"$set": update_data, "$inc": VERSION_BUMP}
     )
+    user_profiles.invalidate_where("id", admin_id)
 
     if result.modified_count == 1:
         return {"message": "Admin setup updated successfully"}
@@ -1,21 +1,28 @@
 from fastapi import HTTPException
 from app.db import db
-from app.utils.raise_order import build_product_detail, fetch_inventory_details, generate_customer_id, generate_order_id, parse_status_string
+from app.services.sales_dashboard_rollup import record_order_added
+from typing import Optional
+from app.utils.pagination import Page, find_page, shape_row
+from app.services.sales_get_update_services import ORDER_SORT_FIELDS
+from app.utils.raise_order import build_product_detail, generate_customer_id, generate_order_id, parse_status_string
+from app.utils.line_items import require_priced_item, resolve_line_items
 
 # it includes both - sold orders and requested orders
 
-async def get_all_sold_orders(store_id: str):
+async def get_all_sold_orders(store_id: str, page: Optional[Page] = None):
     # Filter orders by store_id and order_status = "1"
-    orders = await db.SalesOrders.find(
+    orders = await find_page(
+        page, db.SalesOrders,
         {"store_id": store_id, "order_status": "1"},
-        {"_id": 0}
-    ).to_list(length=None)
+        {"_id": 0},
+        sort_fields=ORDER_SORT_FIELDS, required=("order_status",)
+    )
     for order in orders:
         # Convert order_status to status text
         order["status"] = parse_status_string(order["order_status"])
         # Remove raw order_status field from final output
         order.pop("order_status", None)
-    return orders
+    return [shape_row(page, order) for order in orders]
 
 
 
@@ -39,25 +46,28 @@ async def add_sales_order(order_data: dict, store_id: str):
 
     # Insert into SalesOrders
     await db.SalesOrders.insert_one(order_data)
+    await record_order_added(store_id)
     return order_data["order_id"]
 
 async def process_products(products: list, store_id: str):
     final_products = []
     subtotal = 0.0
 
+    items = await resolve_line_items((prod["product_id"] for prod in products), store_id)
+
     for prod in products:
         product_id = prod["product_id"]
         order_quantity = prod["quantity"]
 
-        inventory_data = await fetch_inventory_details(product_id, store_id)
+        item = require_priced_item(items, product_id)
 
         product_detail, total_with_tax = build_product_detail(
-            inventory_item=inventory_data["inventory_item"],
+            inventory_item=item.inventory_item,
             product_id=product_id,
-            unit_price=inventory_data["unit_price"],
-            product_tax=inventory_data["product_tax"],
+            unit_price=item.unit_price,
+            product_tax=item.tax,
             order_quantity=order_quantity,
-            inventory_quantity=inventory_data["inventory_quantity"]
+            inventory_quantity=item.quantity
         )
 
         subtotal += total_with_tax
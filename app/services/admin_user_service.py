@@ -2,14 +2,14 @@ import uuid
 from bson import ObjectId
 from fastapi import HTTPException, Request
 from datetime import datetime
-import bcrypt
 from pymongo import DESCENDING
 
 from app.db import db
 from app.models.super_admin_models import UserModel
 # from app.services.admin_setup_service import hash_password
-from app.utils.auth import hash_password
-from app.utils.email_utils import send_welcome_email
+from app.utils.auth import hash_password_async
+from app.utils.email_outbox import enqueue_email
+from app.utils.profile_cache import VERSION_BUMP, store_profiles, user_profiles
 # from app.utils.email_forgot import send_reset_email
 
 async def create_department_user(data, user_info):
@@ -32,7 +32,7 @@ async def create_department_user(data, user_info):
         # Auto-generate custom user
 
         # Hash password
-        hashed_password = bcrypt.hashpw(data.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        hashed_password = await hash_password_async(data.password)
         today = datetime.utcnow()
 
         new_id = str(uuid.uuid4())  # Generate a new UUID for the employee_id
@@ -71,9 +71,11 @@ async def create_department_user(data, user_info):
                         "department": data.role,
                         "employee_id": new_id
                     }
-                }
+                },
+                "$inc": VERSION_BUMP
             }
         )
+        store_profiles.invalidate(store_id)
 #         res = send_welcome_email(to_email=doc.get("email"), password=doc.get("password"))
 #         print("Email sent status:", res)
 #         if not res:
@@ -105,19 +107,16 @@ async def create_department_user(data, user_info):
 # }
         print("User created successfully:", user_doc)
         try:
-            res = send_welcome_email(
-                to_email=data.email,
+            await enqueue_email(
+                "welcome",
+                data.email,
                 password=data.password  # original (non-hashed) password
-                # employee_id=new_id
             )
-            print("Email sent status:", res)
-            if not res:
-                raise HTTPException(status_code=500, detail="Failed to send welcome email")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to send credentials: {str(e)}")
 
         return {
-            "message": f"{data.role.capitalize()} employee created and email sent successfully",
+            "message": f"{data.role.capitalize()} employee created and email queued successfully",
             # "employee_id": new_id,
             "email": data.email
         }
@@ -189,6 +188,7 @@ async def delete_user_by_id(employee_id: str, request: Request):
         delete_result = await db.Users.delete_one({"_id": user_id})
         if delete_result.deleted_count == 0:
             raise HTTPException(status_code=500, detail="Failed to delete user")
+        user_profiles.invalidate(user.get("email"))
 
         # Step 3: Remove employee from store's departments array
         update_result = await db.Stores.update_one(
@@ -199,9 +199,11 @@ async def delete_user_by_id(employee_id: str, request: Request):
                         "department": user_role,
                         "employee_id": employee_id
                     }
-                }
+                },
+                "$inc": VERSION_BUMP
             }
         )
+        store_profiles.invalidate(store_id)
 
         return {"message": "User and department reference deleted successfully"}
 
@@ -229,10 +231,11 @@ async def reset_password(email: str, user_id: str, new_password: str):
     if user["email"].lower() != email.lower():
         raise HTTPException(status_code=400, detail="Email does not match the user")
 
-    hashed_pw = hash_password(new_password)
+    hashed_pw = await hash_password_async(new_password)
     await db.Users.update_one(
         {"_id": obj_id},
-        {"$set": {"password": hashed_pw}}
+        {"$set": {"password": hashed_pw}, "$inc": VERSION_BUMP}
     )
+    user_profiles.invalidate(user["email"])
 
     return {"message": "Password updated successfully"}
\ No newline at end of file
@@ -0,0 +1,179 @@
+import asyncio
+import copy
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import CATEGORY_CATALOG_TTL_SECONDS
+from app.db import db
+
+logger = logging.getLogger(__name__)
+
+categories_collection = db.Categories
+
+# Error codes meaning "this deployment has no change streams" (standalone server)
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}
+
+# Older subcategory rows use other key names for the id / name
+SUB_ID_KEYS = ("sub_category_id", "id", "subcategory_id")
+SUB_NAME_KEYS = ("sub_category_name", "name", "subcategory_name")
+
+
+def _first(doc: dict, keys: Iterable[str]):
+    for key in keys:
+        if doc.get(key):
+            return doc[key]
+    return None
+
+
+class CatalogSnapshot:
+    """Immutable view of the Categories collection with id -> document maps.
+
+    Lookups hand out copies, so callers can decorate results freely.
+    """
+
+    def __init__(self, documents: List[dict]):
+        self._categories: Dict[str, dict] = {}
+        self._subcategories: Dict[str, dict] = {}
+        self._sub_parent: Dict[str, str] = {}
+        self._subcategory_rows = 0
+
+        for doc in documents:
+            if "_id" in doc:
+                doc["_id"] = str(doc["_id"])
+            category_id = doc.get("category_id")
+            self._categories[category_id] = doc
+            self._subcategory_rows += len(doc.get("sub_categories") or [])
+            for sub in doc.get("sub_categories") or []:
+                if not isinstance(sub, dict):
+                    continue
+                sub_id = _first(sub, SUB_ID_KEYS)
+                if sub_id:
+                    self._subcategories[sub_id] = sub
+                    self._sub_parent[sub_id] = category_id
+
+    @staticmethod
+    def _copy(doc: dict, include_id: bool) -> dict:
+        doc = copy.deepcopy(doc)
+        if not include_id:
+            doc.pop("_id", None)
+        return doc
+
+    def __len__(self) -> int:
+        return len(self._categories)
+
+    @property
+    def subcategory_count(self) -> int:
+        return self._subcategory_rows
+
+    def list(self, include_id: bool = False) -> List[dict]:
+        return [self._copy(doc, include_id) for doc in self._categories.values()]
+
+    def get(self, category_id: str, include_id: bool = False) -> Optional[dict]:
+        doc = self._categories.get(category_id)
+        return self._copy(doc, include_id) if doc is not None else None
+
+    def many(self, category_ids: Iterable[str]) -> List[dict]:
+        return [self._copy(self._categories[cid], False) for cid in category_ids if cid in self._categories]
+
+    def subcategory(self, sub_category_id: str) -> Optional[dict]:
+        sub = self._subcategories.get(sub_category_id)
+        return copy.deepcopy(sub) if sub is not None else None
+
+    def parent_of(self, sub_category_id: str) -> Optional[str]:
+        return self._sub_parent.get(sub_category_id)
+
+    def category_name(self, category_id: str, default: str = "Unknown") -> str:
+        doc = self._categories.get(category_id)
+        return doc.get("category_name", default) if doc else default
+
+    def subcategory_name(self, sub_category_id: str, default: str = "Unknown") -> str:
+        sub = self._subcategories.get(sub_category_id)
+        return (_first(sub, SUB_NAME_KEYS) or default) if sub else default
+
+
+class CategoryCatalog:
+    """Process-local copy of Categories, loaded once and swapped on change.
+
+    Category writes in this worker call invalidate(). A change stream on
+    Categories invalidates every worker's copy; where change streams are not
+    available the copy is also reloaded after CATEGORY_CATALOG_TTL_SECONDS.
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.mode = "stopped"  # "change_stream" | "ttl" | "stopped"
+
+    def _fresh(self) -> bool:
+        if self._snapshot is None:
+            return False
+        if self.mode == "change_stream":
+            return True
+        return time.monotonic() - self._loaded_at < CATEGORY_CATALOG_TTL_SECONDS
+
+    async def snapshot(self) -> CatalogSnapshot:
+        if self._fresh():
+            return self._snapshot
+
+        async with self._lock:
+            if self._fresh():
+                return self._snapshot
+
+            generation = self._generation
+            snapshot = CatalogSnapshot(await categories_collection.find({}).to_list(length=None))
+            # A write that landed while loading makes this copy suspect: serve it once, don't keep it
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            return snapshot
+
+    def invalidate(self):
+        self._generation += 1
+        self._snapshot = None
+
+    # ───────────────────────── CHANGE STREAM
+    async def _watch(self):
+        delay = 1
+        while True:
+            try:
+                async with categories_collection.watch() as stream:
+                    # Anything missed while (re)connecting is picked up by a fresh load
+                    self.invalidate()
+                    self.mode = "change_stream"
+                    delay = 1
+                    async for _ in stream:
+                        self.invalidate()
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable, category catalog refreshes every %ss: %s",
+                                CATEGORY_CATALOG_TTL_SECONDS, e)
+                    self.mode = "ttl"
+                    return
+                logger.warning("Category change stream failed, reconnecting: %s", e)
+            except PyMongoError as e:
+                logger.warning("Category change stream failed, reconnecting: %s", e)
+
+            self.mode = "ttl"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def start(self):
+        if self._task is None:
+            self.mode = "ttl"
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.mode = "stopped"
+
+
+category_catalog = CategoryCatalog()
@@ -2,6 +2,7 @@ from bson import ObjectId
 from app.db import db  # adjust import to your project
 from app.models.category_model import CategoryCreate, CategoryUpdate
 from fastapi import HTTPException
+from app.services.category_catalog import category_catalog
 
 categories_collection = db.Categories  # your MongoDB collection
 
@@ -12,21 +13,18 @@ async def create_category(data: CategoryCreate):
     
     category_dict = data.dict()
     result = await categories_collection.insert_one(category_dict)
+    category_catalog.invalidate()
     return { "message": "Category created", "id": str(result.inserted_id) }
 
 async def get_all_categories():
-    cursor = categories_collection.find()
-    categories = []
-    async for cat in cursor:
-        cat["_id"] = str(cat["_id"])
-        categories.append(cat)
-    return categories
+    catalog = await category_catalog.snapshot()
+    return catalog.list(include_id=True)
 
 async def get_category_by_id(category_id: str):
-    cat = await categories_collection.find_one({"category_id": category_id})
+    catalog = await category_catalog.snapshot()
+    cat = catalog.get(category_id, include_id=True)
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
-    cat["_id"] = str(cat["_id"])
     return cat
 
 async def update_category_by_id(category_id: str, update_data: CategoryUpdate):
@@ -34,12 +32,14 @@ async def update_category_by_id(category_id: str, update_data: CategoryUpdate):
         {"category_id": category_id},
         {"$set": update_data.dict(exclude_unset=True)}
     )
+    category_catalog.invalidate()
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
     return { "message": "Category updated successfully" }
 
 async def delete_category_by_id(category_id: str):
     result = await categories_collection.delete_one({"category_id": category_id})
+    category_catalog.invalidate()
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
     return { "message": "Category deleted successfully" }
\ No newline at end of file
@@ -1,84 +1,173 @@
-from datetime import datetime
-from pymongo import DESCENDING
-from app.db import db
+import asyncio
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import DASHBOARD_CACHE_TTL_SECONDS, DASHBOARD_SETTLE_SECONDS, LOW_STOCK_THRESHOLD
+from app.db import ANALYTICS, db_for
+from app.utils.cache import TTLCache
+
+# Consistency class: read-only store dashboard, may lag the primary (see app/db.py)
+CONSISTENCY = ANALYTICS
+db = db_for(CONSISTENCY)
 
 inventory_collection = db.Inventory
 sales_orders_collection = db.SalesOrders
-loss_products_collection = db.LossProduct
+loss_orders_collection = db.LossOrders
 
-async def get_dashboard_data():
-    # ---------- 1. Total Items ----------
-    total_items = await inventory_collection.count_documents({})
+MONTHS = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
 
-    # ---------- 2. Low Stock Items ----------
-    low_stock_items = await inventory_collection.count_documents({"quantity": {"$lt": 10, "$gt": 0}})
+# Keyed on (store_id, all-stores version, store version, inventory page, page size, top N, loss limit)
+_dashboard_cache = TTLCache(maxsize=256, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+# Bumped by every invalidation (None: all stores), so a result computed before a write is never cached after it
+_store_versions: Dict[Optional[str], int] = {}
+# time.monotonic() of the last invalidation per store (None: all stores)
+_last_writes: Dict[Optional[str], float] = {}
 
-    # ---------- 3. Out of Stock Items ----------
-    out_of_stock_items = await inventory_collection.count_documents({"quantity": {"$lte": 0}})
 
-    # ---------- 4. Unique Visits (static for now) ----------
-    unique_visits = 1034
+def _version(store_id: str) -> Tuple[int, int]:
+    return _store_versions.get(None, 0), _store_versions.get(store_id, 0)
 
-    # ---------- 5. Inventory Status (Bar Chart) ----------
-    inventory_cursor = inventory_collection.find({}, {"_id": 0, "product_name": 1, "quantity": 1})
-    inventory_status = await inventory_cursor.to_list(length=None)
 
-    # ---------- 6. Finance Report (Bar Chart - Sales by Month) ----------
-    pipeline = [
-        {
-            "$group": {
-                "_id": { "$month": "$created_at" },
-                "total_sales": { "$sum": "$total_price" }
-            }
-        },
-        { "$sort": { "_id": 1 } }
+def _recently_written(store_id: str, now: float) -> bool:
+    last_write = max(_last_writes.get(None, float("-inf")), _last_writes.get(store_id, float("-inf")))
+    return now - last_write < DASHBOARD_SETTLE_SECONDS
+
+
+def invalidate_store_dashboard(store_id: Optional[str] = None):
+    # Writes that only know the product_id pass no store_id and drop every store
+    _store_versions[store_id] = _store_versions.get(store_id, 0) + 1
+    _last_writes[store_id] = time.monotonic()
+    if store_id is None:
+        _dashboard_cache.clear()
+        return
+    for key in [key for key in _dashboard_cache.keys() if key[0] == store_id]:
+        _dashboard_cache.pop(key)
+
+
+def _to_number(field: str, to: str = "int") -> dict:
+    # Legacy documents keep quantities and prices as strings
+    return {"$convert": {"input": field, "to": to, "onError": 0, "onNull": 0}}
+
+
+def build_inventory_pipeline(store_id: str, skip: int, limit: int) -> list:
+    return [
+        {"$match": {"store_id": store_id}},
+        {"$project": {
+            "_id": 0, "product_id": 1, "product_name": 1, "quantity": _to_number("$quantity"),
+            # Per-product reorder point, the same one low stock alerts use
+            "reorder_point": {"$ifNull": ["$reorder_point", LOW_STOCK_THRESHOLD]}
+        }},
+        {"$facet": {
+            "counts": [
+                {"$group": {
+                    "_id": None,
+                    "total_items": {"$sum": 1},
+                    "low_stock_items": {"$sum": {"$cond": [
+                        {"$and": [{"$gt": ["$quantity", 0]}, {"$lt": ["$quantity", "$reorder_point"]}]}, 1, 0
+                    ]}},
+                    "out_of_stock_items": {"$sum": {"$cond": [{"$lte": ["$quantity", 0]}, 1, 0]}}
+                }}
+            ],
+            # Lowest stock first so the chart shows what needs attention
+            "inventory_status": [
+                {"$sort": {"quantity": 1, "product_id": 1}},
+                {"$skip": skip},
+                {"$limit": limit},
+                {"$project": {"product_name": 1, "quantity": 1}}
+            ]
+        }}
     ]
-    monthly_sales_cursor = sales_orders_collection.aggregate(pipeline)
-    monthly_sales = [doc async for doc in monthly_sales_cursor]
 
-    months = [
-        "January", "February", "March", "April", "May", "June",
-        "July", "August", "September", "October", "November", "December"
+
+def build_sales_pipeline(store_id: str, top_n: int) -> list:
+    return [
+        {"$match": {"store_id": store_id, "order_status": "1"}},
+        {"$facet": {
+            "finance_report": [
+                {"$match": {"order_date": {"$type": "date"}}},
+                {"$group": {
+                    "_id": {"$month": "$order_date"},
+                    "total_sales": {"$sum": _to_number("$total_order_price", "double")}
+                }},
+                {"$sort": {"_id": 1}}
+            ],
+            "top_selling_products": [
+                {"$unwind": "$products"},
+                {"$group": {
+                    "_id": "$products.product_id",
+                    "product_name": {"$first": "$products.product_name"},
+                    "total_quantity": {"$sum": _to_number("$products.order_quantity")},
+                    "total_sales": {"$sum": {"$multiply": [
+                        _to_number("$products.order_quantity"),
+                        {"$add": [
+                            _to_number("$products.unit_price", "double"),
+                            _to_number("$products.tax", "double")
+                        ]}
+                    ]}}
+                }},
+                {"$sort": {"total_quantity": -1, "_id": 1}},
+                {"$limit": top_n},
+                {"$project": {
+                    "_id": 0,
+                    "product_id": "$_id",
+                    "product_name": 1,
+                    "total_quantity": 1,
+                    "total_sales": {"$round": ["$total_sales", 2]}
+                }}
+            ]
+        }}
     ]
 
+
+async def get_dashboard_data(store_id: str, page: int = 1, page_size: int = 20, top_n: int = 5, loss_limit: int = 20):
+    version = _version(store_id)
+    cache_key = (store_id, *version, page, page_size, top_n, loss_limit)
+    cached = _dashboard_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    started = time.monotonic()
+
+    inventory, sales, loss_products = await asyncio.gather(
+        inventory_collection.aggregate(build_inventory_pipeline(store_id, (page - 1) * page_size, page_size)).to_list(length=1),
+        sales_orders_collection.aggregate(build_sales_pipeline(store_id, top_n)).to_list(length=1),
+        loss_orders_collection.find({"store_id": store_id}, {"_id": 0}).sort("_id", -1).limit(loss_limit).to_list(length=loss_limit)
+    )
+
+    counts = inventory[0]["counts"][0] if inventory and inventory[0]["counts"] else {}
+    sales = sales[0] if sales else {"finance_report": [], "top_selling_products": []}
+
     month_labels = []
     finance_report_data = []
-
-    for m in monthly_sales:
+    for m in sales["finance_report"]:
         month_index = m.get("_id")
         if month_index is not None and 1 <= month_index <= 12:
-            month_labels.append(months[month_index - 1])
-            finance_report_data.append(m["total_sales"])
-
-    # ---------- 7. Top Selling Products (Table) ----------
-    top_selling_pipeline = [
-        { "$unwind": "$items" },
-        { "$group": {
-            "_id": "$items.product_name",
-            "total_quantity": { "$sum": "$items.quantity" },
-            "total_sales": { "$sum": "$items.total_price" }
-        }},
-        { "$sort": { "total_quantity": -1 } },
-        { "$limit": 5 }
-    ]
-    top_selling_cursor = sales_orders_collection.aggregate(top_selling_pipeline)
-    top_selling_products = [doc async for doc in top_selling_cursor]
-
-    # ---------- 8. Loss Products Table ----------
-    loss_cursor = loss_products_collection.find({}, {"_id": 0})
-    loss_products = await loss_cursor.to_list(length=None)
+            month_labels.append(MONTHS[month_index - 1])
+            finance_report_data.append(round(m["total_sales"], 2))
 
-    return {
+    total_items = counts.get("total_items", 0)
+    data = {
         "total_items": total_items,
-        "low_stock_items": low_stock_items,
-        "out_of_stock_items": out_of_stock_items,
-        "unique_visits": unique_visits,
-        "inventory_status": inventory_status,
+        "low_stock_items": counts.get("low_stock_items", 0),
+        "out_of_stock_items": counts.get("out_of_stock_items", 0),
+        "unique_visits": 1034,  # static for now
+        "inventory_status": inventory[0]["inventory_status"] if inventory else [],
+        "inventory_pagination": {
+            "page": page,
+            "page_size": page_size,
+            "total": total_items
+        },
         "finance_report": {
             "labels": month_labels,
             "data": finance_report_data
         },
-        "top_selling_products": top_selling_products,
+        "top_selling_products": sales["top_selling_products"],
         "loss_products": loss_products
     }
-    
\ No newline at end of file
+
+    # Not cached if a write landed while this ran, or so recently that the secondary may not have it
+    if _version(store_id) == version and not _recently_written(store_id, started):
+        _dashboard_cache.set(cache_key, data)
+    return data
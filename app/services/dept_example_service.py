@@ -1,24 +1,28 @@
 
 from fastapi import HTTPException
 from app.db import db
-from app.utils.auth import create_access_token, verify_password
+from app.utils.auth import create_access_token, verify_user_password
+from app.utils.profile_cache import user_profiles
 
 
 from fastapi import HTTPException
 from app.db import db
-from app.utils.auth import create_access_token, verify_password
+from app.utils.auth import create_access_token, verify_user_password
+from app.utils.profile_cache import user_profiles
 
 
 
 from fastapi import HTTPException
 from app.db import db
-from app.utils.auth import create_access_token, verify_password
+from app.utils.auth import create_access_token, verify_user_password
+from app.utils.profile_cache import user_profiles
 
 
 
 from fastapi import HTTPException
 from app.db import db
-from app.utils.auth import create_access_token, verify_password
+from app.utils.auth import create_access_token, verify_user_password
+from app.utils.profile_cache import user_profiles
 
 
 def example_function() -> dict:
@@ -35,7 +39,7 @@ def example_function() -> dict:
 async def login(email: str, password: str):
     admin = await db.Users.find_one({"email": email})
     role= admin.get("role") if admin else None
-    if not admin or not verify_password(password, admin["password"]):
+    if not admin or not await verify_user_password(admin, password, db.Users):
         return None
 
     token = create_access_token({
@@ -54,7 +58,7 @@ async def fetch_user(request):
     user = request.state.user
 
     user_id = user.get("email")
-    res = await db.Users.find_one({"email": user_id},{"_id": 0})
+    res = await user_profiles.get(user_id)
     
     if not res:
         return HTTPException(401, "User not zFound")
@@ -69,7 +73,7 @@ async def fetch_user(request):
 async def login(email: str, password: str):
     admin = await db.Users.find_one({"email": email})
     role= admin.get("role") if admin else None
-    if not admin or not verify_password(password, admin["password"]):
+    if not admin or not await verify_user_password(admin, password, db.Users):
         return None
 
     token = create_access_token({
@@ -88,7 +92,7 @@ async def fetch_user(request):
     user = request.state.user
 
     user_id = user.get("email")
-    res = await db.Users.find_one({"email": user_id},{"_id": 0})
+    res = await user_profiles.get(user_id)
     
     if not res:
         return HTTPException(401, "User not zFound")
@@ -102,7 +106,7 @@ async def fetch_user(request):
 async def login(email: str, password: str):
     admin = await db.Users.find_one({"email": email})
     role= admin.get("role") if admin else None
-    if not admin or not verify_password(password, admin["password"]):
+    if not admin or not await verify_user_password(admin, password, db.Users):
         return None
 
     token = create_access_token({
@@ -121,7 +125,7 @@ async def fetch_user(request):
     user = request.state.user
 
     user_id = user.get("email")
-    res = await db.Users.find_one({"email": user_id},{"_id": 0})
+    res = await user_profiles.get(user_id)
     
     if not res:
         return HTTPException(401, "User not zFound")
@@ -136,7 +140,7 @@ async def fetch_user(request):
 async def login(email: str, password: str):
     admin = await db.Users.find_one({"email": email})
     role= admin.get("role") if admin else None
-    if not admin or not verify_password(password, admin["password"]):
+    if not admin or not await verify_user_password(admin, password, db.Users):
         return None
 
     token = create_access_token({
@@ -155,7 +159,7 @@ async def fetch_user(request):
     user = request.state.user
 
     user_id = user.get("email")
-    res = await db.Users.find_one({"email": user_id},{"_id": 0})
+    res = await user_profiles.get(user_id)
     
     if not res:
         return HTTPException(401, "User not zFound")
@@ -169,7 +173,7 @@ async def fetch_user(request):
 async def login(email: str, password: str):
     admin = await db.Users.find_one({"email": email})
     role= admin.get("role") if admin else None
-    if not admin or not verify_password(password, admin["password"]):
+    if not admin or not await verify_user_password(admin, password, db.Users):
         return None
 
     token = create_access_token({
@@ -188,7 +192,7 @@ async def fetch_user(request):
     user = request.state.user
 
     user_id = user.get("email")
-    res = await db.Users.find_one({"email": user_id},{"_id": 0})
+    res = await user_profiles.get(user_id)
     
     if not res:
         return HTTPException(401, "User not zFound")
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import LOW_STOCK_AUTO_REQUEST, LOW_STOCK_THRESHOLD
+from app.db import db
+from app.models.notification_model import NotificationBase, UserInfo
+from app.services.notification_service import create_notification
+from app.utils.id_sequence import next_id
+from app.utils.numeric_fields import parse_number, to_int
+
+logger = logging.getLogger(__name__)
+
+inventory_collection = db.Inventory
+requested_orders_collection = db.RequestedOrders
+
+# Error codes meaning "this deployment has no change streams" (standalone server)
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}
+
+# Set on the Inventory row while its alert is outstanding; cleared once stock is back at the reorder point
+ALERT_FIELD = "low_stock_alerted"
+ENGINE_SENDER = {"role": "system", "id": "low_stock_engine"}
+
+# Everything evaluate() and the alert need, and nothing else
+INVENTORY_FIELDS = {
+    "store_id": 1, "org_id": 1, "product_id": 1, "product_name": 1, "category": 1, "unit": 1,
+    "quantity": 1, "reorder_point": 1, "reorder_quantity": 1, ALERT_FIELD: 1,
+}
+
+# Only events that can move a product across its reorder point
+WATCH_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace"]}},
+        {"updateDescription.updatedFields.quantity": {"$exists": True}},
+        {"updateDescription.updatedFields.reorder_point": {"$exists": True}},
+    ]}},
+    # fullDocument._id must be listed explicitly: nested inclusions drop it
+    {"$project": {"operationType": 1, "fullDocument._id": 1,
+                  **{f"fullDocument.{field}": 1 for field in INVENTORY_FIELDS}}},
+]
+
+# Rows whose alert flag disagrees with their stock: "is low" != "is alerted"
+_REORDER_POINT = {"$ifNull": ["$reorder_point", LOW_STOCK_THRESHOLD]}
+NEEDS_ACTION_QUERY = {"$expr": {"$ne": [
+    {"$lt": [{"$ifNull": ["$quantity", 0]}, _REORDER_POINT]},
+    {"$eq": [{"$ifNull": [f"${ALERT_FIELD}", False]}, True]},
+]}}
+
+
+def reorder_point(doc: dict) -> int:
+    point = parse_number(doc.get("reorder_point"), int)
+    return LOW_STOCK_THRESHOLD if point is None else point
+
+
+def needs_action(doc: dict) -> bool:
+    # Pure in-memory check, run for every change event; tolerates rows the numeric migration hasn't reached
+    is_low = to_int(doc.get("quantity")) < reorder_point(doc)
+    return is_low != bool(doc.get(ALERT_FIELD))
+
+
+class LowStockEngine:
+    """Raises one alert each time a product drops below its reorder point.
+
+    A change stream on Inventory (or, without change streams, the write paths
+    calling track()) feeds a coalescing map of products to re-check. Stock that
+    did not cross the reorder point is filtered in memory; a crossing flips
+    low_stock_alerted with a guarded update, and only the worker whose update
+    matched sends the notification (and, with LOW_STOCK_AUTO_REQUEST, drafts a
+    RequestedOrders row). Restocking to the reorder point re-arms the alert.
+    """
+
+    def __init__(self):
+        # (store_id, product_id) -> latest document, or None when it has to be read first
+        self._pending: Dict[Tuple[str, str], Optional[dict]] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+        self.mode = "stopped"  # "change_stream" | "local" | "stopped"
+
+    # ───────────────────────── INPUT
+    def _enqueue(self, key: Tuple[str, str], doc: Optional[dict]):
+        # Bursts of sells on one product collapse into a single evaluation of its latest state
+        if doc is not None or key not in self._pending:
+            self._pending[key] = doc
+        self._wakeup.set()
+
+    def track(self, store_id: Optional[str], product_ids: Iterable[str]):
+        # Write-path hook; the change stream already sees every write when it is running
+        if self.mode != "local":
+            return
+        for product_id in product_ids:
+            if product_id:
+                self._enqueue((store_id, product_id), None)
+
+    # ───────────────────────── EVALUATION
+    async def _load(self, keys) -> list:
+        by_store: Dict[Optional[str], list] = {}
+        for store_id, product_id in keys:
+            by_store.setdefault(store_id, []).append(product_id)
+
+        docs = []
+        for store_id, product_ids in by_store.items():
+            query = {"product_id": {"$in": product_ids}}
+            if store_id is not None:
+                query["store_id"] = store_id
+            docs.extend(await inventory_collection.find(query, INVENTORY_FIELDS).to_list(length=None))
+        return docs
+
+    async def evaluate(self, doc: dict):
+        if not needs_action(doc):
+            return
+        point = reorder_point(doc)
+
+        if doc.get(ALERT_FIELD):
+            # Restocked: re-arm so the next drop alerts again
+            await inventory_collection.update_one(
+                {"_id": doc["_id"], ALERT_FIELD: True, "quantity": {"$gte": point}},
+                {"$set": {ALERT_FIELD: False}}
+            )
+            return
+
+        result = await inventory_collection.update_one(
+            {"_id": doc["_id"], ALERT_FIELD: {"$ne": True}, "quantity": {"$lt": point}},
+            {"$set": {ALERT_FIELD: True, "low_stock_alerted_at": datetime.utcnow()}}
+        )
+        if result.modified_count == 0:
+            return  # another worker got there first, or stock moved back
+
+        try:
+            await self._alert(doc, point)
+        except Exception:
+            # Leave the flag unset so the next change retries the alert
+            logger.exception("Low stock alert failed for %s/%s", doc.get("store_id"), doc.get("product_id"))
+            await inventory_collection.update_one({"_id": doc["_id"]}, {"$set": {ALERT_FIELD: False}})
+
+    async def _alert(self, doc: dict, point: int):
+        name = doc.get("product_name") or doc.get("product_id")
+        quantity = to_int(doc.get("quantity"))
+        unit = doc.get("unit") or "pcs"
+
+        request_id = None
+        if LOW_STOCK_AUTO_REQUEST:
+            request_id = await self._draft_request(doc, point)
+
+        message = f"{name} ({doc.get('product_id')}) is down to {quantity} {unit}; its reorder point is {point}."
+        if request_id:
+            message += f" Draft request {request_id} was created."
+
+        notification = NotificationBase(
+            sender=UserInfo(**ENGINE_SENDER, store_id=doc.get("store_id")),
+            type_of_notification="low_stock",
+            title=f"Low stock: {name}",
+            message=message,
+        )
+        await create_notification(notification, admin=True, procurement=True)
+
+    async def _draft_request(self, doc: dict, point: int) -> str:
+        # Without a reorder_quantity, order enough to get back to twice the reorder point
+        quantity = doc.get("reorder_quantity") or max(2 * point - to_int(doc.get("quantity")), 1)
+        request_id = await next_id(requested_orders_collection, "request_id", "REQ")
+        await requested_orders_collection.insert_one({
+            "request_id": request_id,
+            "org_id": doc.get("org_id"),
+            "store_id": doc.get("store_id"),
+            "product_id": doc.get("product_id"),
+            "product_name": doc.get("product_name"),
+            "quantity": quantity,
+            "unit": doc.get("unit") or "pcs",
+            "category": doc.get("category", "general"),
+            "estimate_date": datetime.utcnow().strftime("%Y-%m-%d"),
+            "status": "draft",
+            "source": "low_stock",
+            "requested_by": ENGINE_SENDER,
+            "created_at": datetime.utcnow(),
+        })
+        return request_id
+
+    async def _work(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+
+            try:
+                docs = [doc for doc in pending.values() if doc is not None]
+                docs.extend(await self._load([key for key, doc in pending.items() if doc is None]))
+                for doc in docs:
+                    await self.evaluate(doc)
+            except Exception:
+                # Keep the worker alive; the products are re-checked on their next change or sweep
+                logger.exception("Low stock evaluation failed, %s product(s) skipped", len(pending))
+
+    async def sweep(self) -> int:
+        # Catches up on anything that changed while no stream was watching
+        count = 0
+        async for doc in inventory_collection.find(NEEDS_ACTION_QUERY, INVENTORY_FIELDS):
+            self._enqueue((doc.get("store_id"), doc.get("product_id")), doc)
+            count += 1
+        return count
+
+    # ───────────────────────── SOURCE
+    async def _watch(self):
+        resume_token = None
+        delay = 1
+        while True:
+            try:
+                async with inventory_collection.watch(
+                    WATCH_PIPELINE, full_document="updateLookup", resume_after=resume_token
+                ) as stream:
+                    self.mode = "change_stream"
+                    delay = 1
+                    if resume_token is None:
+                        await self.sweep()
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change.get("fullDocument")
+                        # None when the row was deleted before the lookup
+                        try:
+                            if doc is not None and needs_action(doc):
+                                self._enqueue((doc.get("store_id"), doc.get("product_id")), doc)
+                        except Exception:
+                            # One odd row must not end the watch
+                            logger.exception("Could not check change for %s", doc.get("_id"))
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable, low stock alerts follow this worker's writes: %s", e)
+                    self.mode = "local"
+                    try:
+                        await self.sweep()
+                    except PyMongoError as sweep_error:
+                        logger.warning("Low stock sweep failed: %s", sweep_error)
+                    return
+                logger.warning("Inventory change stream failed, reconnecting: %s", e)
+                # e.g. the resume point fell off the oplog: start fresh, the sweep covers the gap
+                resume_token = None
+            except PyMongoError as e:
+                logger.warning("Inventory change stream failed, reconnecting: %s", e)
+
+            # While reconnecting, this worker's own writes are still checked
+            self.mode = "local"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def start(self):
+        if not self._tasks:
+            self.mode = "local"
+            self._tasks = [asyncio.create_task(self._work()), asyncio.create_task(self._watch())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.mode = "stopped"
+
+
+low_stock_engine = LowStockEngine()
@@ -1,14 +1,26 @@
-import random
-from typing import Optional
+import base64
+import json
+from collections import Counter
+from typing import List, Optional
 from fastapi import HTTPException
+from pymongo import DESCENDING, ReturnDocument, UpdateOne
 from app.models.notification_model import NotificationBase
-from datetime import datetime
+from datetime import datetime, timedelta
 from app.db import db
 from bson import ObjectId
+from bson.errors import InvalidId
 from uuid import uuid4
+from app.config import NOTIFICATION_FANOUT_THRESHOLD, UNREAD_COUNTER_RESEED_SECONDS
 
 # Accessing Notifications collection without needing db.Notifications
 notifications_collection = db.Notifications
+# Shared content of large broadcasts; Notifications rows point at it through message_id
+notification_messages_collection = db.NotificationMessages
+SHARED_MESSAGE_FIELDS = ("sender", "type_of_notification", "title", "message", "emails")
+# Unread count per receiver email: {"_id": email, "unread": int, "seeded_at": datetime}
+notification_counters_collection = db.NotificationCounters
+# Called with the inserted rows after every fan-out (the push broker registers here)
+notification_listeners = []
 
 # async def create_notification(
 #     notification: NotificationBase,
@@ -80,6 +92,36 @@ notifications_collection = db.Notifications
 #         "message": f"{len(responses)} notification(s) sent successfully",
 #         "notifications": responses
 #     }
+def _new_notification_id() -> ObjectId:
+    # ObjectIds are unique per process/counter, so IDs no longer collide under load
+    return ObjectId()
+
+
+async def resolve_recipients(roles: List[str], store_id: Optional[str], emails: Optional[List[str]] = None) -> List[dict]:
+    # One query for every selected role instead of one per role
+    user_query = {
+        "role": {"$in": roles},
+        "store_id": store_id
+    }
+    if emails:
+        user_query["email"] = {"$in": emails}
+
+    users = await db.Users.find(user_query, {"_id": 0, "id": 1, "role": 1, "store_id": 1, "email": 1}).to_list(length=None)
+
+    recipients = []
+    for user in users:
+        if not user.get("id"):
+            print(f"⚠️ User missing 'id': {user}")
+            continue
+        recipients.append({
+            "role": user.get("role"),
+            "id": user["id"],
+            "store_id": user.get("store_id"),
+            "email": user.get("email")
+        })
+    return recipients
+
+
 async def create_notification(
     notification: NotificationBase,
     admin: Optional[bool] = False,
@@ -92,64 +134,81 @@ async def create_notification(
     data["date"] = now.strftime('%Y-%m-%d')
     data["time"] = now.strftime('%H:%M')
     data["status"] = 0
+    data["created_at"] = datetime.utcnow()
 
     selected_roles = {
         "admin": admin,
         "sales": sales,
         "procurement": procurement,
     }
-
-    sender_store_id = notification.sender.store_id
-    target_emails = notification.emails or []
-    responses = []
-
-    for role, send_flag in selected_roles.items():
-        if not send_flag:
-            continue
-
-        user_query = {
-            "role": role,
-            "store_id": sender_store_id
+    roles = [role for role, send_flag in selected_roles.items() if send_flag]
+    if not roles:
+        return {"message": "0 notification(s) sent successfully", "notifications": []}
+
+    recipients = await resolve_recipients(roles, notification.sender.store_id, notification.emails)
+
+    if len(recipients) > NOTIFICATION_FANOUT_THRESHOLD:
+        # Large broadcast: store the content once, recipients only get a read-state row
+        message_id = _new_notification_id()
+        await notification_messages_collection.insert_one({
+            "_id": message_id,
+            **{field: data.get(field) for field in SHARED_MESSAGE_FIELDS},
+            "recipient_count": len(recipients),
+            "created_at": data["created_at"]
+        })
+        base = {
+            "message_id": message_id,
+            "status": 0,
+            "date": data["date"],
+            "time": data["time"],
+            "created_at": data["created_at"]
         }
-        if target_emails:
-            user_query["email"] = {"$in": target_emails}
-
-        users = await db.Users.find(user_query).to_list(length=None)
-
-        for user in users:
-            user_id = user.get("id")
-            if not user_id:
-                print(f"⚠️ User missing 'id': {user}")
-                continue
-
-            # ✅ Use UUID or timestamp ID
-            notification_id = f"NOTI{datetime.utcnow().strftime('%Y%m%d%H%M%S')}{random.randint(100, 999)}"
-            # Or: notification_id = str(uuid4())
-
-            new_data = data.copy()
-            new_data["notification_id"] = notification_id
-            new_data["receiver"] = {
-                "role": role,
-                "id": user_id,
-                "store_id": user.get("store_id"),
-                "email": user.get("email")
-            }
-            new_data["created_at"] = datetime.utcnow()
-
-            result = await notifications_collection.insert_one(new_data)
-
-            responses.append({
-                "notification_id": notification_id,
-                "receiver_id": user_id,
-                "mongo_id": str(result.inserted_id)
-            })
+    else:
+        base = data
+
+    documents = []
+    for receiver in recipients:
+        _id = _new_notification_id()
+        documents.append({**base, "_id": _id, "notification_id": f"NOTI{_id}", "receiver": receiver})
+
+    if documents:
+        await notifications_collection.insert_many(documents, ordered=False)
+        await _bump_unread(Counter(doc["receiver"]["email"] for doc in documents))
+        for listener in notification_listeners:
+            listener(documents)
+
+    responses = [{
+        "notification_id": doc["notification_id"],
+        "receiver_id": doc["receiver"]["id"],
+        "mongo_id": str(doc["_id"])
+    } for doc in documents]
 
     return {
         "message": f"{len(responses)} notification(s) sent successfully",
         "notifications": responses
     }
 
-   
+
+async def hydrate_notifications(notifications: List[dict]) -> List[dict]:
+    # Fill broadcast read-state rows with their shared message; fields set on the row itself win
+    message_ids = list({n["message_id"] for n in notifications if n.get("message_id")})
+    if not message_ids:
+        return notifications
+
+    messages = {}
+    async for message in notification_messages_collection.find({"_id": {"$in": message_ids}}):
+        messages[message["_id"]] = {field: message.get(field) for field in SHARED_MESSAGE_FIELDS}
+
+    for notif in notifications:
+        if not notif.get("message_id"):
+            continue
+        # A message that has since been removed leaves the row as is
+        for field, value in messages.get(notif["message_id"], {}).items():
+            notif.setdefault(field, value)
+        # Always a string: a raw ObjectId would fail response serialization
+        notif["message_id"] = str(notif["message_id"])
+    return notifications
+
 async def get_all_notifications(user: dict, status: Optional[int] = None):
     print("User:", user)
 
@@ -171,6 +230,7 @@ async def get_all_notifications(user: dict, status: Optional[int] = None):
         ("time", -1)
     ]).to_list(length=None)
 
+    await hydrate_notifications(notifications)
     for notif in notifications:
         notif["_id"] = str(notif["_id"])  # Convert ObjectId to string
 
@@ -197,20 +257,26 @@ async def update_notification_by_id(notification_id: str, update_data):
             raise HTTPException(status_code=400, detail="No valid update data provided")
             
         try:
-            result = await notifications_collection.update_one(
+            # The previous status decides whether the unread counter moves
+            previous = await notifications_collection.find_one_and_update(
                 {"_id": ObjectId(notification_id)},
-                {"$set": update_dict}
+                {"$set": update_dict},
+                return_document=ReturnDocument.BEFORE
             )
         except Exception as db_error:
             raise HTTPException(status_code=500, detail=f"Database error: {str(db_error)}")
 
-        if result.matched_count == 0:
+        if previous is None:
             raise HTTPException(status_code=404, detail="Notification not found")
-        
-        # Get the updated document
-        updated_doc = await notifications_collection.find_one({"_id": ObjectId(notification_id)})
-        if updated_doc:
-            updated_doc["_id"] = str(updated_doc["_id"])
+
+        updated_doc = {**previous, **update_dict}
+        was_unread = previous.get("status") == 0
+        is_unread = updated_doc.get("status") == 0
+        if was_unread != is_unread:
+            await _bump_unread({(previous.get("receiver") or {}).get("email"): 1 if is_unread else -1})
+
+        await hydrate_notifications([updated_doc])
+        updated_doc["_id"] = str(updated_doc["_id"])
         
         return updated_doc
             
@@ -221,7 +287,111 @@ async def update_notification_by_id(notification_id: str, update_data):
 
 
 async def delete_notification_by_id(notification_id: str):
-    result = await notifications_collection.delete_one({"_id": ObjectId(notification_id)})
-    if result.deleted_count == 0:
+    deleted = await notifications_collection.find_one_and_delete(
+        {"_id": ObjectId(notification_id)},
+        {"status": 1, "receiver.email": 1}
+    )
+    if deleted is None:
         raise ValueError("Notification not found")
-    return {"message": "Notification deleted"}
\ No newline at end of file
+    if deleted.get("status") == 0:
+        await _bump_unread({(deleted.get("receiver") or {}).get("email"): -1})
+    return {"message": "Notification deleted"}
+
+
+# ───────────────────────── UNREAD COUNTERS
+async def _bump_unread(deltas: dict):
+    # No upsert: a user's counter is seeded by a full count on their first read, then kept in step here
+    operations = [
+        UpdateOne({"_id": email}, {"$inc": {"unread": delta}})
+        for email, delta in deltas.items() if email and delta
+    ]
+    if operations:
+        await notification_counters_collection.bulk_write(operations, ordered=False)
+
+
+def _receiver_filter(user: dict) -> dict:
+    return {"$or": [
+        {"receiver.id": str(user["id"])},
+        {"receiver.email": user.get("email")}
+    ]}
+
+
+async def _seed_unread(user: dict, replace: bool) -> int:
+    email = user.get("email")
+    unread = await notifications_collection.count_documents({**_receiver_filter(user), "status": 0})
+    seed = {"unread": unread, "seeded_at": datetime.utcnow()}
+    if replace:
+        await notification_counters_collection.update_one({"_id": email}, {"$set": seed}, upsert=True)
+        return unread
+
+    # Insert-only: a counter another request created meanwhile already has bumps this count may not see
+    result = await notification_counters_collection.update_one({"_id": email}, {"$setOnInsert": seed}, upsert=True)
+    if result.upserted_id is None:
+        counter = await notification_counters_collection.find_one({"_id": email})
+        return counter["unread"]
+    return unread
+
+
+async def get_unread_count(user: dict) -> int:
+    # Bumps that race a seed or a recount can still be lost, so every counter is
+    # recounted once it is UNREAD_COUNTER_RESEED_SECONDS old (or negative)
+    counter = await notification_counters_collection.find_one({"_id": user.get("email")})
+    if counter is None:
+        return await _seed_unread(user, replace=False)
+
+    seeded_at = counter.get("seeded_at")
+    fresh = seeded_at is not None and datetime.utcnow() - seeded_at < timedelta(seconds=UNREAD_COUNTER_RESEED_SECONDS)
+    if fresh and counter.get("unread", 0) >= 0:
+        return counter["unread"]
+    return await _seed_unread(user, replace=True)
+
+
+# ───────────────────────── INBOX (keyset pagination on created_at, _id)
+def _encode_cursor(doc: dict) -> str:
+    created_at = doc.get("created_at")
+    raw = json.dumps({
+        "t": created_at.isoformat() if isinstance(created_at, datetime) else None,
+        "id": str(doc["_id"])
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        last_id = ObjectId(raw["id"])
+        created_at = datetime.fromisoformat(raw["t"]) if raw.get("t") else None
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Rows without created_at sort after every dated row in descending order
+    if created_at is None:
+        return {"created_at": None, "_id": {"$lt": last_id}}
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "_id": {"$lt": last_id}},
+        {"created_at": None}
+    ]}
+
+
+async def get_notification_inbox(user: dict, limit: int = 20, cursor: Optional[str] = None, status: Optional[int] = None):
+    conditions = [_receiver_filter(user)]
+    if status is not None:
+        conditions.append({"status": status})
+    if cursor:
+        conditions.append(_decode_cursor(cursor))
+
+    # One extra row tells us whether another page exists
+    notifications = await notifications_collection.find({"$and": conditions}).sort([
+        ("created_at", DESCENDING),
+        ("_id", DESCENDING)
+    ]).limit(limit + 1).to_list(length=limit + 1)
+
+    next_cursor = _encode_cursor(notifications[limit - 1]) if len(notifications) > limit else None
+    notifications = notifications[:limit]
+
+    await hydrate_notifications(notifications)
+    for notif in notifications:
+        notif["_id"] = str(notif["_id"])
+
+    return {"notifications": notifications, "next_cursor": next_cursor}
\ No newline at end of file
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+from app.services.notification_service import (
+    hydrate_notifications, notification_listeners, notifications_collection
+)
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Error codes meaning "this deployment has no change streams" (standalone server)
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324}
+SUBSCRIBER_QUEUE_SIZE = 100
+MAX_REPLAY = 100
+# How long a row pushed in local mode is remembered, so the resumed change stream does not push it again
+LOCAL_PUBLISHED_TTL_SECONDS = 600
+LOCAL_PUBLISHED_MAX = 10000
+
+
+class NotificationBroker:
+    """Fans new notifications out to connected SSE sessions in this worker.
+
+    Fed by one change stream on Notifications shared by every session, so
+    inserts from any API worker reach every connected user. Deployments
+    without change streams (standalone mongod) fall back to the rows
+    published in-process by create_notification.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[tuple, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.mode = "stopped"  # "change_stream" | "local" | "stopped"
+        # _ids pushed while reconnecting; resuming from the last token replays them
+        self._published_locally = TTLCache(maxsize=LOCAL_PUBLISHED_MAX, ttl=LOCAL_PUBLISHED_TTL_SECONDS)
+
+    # ───────────────────────── SUBSCRIPTIONS
+    @staticmethod
+    def _keys(user: dict) -> List[tuple]:
+        keys = [("id", str(user.get("id")))]
+        if user.get("email"):
+            keys.append(("email", user["email"]))
+        return keys
+
+    @asynccontextmanager
+    async def subscribe(self, user: dict):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        keys = self._keys(user)
+        for key in keys:
+            self._subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            for key in keys:
+                queues = self._subscribers.get(key)
+                if queues is not None:
+                    queues.discard(queue)
+                    if not queues:
+                        self._subscribers.pop(key, None)
+
+    @property
+    def connections(self) -> int:
+        return len({id(q) for queues in self._subscribers.values() for q in queues})
+
+    # ───────────────────────── FAN-OUT
+    async def _publish(self, documents: List[dict]):
+        # Match first, so only rows somebody is listening for get hydrated
+        targets = []
+        for doc in documents:
+            receiver = doc.get("receiver") or {}
+            queues = set()
+            queues |= self._subscribers.get(("id", str(receiver.get("id"))), set())
+            queues |= self._subscribers.get(("email", receiver.get("email")), set())
+            if queues:
+                targets.append((dict(doc), queues))
+        if not targets:
+            return
+
+        await hydrate_notifications([doc for doc, _ in targets])
+        for doc, queues in targets:
+            for queue in queues:
+                if queue.full():
+                    # Slow client: drop its oldest event rather than block everyone else
+                    queue.get_nowait()
+                queue.put_nowait(doc)
+
+    def _on_local_insert(self, documents: List[dict]):
+        if self.mode == "local" and self._subscribers:
+            for doc in documents:
+                self._published_locally.set(doc["_id"], True)
+            asyncio.get_running_loop().create_task(self._publish(documents))
+
+    # ───────────────────────── SOURCE
+    async def _watch(self):
+        resume_token = None
+        delay = 1
+        while True:
+            try:
+                async with notifications_collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    self.mode = "change_stream"
+                    delay = 1
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change["fullDocument"]
+                        if self._published_locally.pop(doc["_id"]) is None:
+                            await self._publish([doc])
+            except OperationFailure as e:
+                if e.code in CHANGE_STREAM_UNSUPPORTED:
+                    logger.info("Change streams unavailable, notification push uses in-process events: %s", e)
+                    self.mode = "local"
+                    return
+                logger.warning("Notification change stream failed, reconnecting: %s", e)
+            except PyMongoError as e:
+                logger.warning("Notification change stream failed, reconnecting: %s", e)
+
+            # While reconnecting, rows inserted by this worker are still pushed
+            self.mode = "local"
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def start(self):
+        if self._task is None:
+            notification_listeners.append(self._on_local_insert)
+            self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            notification_listeners.remove(self._on_local_insert)
+        self.mode = "stopped"
+
+
+notification_broker = NotificationBroker()
+
+
+def _sse(doc: dict) -> str:
+    doc["_id"] = str(doc["_id"])
+    return f"id: {doc['_id']}\nevent: notification\ndata: {json.dumps(doc, default=str)}\n\n"
+
+
+async def _missed_since(user: dict, last_event_id: Optional[str]) -> List[dict]:
+    # EventSource resends Last-Event-ID on reconnect; replay what arrived in between
+    try:
+        last_id = ObjectId(last_event_id)
+    except (InvalidId, TypeError):
+        return []
+
+    missed = await notifications_collection.find({
+        "$or": [{"receiver.id": str(user["id"])}, {"receiver.email": user.get("email")}],
+        "_id": {"$gt": last_id}
+    }).sort("_id", ASCENDING).limit(MAX_REPLAY).to_list(length=MAX_REPLAY)
+    return await hydrate_notifications(missed)
+
+
+async def notification_events(request, user: dict, last_event_id: Optional[str] = None):
+    async with notification_broker.subscribe(user) as queue:
+        yield "retry: 5000\n\n"
+        for doc in await _missed_since(user, last_event_id):
+            yield _sse(doc)
+
+        while not await request.is_disconnected():
+            try:
+                doc = await asyncio.wait_for(queue.get(), NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield _sse(doc)
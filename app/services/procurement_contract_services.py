@@ -11,6 +11,7 @@ from typing import Dict
 from app.db import db  # Make sure this is your MongoDB client instance
 from app.models.procurement_models import ContractUpdate  # Your Pydantic model
 from bson import ObjectId
+from app.utils.dates import to_bson_date
 
 from datetime import datetime
 
@@ -85,6 +86,8 @@ async def update_contract_status(contract_id: str, store_id: str, action: str):
                 "contract_id": contract_id,
                 "vendor_name": contract["vendor_name"],
                 "delivery_date": contract["date_of_delivery"],
+                # BSON copy of delivery_date for the dashboard's month buckets
+                "delivery_date_at": to_bson_date(contract["date_of_delivery"]),
                 "validation_status": "Pending",
                 "product_name": contract.get("product_name"),
                 "amount": float(float(contract["quantity"]) * float(contract["unit_price"])),
@@ -1,68 +1,101 @@
-from app.db import db
+import asyncio
+from app.db import ANALYTICS, db_for, db as primary_db
 from typing import List
 from app.models.procurement_models import ProcurementDashboardResponse, MonthlyStats, SupplierContract
-from datetime import datetime
-from collections import defaultdict
-
-def extract_month(date_str: str) -> str:
-    try:
-        # Try ISO 8601 format with time
-        dt = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
-    except ValueError:
-        try:
-            # Try YYYY-MM-DD format
-            dt = datetime.strptime(date_str, "%Y-%m-%d")
-        except ValueError:
-            return None
-    return dt.strftime("%b")  # Returns 'Jan', 'Feb', etc.
+
+# Consistency class: dashboard reads may lag the primary (see app/db.py); the backfill writes through primary_db
+CONSISTENCY = ANALYTICS
+db = db_for(CONSISTENCY)
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+
+def month_date(at_field: str, string_field: str) -> dict:
+    # Rows written before the *_at fields existed only have the string; parse it server-side
+    return {"$ifNull": [
+        "$" + at_field,
+        {"$cond": [
+            {"$eq": [{"$type": "$" + string_field}, "string"]},
+            {"$dateFromString": {"dateString": "$" + string_field, "onError": None, "onNull": None}},
+            None
+        ]}
+    ]}
+
+
+def month_histogram(source: str) -> list:
+    return [
+        {"$match": {"source": source, "month_date": {"$ne": None}}},
+        {"$group": {"_id": {"$month": "$month_date"}, "count": {"$sum": 1}}}
+    ]
+
+
+def build_procurement_dashboard_pipeline(store_id: str) -> list:
+    """One round trip over PurchaseOrders, ReturnOrders and Contracts of a store.
+
+    Each collection is filtered on store_id (indexed) before the union, then
+    a $facet computes every figure of the dashboard.
+    """
+    return [
+        {"$match": {"store_id": store_id}},
+        {"$project": {
+            "_id": 0,
+            "source": "po",
+            "validation_status": 1,
+            "month_date": month_date("delivery_date_at", "delivery_date")
+        }},
+        {"$unionWith": {"coll": "ReturnOrders", "pipeline": [
+            {"$match": {"store_id": store_id}},
+            {"$project": {"_id": 0, "source": "ro", "month_date": month_date("return_date_at", "return_date")}}
+        ]}},
+        {"$unionWith": {"coll": "Contracts", "pipeline": [
+            {"$match": {"store_id": store_id}},
+            {"$project": {
+                "_id": 0, "source": "contract", "status": 1, "created_at": 1,
+                "vendor_name": 1, "contract_value": 1
+            }}
+        ]}},
+        {"$facet": {
+            "total_purchase_orders": [{"$match": {"source": "po"}}, {"$count": "count"}],
+            "pending_validations": [{"$match": {"source": "po", "validation_status": "Pending"}}, {"$count": "count"}],
+            "returns_initiated": [{"$match": {"source": "ro"}}, {"$count": "count"}],
+            "active_contracts": [{"$match": {"source": "contract", "status": "accepted"}}, {"$count": "count"}],
+            "orders_by_month": month_histogram("po"),
+            "returns_by_month": month_histogram("ro"),
+            "recent_contracts": [
+                {"$match": {"source": "contract"}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": 3}
+            ]
+        }}
+    ]
+
+
+def _count(facets: dict, name: str) -> int:
+    rows = facets.get(name) or []
+    return rows[0]["count"] if rows else 0
+
 
 async def get_procurement_dashboard_data(store_id: str) -> ProcurementDashboardResponse:
-    # 1. Basic Stats
-    total_pos = await db.PurchaseOrders.count_documents({"store_id": store_id})
-    
-    pending_validations = await db.PurchaseOrders.count_documents({
-        "store_id": store_id,
-        "validation_status": "Pending"
-    })
-    
-    active_contracts = await db.Contracts.count_documents({
-        "store_id": store_id,
-        "status": "accepted"
-    })
-
-    returns_initiated = await db.ReturnOrders.count_documents({"store_id": store_id})
-
-    # 2. Monthly Stats
-    po_by_month = defaultdict(int)
-    async for doc in db.PurchaseOrders.find({"store_id": store_id}):
-        if delivery_date := doc.get("delivery_date"):
-            month = extract_month(delivery_date)
-            if month:
-                po_by_month[month] += 1
-
-    ro_by_month = defaultdict(int)
-    async for doc in db.ReturnOrders.find({"store_id": store_id}):
-        if return_date := doc.get("return_date"):
-            month = extract_month(return_date)
-            if month:
-                ro_by_month[month] += 1
-
-    months_ordered = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", 
-                      "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-    
+    rows = await db.PurchaseOrders.aggregate(build_procurement_dashboard_pipeline(store_id)).to_list(length=1)
+    facets = rows[0] if rows else {}
+
+    # Monthly Stats (month number 1-12 -> "Jan".."Dec")
+    po_by_month = {row["_id"]: row["count"] for row in facets.get("orders_by_month", [])}
+    ro_by_month = {row["_id"]: row["count"] for row in facets.get("returns_by_month", [])}
+
     monthly_data = [
         MonthlyStats(
             month=m,
-            orders=po_by_month.get(m, 0),
-            returns=ro_by_month.get(m, 0)
-        ) for m in months_ordered
+            orders=po_by_month.get(i, 0),
+            returns=ro_by_month.get(i, 0)
+        ) for i, m in enumerate(MONTHS, start=1)
     ]
 
-    # 3. Recent Supplier Contracts
-    contracts_cursor = db.Contracts.find({"store_id": store_id}).sort("created_at", -1).limit(3)
+    # Recent Supplier Contracts
     contracts: List[SupplierContract] = []
 
-    async for doc in contracts_cursor:
+    for doc in facets.get("recent_contracts", []):
         raw_value = doc.get("contract_value", 0)
         value = f"₹{int(raw_value):,}" if isinstance(raw_value, (int, float)) else str(raw_value or "₹0")
 
@@ -73,11 +106,34 @@ async def get_procurement_dashboard_data(store_id: str) -> ProcurementDashboardR
         ))
 
     return ProcurementDashboardResponse(
-        total_purchase_orders=total_pos,
-        pending_validations=pending_validations,
-        active_contracts=active_contracts,
-        returns_initiated=returns_initiated,
+        total_purchase_orders=_count(facets, "total_purchase_orders"),
+        pending_validations=_count(facets, "pending_validations"),
+        active_contracts=_count(facets, "active_contracts"),
+        returns_initiated=_count(facets, "returns_initiated"),
         monthly_data=monthly_data,
         supplier_contracts=contracts
     )
-    
\ No newline at end of file
+
+
+# ───────────────────────── BACKFILL
+async def backfill_dashboard_dates() -> dict:
+    # Copy legacy delivery_date / return_date strings into BSON dates, once per row
+    result = {}
+    for collection, at_field, string_field in (
+        (primary_db.PurchaseOrders, "delivery_date_at", "delivery_date"),
+        (primary_db.ReturnOrders, "return_date_at", "return_date"),
+    ):
+        res = await collection.update_many(
+            {at_field: {"$exists": False}, string_field: {"$type": "string"}},
+            [{"$set": {at_field: {"$dateFromString": {"dateString": "$" + string_field, "onError": None, "onNull": None}}}}]
+        )
+        result[collection.name] = res.modified_count
+    return result
+
+
+# python -m app.services.procurement_dashboard_service
+if __name__ == "__main__":
+    async def _main():
+        print(f"Backfilled dashboard dates: {await backfill_dashboard_dates()}")
+
+    asyncio.run(_main())
@@ -3,7 +3,12 @@ from fastapi import HTTPException
 from app.models.procurement_models import Product
 from app.utils.auth import verify_password, create_access_token
 from app.db import db  
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.low_stock_engine import low_stock_engine
 from bson.objectid import ObjectId
+from typing import Optional
+from app.utils.numeric_fields import to_int, typed_doc
+from app.utils.pagination import Page, find_page, shape_row
 
 
 async def add_product_service(product: Product):
@@ -17,7 +22,9 @@ async def add_product_service(product: Product):
         # Insert the product into the collection
         # product = product.model_dump()  
         # product["store_id"] = store_id
-        await db.Inventory.insert_one(product.model_dump())
+        await db.Inventory.insert_one(typed_doc("Inventory", product.model_dump()))
+        invalidate_store_dashboard(product.store_id)
+        low_stock_engine.track(product.store_id, [product.product_id])
 
         return {
             "message": "Product added successfully",
@@ -29,23 +36,21 @@ async def add_product_service(product: Product):
     
 
 
-async def get_all_products(store_id: str):
+async def get_all_products(store_id: str, page: Optional[Page] = None):
     try:
-        products_cursor = db.Inventory.find({"store_id": store_id}, {"_id": 0})
+        products_cursor = await find_page(page, db.Inventory, {"store_id": store_id}, {"_id": 0},
+                                          sort_fields=("product_name", "product_id"), required=("quantity",))
         products = []
-        async for product in products_cursor:
+        for product in products_cursor:
            
             # product["_id"] = str(product["_id"])  # Convert ObjectId to string
             
-            try:
-                quantity = int(product.get("quantity", 0))
-            except (ValueError, TypeError):
-                quantity = 0
-
-            product["status"] = "Stock-in" if quantity > 0 else "Stock-out"
-            products.append(product)
+            product["status"] = "Stock-in" if to_int(product.get("quantity")) > 0 else "Stock-out"
+            products.append(shape_row(page, product))
 
         return products
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving products: {str(e)}")
     
@@ -57,14 +62,8 @@ async def get_product_by_id(product_id: str):
             {"_id": 0}  # Exclude MongoDB _id
         )
 
-        raw_quantity = product_data.get("quantity", 0)
-        try:
-            quantity = int(raw_quantity)
-        except (ValueError, TypeError):
-            quantity = 0
-
         # Compute status without storing in DB
-        status = "Stock-in" if quantity > 0 else "Stock-out"
+        status = "Stock-in" if to_int(product_data.get("quantity")) > 0 else "Stock-out"
 
         product = Product(**product_data)
         product.status = status
@@ -77,7 +76,7 @@ async def get_product_by_id(product_id: str):
     
 async def update_product_by_id(product_id: str, data: Product):
     try:
-        update_data = {k: v for k, v in data.model_dump().items() if v is not None}
+        update_data = typed_doc("Inventory", {k: v for k, v in data.model_dump().items() if v is not None})
 
         if not update_data:
             raise HTTPException(status_code=400, detail="No update fields provided.")
@@ -89,6 +88,8 @@ async def update_product_by_id(product_id: str, data: Product):
 
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Product not found.")
+        invalidate_store_dashboard()
+        low_stock_engine.track(None, [product_id])
 
         return {"message": "Product updated successfully."}
 
@@ -100,6 +101,7 @@ async def delete_product_service(product_id: str):
         result = await db.Inventory.delete_one({"product_id": product_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Product not found.")
+        invalidate_store_dashboard()
         return True
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error deleting product: {str(e)}")
@@ -2,13 +2,17 @@ from fastapi import HTTPException
 from app.models.procurement_models import LossOrder
 from app.db import db  
 from bson.objectid import ObjectId
+from typing import Optional
+from app.utils.pagination import Page, find_page, shape_row
 
 #List of Loss Orders
-async def get_loss_orders_by_store(store_id: str):
-    cursor = db.LossOrders.find({"store_id": store_id})
+async def get_loss_orders_by_store(store_id: str, page: Optional[Page] = None):
+    cursor = await find_page(page, db.LossOrders, {"store_id": store_id},
+                             sort_fields=("date_reported", "product_id"),
+                             required=("quantity_lost", "unit_price"))
     loss_orders = []
 
-    async for order in cursor:
+    for order in cursor:
         order.pop("_id", None)
 
         quantity = order.get("quantity_lost", 0)
@@ -22,9 +26,10 @@ async def get_loss_orders_by_store(store_id: str):
         # ✅ Add `loss_amount` just for response
         order["loss_amount"] = round(loss, 2)
 
-        loss_orders.append(order)
+        loss_orders.append(shape_row(page, order))
 
-    if not loss_orders:
+    # Past the last page is an empty page, not a missing store
+    if not loss_orders and not (page and page.cursor):
         raise HTTPException(status_code=404, detail="No loss orders found for this store.")
 
     return loss_orders
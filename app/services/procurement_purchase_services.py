@@ -1,6 +1,8 @@
 from fastapi import HTTPException
 from app.db import db
 from app.models.procurement_models import PurchaseOrderResponse
+from typing import Optional
+from app.utils.pagination import Page, find_page, shape_row
 
 purchase_orders_collection = db["PurchaseOrders"]
 
@@ -8,10 +10,14 @@ purchase_orders_collection = db["PurchaseOrders"]
 RECEIVED_MAP = {0: "Waiting", 1: "Received"}
 VALIDATION_MAP = {0: "Pending", 1: "Completed"}
 
-async def get_all_purchase_orders(store_id: str):
-    cursor = purchase_orders_collection.find({"store_id": store_id}, {"_id": 0})
+async def get_all_purchase_orders(store_id: str, page: Optional[Page] = None):
+    # Only the fields the response model shows are read from the collection
+    projection = {"_id": 0, **{field: 1 for field in PurchaseOrderResponse.model_fields}}
+    cursor = await find_page(page, purchase_orders_collection, {"store_id": store_id}, projection,
+                             sort_fields=("order_id", "delivery_date"),
+                             required=PurchaseOrderResponse.model_fields)
     result = []
-    async for order in cursor:
+    for order in cursor:
         # Handle received_status (supports both int and string)
         raw_received = order.get("received_status", 0)
         if isinstance(raw_received, int):
@@ -30,7 +36,7 @@ async def get_all_purchase_orders(store_id: str):
         else:
             order["validation_status"] = "Pending"
 
-        result.append(PurchaseOrderResponse(**order))
+        result.append(shape_row(page, PurchaseOrderResponse(**order).model_dump()))
     return result
 
 
@@ -1,13 +1,17 @@
 from app.db import db  # Motor async MongoDB client
 from bson import ObjectId
+from typing import Optional
+from app.utils.pagination import Page, find_page, shape_row
 
 requested_orders_collection = db["RequestedOrders"]
 
 #List of Requested order 
-async def get_all_requested_orders(store_id: str):
+async def get_all_requested_orders(store_id: str, page: Optional[Page] = None):
     orders = []
-    cursor = requested_orders_collection.find({"store_id": store_id})
-    async for order in cursor:
-        order["_id"] = str(order["_id"])  # Convert ObjectId to string
+    cursor = await find_page(page, requested_orders_collection, {"store_id": store_id},
+                             sort_fields=("request_id", "created_at"))
+    for order in cursor:
+        if "_id" in order:
+            order["_id"] = str(order["_id"])  # Convert ObjectId to string
         orders.append(order)
     return orders
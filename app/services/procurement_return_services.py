@@ -1,6 +1,8 @@
 from app.db import db
 from fastapi import HTTPException
 from app.models.procurement_models import ReturnToVendorResponse
+from typing import Optional
+from app.utils.pagination import Page, find_page, shape_row
 
 return_collection = db["ReturnToVendor"]
 
@@ -11,12 +13,16 @@ status_map = {
 }
 
 #List of Return To Vendor
-async def get_all_returns(store_id: str):
-    returns_cursor = return_collection.find({"store_id": store_id}, {"_id": 0})
+async def get_all_returns(store_id: str, page: Optional[Page] = None):
+    # Only the fields the response model shows are read from the collection
+    projection = {"_id": 0, **{field: 1 for field in ReturnToVendorResponse.model_fields}}
+    returns_cursor = await find_page(page, return_collection, {"store_id": store_id}, projection,
+                                     sort_fields=("return_id", "delivery_date"),
+                                     required=ReturnToVendorResponse.model_fields)
     returns = []
-    async for item in returns_cursor:
+    for item in returns_cursor:
         item["status"] = status_map.get(item.get("status", 0), "Returned")
-        returns.append(ReturnToVendorResponse(**item))
+        returns.append(shape_row(page, ReturnToVendorResponse(**item).model_dump()))
     return returns
 
 
@@ -1,7 +1,11 @@
 from fastapi import HTTPException
 from datetime import datetime
 from app.db import db
+from app.services.sales_dashboard_rollup import record_return_removed
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.low_stock_engine import low_stock_engine
 from app.models.procurement_models import ReturnValidationRequest
+from app.utils.numeric_fields import typed_doc
 
 # MongoDB collections
 return_orders_collection = db["ReturnOrders"]
@@ -52,7 +56,7 @@ async def validate_return_order(data: ReturnValidationRequest, store_id: str, or
 
     # ✅ CASE 2: Product Damage & NOT Seller Returnable → LossOrders
     elif reason == "Product Damage" and not is_seller_returnable:
-        await loss_orders_collection.insert_one({
+        await loss_orders_collection.insert_one(typed_doc("LossOrders", {
             "product_id": product["product_id"],
             "org_id": org_id,
             "store_id": store_id,
@@ -61,14 +65,14 @@ async def validate_return_order(data: ReturnValidationRequest, store_id: str, or
             "date_reported": datetime.now().strftime("%Y-%m-%d"),
             "quantity_lost": product["return_quantity"],
             "unit": product.get("unit", "pcs"),
-            "unit_price": str(product.get("unit_price", "0")),
+            "unit_price": product.get("unit_price", 0),
             "reason": "Damaged and not returnable"
-        })
+        }))
         action = "Added to LossOrders"
 
     # ✅ CASE 3: Not Product Damage → Inventory
     else:
-        await inventory_collection.insert_one({
+        await inventory_collection.insert_one(typed_doc("Inventory", {
             "product_id": product["product_id"],
             "org_id": org_id,
             "store_id": store_id,
@@ -77,7 +81,7 @@ async def validate_return_order(data: ReturnValidationRequest, store_id: str, or
             "consumer_return_conditions": return_order.get("consumer_return_conditions", []),
             "is_seller_returnable": return_order.get("is_seller_returnable", False),
             "seller_return_conditions": return_order.get("seller_return_conditions", []),
-            "unit_price": str(product.get("unit_price", "0.0")),
+            "unit_price": product.get("unit_price", 0),
             "quantity": product["return_quantity"],
             "category": product.get("category", "stationery"),
             "sub_category": product.get("sub_category", "misc"),
@@ -87,7 +91,8 @@ async def validate_return_order(data: ReturnValidationRequest, store_id: str, or
             "warranty_tenure": product.get("warranty_tenure", 0),
             "warranty_unit": product.get("warranty_unit", "months"),
             "last_updated": datetime.now().isoformat()
-        })
+        }))
+        low_stock_engine.track(store_id, [product["product_id"]])
         action = "Added to Inventory"
 
     # ✅ Delete the return order after processing
@@ -95,5 +100,7 @@ async def validate_return_order(data: ReturnValidationRequest, store_id: str, or
         "return_id": data.return_id,
         "store_id": store_id
     })
+    await record_return_removed(return_order, store_id)
+    invalidate_store_dashboard(store_id)
 
     return {"message": f"Validation successful. {action}."}
@@ -1,6 +1,9 @@
 from datetime import datetime
 from bson import ObjectId
 from app.db import db
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.low_stock_engine import low_stock_engine
+from app.utils.numeric_fields import typed_doc
 
 inventory_collection = db["Inventory"]
 loss_orders_collection = db["LossOrders"]
@@ -19,8 +22,8 @@ async def validate_purchase_order(data, store_id: str, org_id: str):
             "consumer_return_conditions": data.consumer_return_conditions or [],
             "is_seller_returnable": data.returnable,
             "seller_return_conditions": data.return_conditions or [],
-            "unit_price": str(data.unit_price),
-            "quantity": str(data.received_quantity),
+            "unit_price": data.unit_price,
+            "quantity": data.received_quantity,
             "category": data.category,
             "sub_category": data.sub_category or "misc",
             "tags": [],
@@ -30,7 +33,8 @@ async def validate_purchase_order(data, store_id: str, org_id: str):
             "warranty_unit": data.warranty_unit,
             "last_updated": datetime.utcnow().isoformat(),
         }
-        await inventory_collection.insert_one(inventory_data)
+        await inventory_collection.insert_one(typed_doc("Inventory", inventory_data))
+        low_stock_engine.track(store_id, [inventory_data["product_id"]])
 
 
 
@@ -44,10 +48,10 @@ async def validate_purchase_order(data, store_id: str, org_id: str):
             "date_reported": datetime.utcnow().strftime("%Y-%m-%d"),
             "quantity_lost": data.expected_quantity - data.received_quantity,
             "unit": data.quantity_unit,
-            "unit_price": str(data.unit_price),
+            "unit_price": data.unit_price,
             "reason": "Damaged and not returnable",
         }
-        await loss_orders_collection.insert_one(loss_data)
+        await loss_orders_collection.insert_one(typed_doc("LossOrders", loss_data))
     # Return to Vendor
     elif (data.received_quantity != data.expected_quantity) or (data.is_product_damaged and data.returnable):
         return_data = {
@@ -75,6 +79,8 @@ async def validate_purchase_order(data, store_id: str, org_id: str):
     # Loss Orders
 
 
+    invalidate_store_dashboard(store_id)
+
     # Update validation status in purchase order
     await purchase_orders_collection.update_one(
         {"order_id": data.order_id},
@@ -2,7 +2,10 @@ from datetime import datetime
 from app.db import db
 from fastapi import HTTPException
 from app.models.sales_model import ReturnOrderRequest, SendToProcurement
-from app.utils.sales_utils import enrich_products, fetch_inventory_details, generate_customer_id, generate_order_id, build_product_detail, generate_request_id, generate_return_id
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.sales_dashboard_rollup import record_order_added, record_order_removed, record_return_added
+from app.utils.sales_utils import enrich_products, generate_customer_id, generate_order_id, build_product_detail, generate_request_id, generate_return_id
+from app.utils.line_items import require_priced_item, resolve_line_items
 
 
 async def add_sales_order(order_data: dict, store_id: str):
@@ -22,25 +25,28 @@ async def add_sales_order(order_data: dict, store_id: str):
 
     # Insert into SalesOrders
     await db.SalesOrders.insert_one(order_data)
+    await record_order_added(store_id)
     return order_data["order_id"]
 
 async def process_products(products: list, store_id: str):
     final_products = []
     subtotal = 0.0
 
+    items = await resolve_line_items((prod["product_id"] for prod in products), store_id)
+
     for prod in products:
         product_id = prod["product_id"]
         order_quantity = prod["quantity"]
 
-        inventory_data = await fetch_inventory_details(product_id, store_id)
+        item = require_priced_item(items, product_id)
 
         product_detail, total_with_tax = build_product_detail(
-            inventory_item=inventory_data["inventory_item"],
+            inventory_item=item.inventory_item,
             product_id=product_id,
-            unit_price=inventory_data["unit_price"],
-            product_tax=inventory_data["product_tax"],
+            unit_price=item.unit_price,
+            product_tax=item.tax,
             order_quantity=order_quantity,
-            inventory_quantity=inventory_data["inventory_quantity"]
+            inventory_quantity=item.quantity
         )
 
         subtotal += total_with_tax
@@ -104,6 +110,7 @@ async def fetch_sales_order(order_id: str, store_id: str):
 
 # --- Helper function to build return document ---
 def build_return_doc(data, order, products, total_amount, return_id, store_id):
+    returned_at = datetime.utcnow()
     return {
         "return_id": return_id,
         "order_id": data.order_id,
@@ -112,7 +119,8 @@ def build_return_doc(data, order, products, total_amount, return_id, store_id):
         "phone_no": order.get("customer_phone"),
         "email": order.get("customer_email"),
         "product": products,
-        "return_date": datetime.utcnow().strftime("%Y-%m-%d"),
+        "return_date": returned_at.strftime("%Y-%m-%d"),
+        "return_date_at": returned_at.replace(hour=0, minute=0, second=0, microsecond=0),
         "is_customer_returnable": True,
         "remarks": data.remarks,
         "reason": data.reason,
@@ -131,7 +139,7 @@ async def add_return(data: ReturnOrderRequest, store_id: str):
         raise HTTPException(status_code=404, detail="Product array is missing or empty in Sales Order")
 
     enriched_products, total_amount, skipped_products = await enrich_products(
-        products_list, data.return_quantity, data.reason
+        products_list, data.return_quantity, data.reason, store_id
     )
     
     if not enriched_products:
@@ -144,6 +152,7 @@ async def add_return(data: ReturnOrderRequest, store_id: str):
 
     return_doc = build_return_doc(data, order, enriched_products, total_amount, return_id, store_id)
     await db.ReturnOrders.insert_one(return_doc)
+    await record_return_added(return_doc, store_id)
 
     # Check return_quantity against order_quantity
     updated_products = []
@@ -166,12 +175,15 @@ async def add_return(data: ReturnOrderRequest, store_id: str):
     if should_delete:
         # Delete the entire order
         await db.SalesOrders.delete_one({"order_id": data.order_id, "store_id": store_id})
+        await record_order_removed(order, store_id)
     else:
         # Update the order with the new product quantities
         await db.SalesOrders.update_one(
             {"order_id": data.order_id, "store_id": store_id},
             {"$set": {"products": updated_products}}
         )
+    # Either way the order's lines changed, and with them the finance report and top sellers
+    invalidate_store_dashboard(store_id)
 
     return {
         "message": "Return order added successfully",
@@ -0,0 +1,219 @@
+import asyncio
+import sys
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from app.db import ANALYTICS, db, db_for
+
+# One document per store, kept up to date on every add / sell / delete / return:
+# {
+#   "_id": store_id,
+#   "received_orders": int, "sold_orders": int, "sold_order_total_price": float, "return_orders": int,
+#   "sold_by_month": {"YYYY-MM": int}, "returns_by_month": {"YYYY-MM": int},
+#   "reconcile_seq": int, "rebuilt_at": datetime
+# }
+# The hooks run outside the order writes (except on the sell path), so a crash between the two
+# leaves the counters off; run `python -m app.services.sales_dashboard_rollup` periodically
+# (e.g. nightly from cron) to reconcile every store against its orders and returns.
+rollup_collection = db.SalesDashboard
+# Counter updates and rebuilds go to the primary; dashboard reads may lag it (see app/db.py)
+READ_CONSISTENCY = ANALYTICS
+
+
+def _month_key(value) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m")
+    if isinstance(value, str) and len(value) >= 7:
+        try:
+            return datetime.strptime(value[:7], "%Y-%m").strftime("%Y-%m")
+        except ValueError:
+            return None
+    return None
+
+
+def _order_total(order: dict) -> float:
+    try:
+        return float(order.get("total_order_price", 0) or 0)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+COUNTER_FIELDS = ("received_orders", "sold_orders", "sold_order_total_price", "return_orders")
+MONTH_FIELDS = ("sold_by_month", "returns_by_month")
+
+
+async def _apply(store_id: str, inc: dict, session=None):
+    # No upsert: a missing rollup is built from scratch on first read instead
+    await rollup_collection.update_one({"_id": store_id}, {"$inc": inc}, session=session)
+
+
+# ───────────────────────── WRITE-PATH HOOKS
+async def record_order_added(store_id: str, session=None):
+    await _apply(store_id, {"received_orders": 1}, session)
+
+
+async def record_order_sold(order: dict, store_id: str, session=None):
+    inc = {
+        "received_orders": -1,
+        "sold_orders": 1,
+        "sold_order_total_price": _order_total(order)
+    }
+    if month := _month_key(order.get("order_date")):
+        inc[f"sold_by_month.{month}"] = 1
+    await _apply(store_id, inc, session)
+
+
+async def record_order_removed(order: dict, store_id: str, session=None):
+    if order.get("order_status") == "1":
+        inc = {"sold_orders": -1, "sold_order_total_price": -_order_total(order)}
+        if month := _month_key(order.get("order_date")):
+            inc[f"sold_by_month.{month}"] = -1
+    else:
+        inc = {"received_orders": -1}
+    await _apply(store_id, inc, session)
+
+
+async def record_order_total_changed(order: dict, new_total: float, store_id: str, session=None):
+    # Only sold orders contribute to revenue
+    if order.get("order_status") != "1":
+        return
+    diff = float(new_total or 0) - _order_total(order)
+    if diff:
+        await _apply(store_id, {"sold_order_total_price": diff}, session)
+
+
+async def record_return_added(return_doc: dict, store_id: str, session=None):
+    inc = {"return_orders": 1}
+    if month := _month_key(return_doc.get("return_date")):
+        inc[f"returns_by_month.{month}"] = 1
+    await _apply(store_id, inc, session)
+
+
+async def record_return_removed(return_doc: dict, store_id: str, session=None):
+    inc = {"return_orders": -1}
+    if month := _month_key(return_doc.get("return_date")):
+        inc[f"returns_by_month.{month}"] = -1
+    await _apply(store_id, inc, session)
+
+
+# ───────────────────────── REBUILD
+async def _aggregate_rollup(store_id: str) -> dict:
+    order_pipeline = [
+        {"$match": {"store_id": store_id, "order_status": {"$in": ["0", "1"]}}},
+        {"$facet": {
+            "by_status": [
+                {"$group": {
+                    "_id": "$order_status",
+                    "count": {"$sum": 1},
+                    "total": {"$sum": {"$convert": {"input": "$total_order_price", "to": "double", "onError": 0, "onNull": 0}}}
+                }}
+            ],
+            "sold_by_month": [
+                {"$match": {"order_status": "1", "order_date": {"$type": "date"}}},
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$order_date"}}, "count": {"$sum": 1}}}
+            ]
+        }}
+    ]
+    return_pipeline = [
+        {"$match": {"store_id": store_id}},
+        {"$group": {"_id": {"$substrCP": [{"$ifNull": ["$return_date", ""]}, 0, 7]}, "count": {"$sum": 1}}}
+    ]
+
+    orders, returns = await asyncio.gather(
+        db.SalesOrders.aggregate(order_pipeline).to_list(length=1),
+        db.ReturnOrders.aggregate(return_pipeline).to_list(length=None)
+    )
+
+    by_status = {row["_id"]: row for row in orders[0]["by_status"]} if orders else {}
+    sold_by_month = {row["_id"]: row["count"] for row in orders[0]["sold_by_month"]} if orders else {}
+    returns_by_month = {row["_id"]: row["count"] for row in returns if _month_key(row["_id"])}
+
+    return {
+        "received_orders": by_status.get("0", {}).get("count", 0),
+        "sold_orders": by_status.get("1", {}).get("count", 0),
+        "sold_order_total_price": by_status.get("1", {}).get("total", 0.0),
+        "return_orders": sum(row["count"] for row in returns),
+        "sold_by_month": sold_by_month,
+        "returns_by_month": returns_by_month,
+    }
+
+
+def _difference(stored: dict, target: dict) -> dict:
+    # $inc that turns the stored counters into the target ones
+    inc = {}
+    for field in COUNTER_FIELDS:
+        diff = target[field] - (stored.get(field) or 0)
+        if diff:
+            inc[field] = diff
+    for field in MONTH_FIELDS:
+        buckets = stored.get(field) or {}
+        for month in set(buckets) | set(target[field]):
+            diff = target[field].get(month, 0) - buckets.get(month, 0)
+            if diff:
+                inc[f"{field}.{month}"] = diff
+    return inc
+
+
+async def rebuild_sales_rollup(store_id: str) -> dict:
+    # Builds a missing rollup or reconciles an existing one without losing concurrent hook updates:
+    # the document exists before the aggregation runs, so every later hook $inc lands in it, and the
+    # result is applied as a difference ($inc), never a $set over those updates.
+    # Only a write whose hook lands between the read below and the aggregation is counted twice;
+    # the next reconcile corrects it.
+    await rollup_collection.update_one({"_id": store_id}, {"$setOnInsert": {"reconcile_seq": 0}}, upsert=True)
+    stored = await rollup_collection.find_one({"_id": store_id})
+    target = await _aggregate_rollup(store_id)
+
+    # Guarded on reconcile_seq: of several concurrent rebuilds only one applies its difference
+    rollup = await rollup_collection.find_one_and_update(
+        {"_id": store_id, "reconcile_seq": stored.get("reconcile_seq")},
+        {"$inc": {**_difference(stored, target), "reconcile_seq": 1}, "$set": {"rebuilt_at": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if rollup is None:
+        rollup = await rollup_collection.find_one({"_id": store_id})
+    return rollup
+
+
+async def rebuild_all_sales_rollups() -> int:
+    store_ids = set(await db.SalesOrders.distinct("store_id")) | set(await db.ReturnOrders.distinct("store_id"))
+    for store_id in store_ids:
+        await rebuild_sales_rollup(store_id)
+    return len(store_ids)
+
+
+# ───────────────────────── READ
+async def get_sales_rollup(store_id: str) -> dict:
+    rollup = await db_for(READ_CONSISTENCY).SalesDashboard.find_one({"_id": store_id})
+    if not rollup or "rebuilt_at" not in rollup:
+        # A secondary may not have the rollup yet; only rebuild when the primary has none either
+        rollup = await rollup_collection.find_one({"_id": store_id})
+    if not rollup or "rebuilt_at" not in rollup:
+        # Missing, or created by a first build that has not finished yet
+        rollup = await rebuild_sales_rollup(store_id)
+    return rollup
+
+
+def monthly_counts(buckets: dict) -> list:
+    result = []
+    for key in sorted(buckets or {}):
+        if buckets[key] <= 0:
+            continue
+        year, month = key.split("-")
+        result.append({"year": int(year), "month": int(month), "count": buckets[key]})
+    return result
+
+
+# python -m app.services.sales_dashboard_rollup [store_id ...]
+if __name__ == "__main__":
+    async def _main(store_ids):
+        if store_ids:
+            for store_id in store_ids:
+                await rebuild_sales_rollup(store_id)
+            print(f"Reconciled sales rollup for {len(store_ids)} store(s)")
+        else:
+            print(f"Reconciled sales rollup for {await rebuild_all_sales_rollups()} store(s)")
+
+    asyncio.run(_main(sys.argv[1:]))
@@ -1,42 +1,32 @@
 from typing import Optional
-from app.db import db
+from app.db import db, get_client
 from app.models.sales_model import ProductDetails, SalesOrderDetails, SalesProductItem
-from app.services.sales_add_raise_services import fetch_inventory_details
+from app.utils.line_items import require_priced_item, resolve_line_items
+from app.utils.numeric_fields import parse_number, to_float, to_int
 from fastapi import HTTPException
-from app.utils.sales_utils import build_product_detail, parse_return_status, parse_status_string
-from bson.son import SON
+from app.utils.sales_utils import attach_product_status, build_product_detail, parse_return_status, parse_status_string
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+from app.services.sales_dashboard_rollup import get_sales_rollup, monthly_counts, record_order_removed, record_order_sold, record_order_total_changed, record_return_removed
+from app.services.dashboard_service import invalidate_store_dashboard
+from app.services.low_stock_engine import low_stock_engine
+from app.utils.pagination import Page, find_page, shape_row
+
+ORDER_SORT_FIELDS = ("order_date", "order_id", "total_order_price")
+# IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+TRANSACTIONS_UNSUPPORTED = 20
+# Set once a standalone mongod has refused a transaction; sells then compensate by hand
+_transactions_unsupported = False
 async def get_all_sales_orders(store_id: str):
     orders = await db.SalesOrders.find(
         {"order_status": "0", "store_id": store_id},
         {"_id": 0}
     ).to_list(length=None)
 
-    for order in orders:
-        updated_products = []
-
-        for product in order.get("products", []):
-            product_id = product.get("product_id")
-            ordered_quantity = int(product.get("order_quantity", 0))
-            inventory_item = await db.Inventory.find_one({
-                "store_id": store_id,
-                "product_id": product_id
-            })
-
-            try:
-                inventory_quantity = int(inventory_item.get("quantity", 0)) if inventory_item else 0
-            except (ValueError, TypeError):
-                inventory_quantity = 0
-
-            # Compare and determine product_status
-            product_status = "Stock-out" if inventory_quantity < ordered_quantity else "Stock-in"
-
-            # Add product_status to product
-            product["product_status"] = product_status
-            updated_products.append(product)
-
-        # Update products list
-        order["products"] = updated_products
+    # Resolve stock status for every product line with a single inventory query
+    await attach_product_status(orders, store_id)
 
+    for order in orders:
         # Convert status field
         order["status"] = parse_status_string(order.get("status", "0"))
 
@@ -46,11 +36,13 @@ async def get_all_sales_orders(store_id: str):
 
     return orders
 
-async def get_all_sold_orders(store_id: str):
-    orders = await db.SalesOrders.find(
+async def get_all_sold_orders(store_id: str, page: Optional[Page] = None):
+    orders = await find_page(
+        page, db.SalesOrders,
         {"store_id": store_id, "order_status": "1"},
-        {"_id": 0}
-    ).to_list(length=None)
+        {"_id": 0},
+        sort_fields=ORDER_SORT_FIELDS, required=("order_status",)
+    )
 
     for order in orders:
         # Convert order_status to status text
@@ -58,48 +50,117 @@ async def get_all_sold_orders(store_id: str):
         # Remove raw order_status field from final output
         order.pop("order_status", None)
 
-    return orders
+    return [shape_row(page, order) for order in orders]
 
 
-async def fetch_order_and_validate(order_id: str, store_id: str):
+async def fetch_order_and_validate(order_id: str, store_id: str, session=None):
     order = await db.SalesOrders.find_one({
         "order_id": order_id,
         "store_id": store_id,
         "order_status": "0"   # Make sure using correct field
-    },{"_id": 0})
+    },{"_id": 0}, session=session)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or already sold.")
     return order
 
-async def update_inventory_for_order(order, store_id: str):
+# 🔹 Helper to sum the quantity sold per product (an order may repeat a product)
+def get_required_quantities(order) -> dict:
+    required = {}
     for product in order.get("products", []):
         product_id = product.get("product_id")
-        order_quantity = int(product.get("order_quantity", 0))  # Correct field
-
-        # Fetch inventory item
-        inventory_item = await db.Inventory.find_one({
-            "product_id": product_id,
-            "store_id": store_id
-        },{"_id": 0})
+        required[product_id] = required.get(product_id, 0) + int(product.get("order_quantity", 0))
+    return required
+
+# 🔹 Helper to list every order line the inventory cannot cover
+# Rows still holding quantity as a string (not migrated yet) are collected in `legacy`
+async def find_insufficient_lines(order, required: dict, store_id: str, session=None, legacy: Optional[dict] = None):
+    stock = {}
+    cursor = db.Inventory.find(
+        {"store_id": store_id, "product_id": {"$in": list(required)}},
+        {"_id": 0, "product_id": 1, "quantity": 1},
+        session=session
+    )
+    async for item in cursor:
+        quantity = item.get("quantity")
+        if isinstance(quantity, str) and legacy is not None:
+            legacy.setdefault(item["product_id"], quantity)
+        stock.setdefault(item["product_id"], to_int(quantity))
 
-        if not inventory_item:
-            continue
+    insufficient = []
+    for product in order.get("products", []):
+        product_id = product.get("product_id")
+        available = stock.get(product_id)
+        if available is None or available < required[product_id]:
+            insufficient.append({
+                "product_id": product_id,
+                "product_name": product.get("product_name"),
+                "requested_quantity": required[product_id],
+                "available_quantity": available or 0,
+                "reason": "Product not found in inventory" if available is None else "Insufficient stock"
+            })
+    return insufficient
+
+async def update_inventory_for_order(order, store_id: str, session=None):
+    required = get_required_quantities(order)
+    if not required:
+        return
+
+    legacy = {}
+    insufficient = await find_insufficient_lines(order, required, store_id, session, legacy)
+    if insufficient:
+        raise HTTPException(status_code=409, detail={
+            "message": "Insufficient stock to sell this order.",
+            "insufficient_stock": insufficient
+        })
 
-        try:
-            current_quantity = int(inventory_item.get("quantity", 0))
-        except (ValueError, TypeError):
-            current_quantity = 0
+    # String quantities don't match the numeric $gte guard: store them as numbers first
+    fixes = [
+        UpdateOne({"store_id": store_id, "product_id": product_id, "quantity": raw},
+                  {"$set": {"quantity": parse_number(raw, int)}})
+        for product_id, raw in legacy.items() if parse_number(raw, int) is not None
+    ]
+    if fixes:
+        await db.Inventory.bulk_write(fixes, ordered=False, session=session)
+
+    if session is None:
+        # No transaction to roll back (standalone mongod): apply the guarded $incs one by one
+        # and give back what was already taken when one of them no longer matches
+        applied = {}
+        for product_id, order_quantity in required.items():
+            result = await db.Inventory.update_one(
+                {"store_id": store_id, "product_id": product_id, "quantity": {"$gte": order_quantity}},
+                {"$inc": {"quantity": -order_quantity}}
+            )
+            if result.matched_count == 0:
+                await restock_inventory(store_id, applied)
+                raise HTTPException(status_code=409, detail="Inventory changed while selling this order, please retry.")
+            applied[product_id] = order_quantity
+        return
+
+    # One conditional $inc per product, sent in a single bulk_write.
+    # The $gte guard makes an oversell impossible even under concurrent sells.
+    operations = [
+        UpdateOne(
+            {"store_id": store_id, "product_id": product_id, "quantity": {"$gte": order_quantity}},
+            {"$inc": {"quantity": -order_quantity}}
+        )
+        for product_id, order_quantity in required.items()
+    ]
 
-        # Calculate new quantity
-        new_quantity = max(current_quantity - order_quantity, 0)
+    result = await db.Inventory.bulk_write(operations, ordered=False, session=session)
+    if result.matched_count != len(operations):
+        # Only possible if stock moved after the check above; the transaction is rolled back
+        raise HTTPException(status_code=409, detail="Inventory changed while selling this order, please retry.")
 
-        # Update inventory
-        await db.Inventory.update_one(
-            {"product_id": product_id, "store_id": store_id},
-            {"$set": {"quantity": new_quantity}}
-        )
+async def restock_inventory(store_id: str, quantities: dict):
+    operations = [
+        UpdateOne({"store_id": store_id, "product_id": product_id}, {"$inc": {"quantity": quantity}})
+        for product_id, quantity in quantities.items()
+    ]
+    if operations:
+        await db.Inventory.bulk_write(operations, ordered=False)
 
-async def mark_order_status_as_sold(order_id: str, store_id: str):
+async def mark_order_status_as_sold(order_id: str, store_id: str, session=None):
     result = await db.SalesOrders.update_one(
         {
             "order_id": order_id,
@@ -108,23 +169,65 @@ async def mark_order_status_as_sold(order_id: str, store_id: str):
         },
         {
             "$set": {"order_status": "1"}
-        }
+        },
+        session=session
     )
     return result.modified_count
 
-async def mark_order_as_sold(order_id: str, store_id: str):
+async def sell_without_transaction(order_id: str, store_id: str):
+    # Standalone mongod: the guarded $incs and the order_status guard still prevent oversells
+    # and double sells; a losing step undoes the stock it took instead of rolling back
     order = await fetch_order_and_validate(order_id, store_id)
+    required = get_required_quantities(order)
     await update_inventory_for_order(order, store_id)
     updated_count = await mark_order_status_as_sold(order_id, store_id)
+    if updated_count == 0:
+        await restock_inventory(store_id, required)
+        raise HTTPException(status_code=404, detail="Order not found or already sold.")
+    await record_order_sold(order, store_id)
+    return updated_count, list(required)
+
+async def mark_order_as_sold(order_id: str, store_id: str):
+    # Stock decrement and status flip commit together or not at all
+    async def sell(session):
+        order = await fetch_order_and_validate(order_id, store_id, session)
+        await update_inventory_for_order(order, store_id, session)
+        updated_count = await mark_order_status_as_sold(order_id, store_id, session)
+        if updated_count == 0:
+            raise HTTPException(status_code=404, detail="Order not found or already sold.")
+        await record_order_sold(order, store_id, session)
+        return updated_count, list(get_required_quantities(order))
+
+    global _transactions_unsupported
+    if _transactions_unsupported:
+        updated_count, product_ids = await sell_without_transaction(order_id, store_id)
+    else:
+        try:
+            async with await get_client().start_session() as session:
+                updated_count, product_ids = await session.with_transaction(sell)
+        except OperationFailure as e:
+            # Refused before anything was written (the first read already carries the transaction)
+            if e.code != TRANSACTIONS_UNSUPPORTED or "Transaction numbers" not in str(e):
+                raise
+            _transactions_unsupported = True
+            updated_count, product_ids = await sell_without_transaction(order_id, store_id)
+
+    invalidate_store_dashboard(store_id)
+    low_stock_engine.track(store_id, product_ids)
     return updated_count
 
 
 async def delete_order_by_id(order_id: str, store_id: str) -> int:
-    result = await db.SalesOrders.delete_one({
+    deleted = await db.SalesOrders.find_one_and_delete({
         "order_id": order_id,
         "store_id": store_id
-    })
-    return result.deleted_count
+    }, {"_id": 0, "order_status": 1, "order_date": 1, "total_order_price": 1})
+    if not deleted:
+        return 0
+
+    await record_order_removed(deleted, store_id)
+    invalidate_store_dashboard(store_id)
+    return 1
 
 
 # 🔹 Helper to find updated quantity
@@ -139,20 +242,22 @@ async def rebuild_products_list(original_products: list, updated_products_input:
     updated_products = []
     subtotal = 0.0
 
+    items = await resolve_line_items((prod.get("product_id") for prod in original_products), store_id)
+
     for prod in original_products:
         product_id = prod.get("product_id")
         default_quantity = prod.get("order_quantity", 0)
         new_quantity = get_new_quantity_for_product(product_id, updated_products_input, default_quantity)
 
-        inventory_data = await fetch_inventory_details(product_id, store_id)
+        item = require_priced_item(items, product_id)
 
         product_detail, total_with_tax = build_product_detail(
-            inventory_item=inventory_data["inventory_item"],
+            inventory_item=item.inventory_item,
             product_id=product_id,
-            unit_price=inventory_data["unit_price"],
-            product_tax=inventory_data["product_tax"],
+            unit_price=item.unit_price,
+            product_tax=item.tax,
             order_quantity=new_quantity,
-            inventory_quantity=inventory_data["inventory_quantity"]
+            inventory_quantity=item.quantity
         )
 
         subtotal += total_with_tax
@@ -187,41 +292,34 @@ async def update_sales_order(order_id: str, store_id: str, updated_data: dict):
         {"order_id": order_id, "store_id": store_id},
         {"$set": final_update_data}
     )
+    if result.modified_count:
+        await record_order_total_changed(order, final_update_data["total_order_price"], store_id)
+        invalidate_store_dashboard(store_id)
 
     return result.modified_count
 
-async def get_all_products(store_id: str):
+async def get_all_products(store_id: str, page: Optional[Page] = None):
     try:
-        products_cursor = db.Inventory.find({"store_id": store_id}, {"_id": 0})
+        products_cursor = await find_page(page, db.Inventory, {"store_id": store_id}, {"_id": 0},
+                                          sort_fields=("product_name", "product_id"), required=("quantity",))
 
         products = []
-        async for product in products_cursor:
-            try:
-                quantity = int(product.get("quantity", 0))
-            except (ValueError, TypeError):
-                quantity = 0
-
-            product["status"] = "Stock-in" if quantity > 0 else "Stock-out"
-            products.append(product)
+        for product in products_cursor:
+            product["status"] = "Stock-in" if to_int(product.get("quantity")) > 0 else "Stock-out"
+            products.append(shape_row(page, product))
 
         return products
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving products: {str(e)}")
     
-async def get_all_returns(store_id: str):
+async def get_all_returns(store_id: str, page: Optional[Page] = None):
     # Filter by store_id and sent_to_procurement = 0, and exclude _id
-    cursor = db.ReturnOrders.find({
+    return await find_page(page, db.ReturnOrders, {
         "store_id": store_id,
         "sent_to_procurement": 0
-    }, {"_id": 0}) 
-
-    result = []
-
-    async for item in cursor:
-        # Instead of building a custom dictionary, append full item
-        result.append(item)
-
-    return result
+    }, {"_id": 0}, sort_fields=("return_id", "return_date"))
 
 async def get_return_by_id(return_id: str, store_id: str):
     order = await db.ReturnOrders.find_one(
@@ -235,14 +333,16 @@ async def get_return_by_id(return_id: str, store_id: str):
     return order
 
 async def delete_return(return_id: str, store_id: str):
-    result = await db.ReturnOrders.delete_one({
+    deleted = await db.ReturnOrders.find_one_and_delete({
         "return_id": return_id,
         "store_id": store_id
-    })
+    }, {"_id": 0, "return_date": 1})
 
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Return order not found or not in your store")
 
+    await record_return_removed(deleted, store_id)
+
     return {"message": f"Return order {return_id} deleted successfully"}
 
 
@@ -288,7 +388,7 @@ async def get_product_details_service(store_id: str, product_id: Optional[str] =
         product_id=product.get("product_id"),
         product_name=product.get("product_name"),
         category=product.get("category"),
-        price=float(product.get("unit_price", 0)),
+        price=to_float(product.get("unit_price")),
         quantity_available=product.get("quantity", 0),
         unit=product.get("unit", "pcs"),
         store_id=product.get("store_id"),
@@ -308,29 +408,10 @@ async def get_sales_order_by_id(order_id: str, store_id: str):
     if not order:
         raise HTTPException(status_code=404, detail="Order not found or already processed.")
 
-    updated_products = []
-
-    for product in order.get("products", []):
-        product_id = product.get("product_id")
-        ordered_quantity = int(product.get("order_quantity", 0))
-
-        inventory_item = await db.Inventory.find_one({
-            "store_id": store_id,
-            "product_id": product_id
-        })
-
-        try:
-            inventory_quantity = int(inventory_item.get("quantity", 0)) if inventory_item else 0
-        except (ValueError, TypeError):
-            inventory_quantity = 0
-
-        # Determine product status
-        product_status = "Stock-out" if inventory_quantity < ordered_quantity else "Stock-in"
-        product["product_status"] = product_status
-        updated_products.append(product)
+    # Determine product status for all lines with one inventory query
+    await attach_product_status([order], store_id)
 
     # Final transformation
-    order["products"] = updated_products
     order["status"] = parse_status_string(order.get("status", "0"))
 
     if "order_status" in order:
@@ -353,100 +434,29 @@ async def get_sold_order_by_id(order_id: str, store_id: str):
 
 
 async def get_sales_dashboard_summary(store_id: str):
-    # Get received (pending) orders
-    received_orders = await db.SalesOrders.find(
-        {"store_id": store_id, "order_status": "0"},
-        {"_id": 0, "total_order_price": 1}
-    ).to_list(length=None)
+    # Counters are maintained incrementally in SalesDashboard, so this is a single read
+    rollup = await get_sales_rollup(store_id)
 
-    # Get sold orders
-    sold_orders = await db.SalesOrders.find(
-        {"store_id": store_id, "order_status": "1"},
-        {"_id": 0, "total_order_price": 1}
-    ).to_list(length=None)
-
-    # Get return orders count from ReturnOrders collection
-    return_orders_count = await db.ReturnOrders.count_documents({"store_id": store_id})
-    total_received = len(received_orders)
-    total_sold = len(sold_orders)
-    total_orders = total_received + total_sold
-
-    sold_price_sum = 0.0
-    for order in sold_orders:
-        try:
-            sold_price_sum += float(order.get("total_order_price", 0))
-        except (ValueError, TypeError):
-            continue
+    total_received = rollup.get("received_orders", 0)
+    total_sold = rollup.get("sold_orders", 0)
 
     return {
-        "total_orders": total_orders,
+        "total_orders": total_received + total_sold,
         "received_orders": total_received,
         "sold_orders": total_sold,
-        "sold_order_total_price": round(sold_price_sum, 2),
-        "return_orders": return_orders_count
+        "sold_order_total_price": round(rollup.get("sold_order_total_price", 0.0), 2),
+        "return_orders": rollup.get("return_orders", 0)
     }
 
 async def get_sold_orders_by_month(store_id: str):
     """
-    Aggregates sold orders (order_status=1) by month and year.
+    Sold orders (order_status=1) per month and year, read from the store rollup.
     Returns a list of {month, year, count}.
     """
-    pipeline = [
-        {
-            "$match": {
-                "store_id": store_id,
-                "order_status": "1"
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "year": {"$year": "$order_date"},
-                    "month": {"$month": "$order_date"}
-                },
-                "count": {"$sum": 1}
-            }
-        },
-        {"$sort": SON([("_id.year", 1), ("_id.month", 1)])}
-    ]
-
-    result = await db.SalesOrders.aggregate(pipeline).to_list(length=None)
-
-    # Convert to frontend-friendly format
-    return [
-        {
-            "year": r["_id"]["year"],
-            "month": r["_id"]["month"],
-            "count": r["count"]
-        }
-        for r in result
-    ]
+    rollup = await get_sales_rollup(store_id)
+    return monthly_counts(rollup.get("sold_by_month", {}))
 
 
 async def get_return_orders_by_month(store_id: str):
-    pipeline = [
-        {"$match": {"store_id": store_id}},
-        {"$addFields": {
-            "return_date_parsed": {
-                "$dateFromString": {
-                    "dateString": "$return_date",
-                    "format": "%Y-%m-%d"
-                }
-            }
-        }},
-        {"$group": {
-            "_id": {
-                "year": {"$year": "$return_date_parsed"},
-                "month": {"$month": "$return_date_parsed"}
-            },
-            "count": {"$sum": 1}
-        }},
-        {"$sort": {"_id.year": 1, "_id.month": 1}}
-    ]
-
-    result = await db.ReturnOrders.aggregate(pipeline).to_list(length=None)
-
-    return [
-        {"year": r["_id"]["year"], "month": r["_id"]["month"], "count": r["count"]}
-        for r in result
-    ]
+    rollup = await get_sales_rollup(store_id)
+    return monthly_counts(rollup.get("returns_by_month", {}))
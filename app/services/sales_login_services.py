@@ -1,11 +1,11 @@
 from typing import Any, Dict, Optional
 from app.db import db
-from app.utils.auth import verify_password, create_access_token
+from app.utils.auth import verify_user_password, create_access_token
 
 async def login(email: str, password: str) -> Optional[Dict[str, Any]]:
     sales  = await db.Users.find_one({"email": email})
     role= sales .get("role") if sales  else None
-    if not sales  or not verify_password(password, sales ["password"]):
+    if not sales  or not await verify_user_password(sales, password, db.Users):
         return None
 
     token = create_access_token({
@@ -3,6 +3,8 @@ from fastapi import HTTPException, Request
 from datetime import datetime
 from app.db import db  # Adjust to your actual DB import
 from app.models.store_model import StaffInput
+from app.services.super_admin_dashboard import invalidate_dashboard_overview
+from app.utils.profile_cache import VERSION_BUMP, VERSION_FIELD, store_profiles
 
 
 async def get_store_detail_by_token(request: Request):
@@ -10,7 +12,7 @@ async def get_store_detail_by_token(request: Request):
     if not store_id:
         raise HTTPException(status_code=400, detail="Missing store_id in token")
 
-    store = await db.Stores.find_one({"store_id": store_id}, {"_id": 0})
+    store = await store_profiles.get(store_id)
     if not store:
         raise HTTPException(status_code=404, detail="Store not found")
 
@@ -22,16 +24,19 @@ async def update_store_by_token(updates: dict, request: Request):
     if not store_id:
         raise HTTPException(status_code=400, detail="Missing store_id in token")
 
+    updates.pop(VERSION_FIELD, None)
     updates["updated_at"] = datetime.utcnow().isoformat()
 
     result = await db["Stores"].update_one(
         {"store_id": store_id},
-        {"$set": updates}
+        {"$set": updates, "$inc": VERSION_BUMP}
     )
+    store_profiles.invalidate(store_id)
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Store not found or no changes made")
 
+    invalidate_dashboard_overview()
     return {"message": "Store updated successfully"}
 
 async def add_staff_to_department(department: str, staff: StaffInput, request: Request):
@@ -44,9 +49,11 @@ async def add_staff_to_department(department: str, staff: StaffInput, request: R
         {"store_id": store_id},
         {
             "$push": {field_path: staff.model_dump()},
-            "$set": {"updated_at": datetime.utcnow().isoformat()}
+            "$set": {"updated_at": datetime.utcnow().isoformat()},
+            "$inc": VERSION_BUMP
         }
     )
+    store_profiles.invalidate(store_id)
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Failed to add staff to department")
@@ -63,9 +70,11 @@ async def update_staff_in_department(department: str, staff_id: str, staff: Staf
             "$set": {
                 f"{field_path}.$": staff.model_dump(),
                 "updated_at": datetime.utcnow().isoformat()
-            }
+            },
+            "$inc": VERSION_BUMP
         }
     )
+    store_profiles.invalidate(store_id)
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Staff not found or update failed")
     return {"message": f"Staff in {department} updated successfully"}
@@ -78,9 +87,11 @@ async def delete_staff_from_department(department: str, staff_id: str, request:
         {"store_id": store_id},
         {
             "$pull": {field_path: {"staff_id": staff_id}},
-            "$set": {"updated_at": datetime.utcnow().isoformat()}
+            "$set": {"updated_at": datetime.utcnow().isoformat()},
+            "$inc": VERSION_BUMP
         }
     )
+    store_profiles.invalidate(store_id)
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Staff not found or already removed")
     return {"message": f"Staff removed from {department} successfully"}
\ No newline at end of file
@@ -1,8 +1,16 @@
+import asyncio
 from datetime import datetime
 from collections import Counter
 from typing import Dict, Any
 from fastapi import HTTPException
-from app.db import db
+from app.config import OVERVIEW_CACHE_TTL_SECONDS
+from app.services.category_catalog import CatalogSnapshot, category_catalog
+from app.db import ANALYTICS, db_for
+from app.utils.cache import TTLCache
+
+# Consistency class: read-only super-admin overview, may lag the primary (see app/db.py)
+CONSISTENCY = ANALYTICS
+db = db_for(CONSISTENCY)
 
 
 # async def get_total_admins() -> int:
@@ -161,222 +169,168 @@ from app.db import db
 async def get_total_admins() -> int:
     return await db.Users.count_documents({"role": "admin"})
 
-# Function to get total number of stores
-async def get_total_stores() -> int:
-    return await db.Stores.count_documents({})
-
-# Function to get status counts of stores (active, disabled, and draft)
-async def get_store_status_counts(total_stores: int) -> Dict[str, int]:
-    # Handle both numeric and string status values
-    active_stores = await db.Stores.count_documents({"status": {"$in": [1, "active"]}})
-    disabled_stores = await db.Stores.count_documents({"status": {"$in": [2, "disabled"]}})
-    draft_stores = await db.Stores.count_documents({"status": {"$in": [0, "draft"]}})
-    
-    return {
-        "active": active_stores,
-        "disabled": disabled_stores,
-        "draft": draft_stores,
-    }
-
 # Function to get categories and subcategories data
-async def get_categories_data() -> Dict[str, int]:
-    categories = await db.Categories.find({}, {
-        "_id": 0, 
-        "sub_categories": 1, 
-        "category_id": 1, 
-        "category_name": 1
-    }).to_list(None)
-    
-    total_categories = len(categories)
-    total_subcategories = sum(len(cat.get("sub_categories", [])) for cat in categories)
-    
+async def get_categories_data() -> Dict[str, Any]:
+    catalog = await category_catalog.snapshot()
     return {
-        "total_categories": total_categories,
-        "total_subcategories": total_subcategories,
-        "categories": categories,
+        "total_categories": len(catalog),
+        "total_subcategories": catalog.subcategory_count,
+        "catalog": catalog,
     }
 
-# Function to get top categories and subcategories by frequency
-async def get_top_categories_and_subcategories(all_stores: list) -> Dict[str, Any]:
-    category_counter = Counter()
-    subcategory_counter = Counter()
-
-    for store in all_stores:
-        # Extract category IDs from CategoryModel objects in category_ids
-        category_ids_list = store.get("category_ids", [])
-        for category_obj in category_ids_list:
-            if isinstance(category_obj, dict) and "id" in category_obj:
-                category_counter[category_obj["id"]] += 1
-        
-        # subcategory_ids is a list of strings
-        subcategory_ids = store.get("subcategory_ids", [])
-        for sub_id in subcategory_ids:
-            subcategory_counter[sub_id] += 1
+# Pipeline that computes every Stores-based figure of the overview in one round trip
+def build_store_overview_pipeline() -> list:
+    # created_at is a BSON date for new stores and an ISO string for older ones
+    created_is_date = {"$eq": [{"$type": "$created_at"}, "date"]}
+    created_is_string = {"$eq": [{"$type": "$created_at"}, "string"]}
+    created_sort_date = {
+        "$switch": {
+            "branches": [
+                {"case": created_is_date, "then": "$created_at"},
+                {"case": created_is_string, "then": {"$dateFromString": {
+                    "dateString": {"$substrCP": ["$created_at", 0, 19]},
+                    "format": "%Y-%m-%dT%H:%M:%S",
+                    "onError": None
+                }}}
+            ],
+            "default": None
+        }
+    }
+    created_month = {
+        "$cond": [
+            created_is_date,
+            {"$dateToString": {"format": "%Y-%m", "date": "$created_at"}},
+            {"$substrCP": ["$created_at", 0, 7]}
+        ]
+    }
 
-    top_categories = [{"category_id": cat_id, "count": count} for cat_id, count in category_counter.most_common(5)]
-    top_subcategories = [{"sub_category_id": sub_id, "count": count} for sub_id, count in subcategory_counter.most_common(5)]
+    return [
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "status": [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+            "top_categories": [
+                {"$unwind": "$category_ids"},
+                {"$match": {"category_ids.id": {"$exists": True}}},
+                {"$group": {"_id": "$category_ids.id", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": 5}
+            ],
+            "top_subcategories": [
+                {"$unwind": "$subcategory_ids"},
+                {"$group": {"_id": "$subcategory_ids", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": 5}
+            ],
+            "store_growth": [
+                {"$match": {"created_at": {"$type": ["date", "string"]}}},
+                {"$group": {"_id": created_month, "count": {"$sum": 1}}}
+            ],
+            "recent_stores": [
+                {"$addFields": {"sort_date": created_sort_date}},
+                {"$match": {"sort_date": {"$ne": None}}},
+                {"$sort": {"sort_date": -1}},
+                {"$limit": 5},
+                {"$project": {
+                    "_id": 0,
+                    "store_id": 1,
+                    "store_name": 1,
+                    "admin_name": 1,
+                    "status": 1,
+                    "created_at": 1,
+                    "category_ids": 1,
+                    "gst_number": 1
+                }}
+            ]
+        }}
+    ]
 
+# Function to get status counts of stores (active, disabled, and draft)
+def get_store_status_counts(status_rows: list) -> Dict[str, int]:
+    # Handle both numeric and string status values
+    counts = {row["_id"]: row["count"] for row in status_rows}
     return {
-        "top_categories": top_categories,
-        "top_subcategories": top_subcategories,
+        "active": counts.get(1, 0) + counts.get("active", 0),
+        "disabled": counts.get(2, 0) + counts.get("disabled", 0),
+        "draft": counts.get(0, 0) + counts.get("draft", 0),
     }
 
+# Function to shape the recently created stores for display
+def format_recent_stores(recent_stores: list) -> list:
+    from datetime import timezone
+
+    for store in recent_stores:
+        created_at = store.get("created_at")
+        if isinstance(created_at, datetime):
+            if created_at.tzinfo is None:
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            store["created_at"] = created_at.isoformat()
+        store.setdefault("category_ids", [])
+        for field in ("store_id", "store_name", "admin_name", "status", "gst_number"):
+            store.setdefault(field, None)
+    return recent_stores
+
 # Function to resolve category names from IDs
-def resolve_category_names(top_categories: list, categories: list) -> list:
-    category_id_to_name = {cat["category_id"]: cat["category_name"] for cat in categories}
+def resolve_category_names(top_categories: list, catalog: CatalogSnapshot) -> list:
     for cat in top_categories:
-        cat["category_name"] = category_id_to_name.get(cat["category_id"], "Unknown")
+        cat["category_name"] = catalog.category_name(cat["category_id"])
     return top_categories
 
 # Function to resolve subcategory names from IDs
-def resolve_subcategory_names(top_subcategories: list, categories: list) -> list:
-    # Create a mapping of subcategory_id to subcategory name
-    subcategory_id_to_name = {}
-    for category in categories:
-        sub_categories = category.get("sub_categories", [])
-        for sub_cat in sub_categories:
-            if isinstance(sub_cat, dict):
-                # Assuming subcategory has an id field and name field
-                sub_id = sub_cat.get("id") or sub_cat.get("sub_category_id") or sub_cat.get("subcategory_id")
-                sub_name = sub_cat.get("name") or sub_cat.get("sub_category_name") or sub_cat.get("subcategory_name")
-                if sub_id and sub_name:
-                    subcategory_id_to_name[sub_id] = sub_name
-    
-    # Add names to top subcategories
+def resolve_subcategory_names(top_subcategories: list, catalog: CatalogSnapshot) -> list:
     for sub_cat in top_subcategories:
-        sub_cat["sub_category_name"] = subcategory_id_to_name.get(sub_cat["sub_category_id"], "Unknown")
-    
+        sub_cat["sub_category_name"] = catalog.subcategory_name(sub_cat["sub_category_id"])
     return top_subcategories
 
-# Function to get store creation data for growth chart
-async def get_store_creation_data(all_stores: list) -> Dict[str, int]:
-    from datetime import timezone
-    
-    store_creation_map = {}
-
-    for store in all_stores:
-        created_at = store.get("created_at")
-        if created_at:
-            try:
-                if isinstance(created_at, datetime):
-                    # Make timezone-naive datetime timezone-aware if needed
-                    if created_at.tzinfo is None:
-                        created_at = created_at.replace(tzinfo=timezone.utc)
-                    date = created_at.date()
-                elif isinstance(created_at, str):
-                    # Handle ISO format strings with proper timezone handling
-                    if created_at.endswith('Z'):
-                        dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    elif '+' in created_at or created_at.endswith('00:00'):
-                        dt = datetime.fromisoformat(created_at)
-                    else:
-                        # Assume UTC if no timezone info
-                        dt = datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc)
-                    date = dt.date()
-                else:
-                    continue
-
-                month_key = date.strftime("%Y-%m")
-                store_creation_map[month_key] = store_creation_map.get(month_key, 0) + 1
-            except (ValueError, AttributeError) as e:
-                print(f"Error parsing datetime for store growth: {e}")
-                continue
-
-    return store_creation_map
-
-# Function to get recently created stores
-async def get_recent_stores(all_stores: list) -> list:
-    from datetime import timezone
-    
-    recent_stores = []
-    for store in all_stores:
-        created_at = store.get("created_at")
-        if created_at:
-            try:
-                if isinstance(created_at, datetime):
-                    # Make timezone-naive datetime timezone-aware (UTC)
-                    if created_at.tzinfo is None:
-                        created_at = created_at.replace(tzinfo=timezone.utc)
-                    store["created_at"] = created_at.isoformat()
-                    store["sort_date"] = created_at
-                elif isinstance(created_at, str):
-                    # Parse string datetime and ensure it's timezone-aware
-                    if created_at.endswith('Z'):
-                        dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                    elif '+' in created_at or created_at.endswith('00:00'):
-                        dt = datetime.fromisoformat(created_at)
-                    else:
-                        # Assume UTC if no timezone info
-                        dt = datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc)
-                    
-                    store["created_at"] = created_at
-                    store["sort_date"] = dt
-                else:
-                    continue
-                recent_stores.append(store)
-            except (ValueError, AttributeError) as e:
-                print(f"Error parsing datetime for store {store.get('store_id', 'unknown')}: {e}")
-                continue
-    
-    # Sort by date and get latest 5 - now all datetimes are timezone-aware
-    recent_stores = sorted(recent_stores, key=lambda s: s.get("sort_date", datetime.min.replace(tzinfo=timezone.utc)), reverse=True)[:5]
-    
-    # Remove the temporary sort_date field and clean up the data
-    for store in recent_stores:
-        store.pop("sort_date", None)
-        # Keep only essential fields for recent stores display
-        store_data = {
-            "store_id": store.get("store_id"),
-            "store_name": store.get("store_name"),
-            "admin_name": store.get("admin_name"),
-            "status": store.get("status"),
-            "created_at": store.get("created_at"),
-            "category_ids": store.get("category_ids", []),
-            "gst_number": store.get("gst_number")
-        }
-        store.clear()
-        store.update(store_data)
+# Overview cache: entries are keyed on a version that every Stores/Categories write bumps,
+# and expire after OVERVIEW_CACHE_TTL_SECONDS so other workers' writes show up quickly too
+_overview_cache = TTLCache(maxsize=4, ttl=OVERVIEW_CACHE_TTL_SECONDS)
+_stores_version = 0
 
-    return recent_stores
+def invalidate_dashboard_overview():
+    global _stores_version
+    _stores_version += 1
+    _overview_cache.clear()
 
 # Main function to get the dashboard overview
 async def get_dashboard_overview(_: Dict[str, Any]) -> Dict[str, Any]:
+    cache_key = ("overview", _stores_version)
+    cached = _overview_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        total_admins = await get_total_admins()
-        total_stores = await get_total_stores()
-        
+        total_admins, categories_data, store_facets = await asyncio.gather(
+            get_total_admins(),
+            get_categories_data(),
+            db.Stores.aggregate(build_store_overview_pipeline()).to_list(length=1)
+        )
+        facets = store_facets[0] if store_facets else {}
+
+        total_stores = facets["total"][0]["count"] if facets.get("total") else 0
+
         # Store Status Counts
-        status_ratio = await get_store_status_counts(total_stores)
-        
+        status_ratio = get_store_status_counts(facets.get("status", []))
+
         # Category & Subcategory Data
-        categories_data = await get_categories_data()
         total_categories = categories_data["total_categories"]
         total_subcategories = categories_data["total_subcategories"]
-        categories = categories_data["categories"]
-
-        # Get all stores with necessary fields for analysis
-        all_stores = await db.Stores.find({}, {
-            "_id": 0, 
-            "category_ids": 1, 
-            "subcategory_ids": 1, 
-            "created_at": 1,
-            "store_id": 1,
-            "store_name": 1,
-            "admin_name": 1,
-            "status": 1,
-            "gst_number": 1
-        }).to_list(None)
-        
+        catalog = categories_data["catalog"]
+
         # Top Categories/Subcategories by Frequency
-        top_data = await get_top_categories_and_subcategories(all_stores)
-        top_categories = resolve_category_names(top_data["top_categories"], categories)
-        top_subcategories = resolve_subcategory_names(top_data["top_subcategories"], categories)
+        top_categories = resolve_category_names(
+            [{"category_id": row["_id"], "count": row["count"]} for row in facets.get("top_categories", [])],
+            catalog
+        )
+        top_subcategories = resolve_subcategory_names(
+            [{"sub_category_id": row["_id"], "count": row["count"]} for row in facets.get("top_subcategories", [])],
+            catalog
+        )
 
         # Store Growth Data
-        store_growth = await get_store_creation_data(all_stores)
+        store_growth = {row["_id"]: row["count"] for row in facets.get("store_growth", []) if row["_id"]}
 
         # Recently Created Stores
-        recent_stores = await get_recent_stores(all_stores)
+        recent_stores = format_recent_stores(facets.get("recent_stores", []))
 
         # Category vs Subcategory Ratio
         cat_sub_ratio = {
@@ -384,7 +338,7 @@ async def get_dashboard_overview(_: Dict[str, Any]) -> Dict[str, Any]:
             "subcategories": total_subcategories,
         }
 
-        return {
+        overview = {
             "admin_count": total_admins,
             "store_count": total_stores,
             "category_count": total_categories,
@@ -398,4 +352,7 @@ async def get_dashboard_overview(_: Dict[str, Any]) -> Dict[str, Any]:
         }
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate dashboard data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate dashboard data: {str(e)}")
+
+    _overview_cache.set(cache_key, overview)
+    return overview
@@ -5,7 +5,7 @@ from fastapi import HTTPException, Request
 from bson import ObjectId
 
 from app.db import db
-from app.utils.auth import hash_password, verify_password, create_access_token
+from app.utils.auth import hash_password_async, verify_user_password, create_access_token
 from app.models.super_admin_models import (
     SignupModel, StoreUpdate, SuperAdminSignupModel, UpdateProfileModel, ChangePasswordModel,
     CreateStoreModel, EditStoreModel, UpdateStoreStatusModel,
@@ -13,15 +13,16 @@ from app.models.super_admin_models import (
     AddSubcategoryModel, EditSubcategoryModel,
     StoreInvitationModel, HelpModel, UpdateUserModel, UserModel
 )
-from app.utils.email_utils import send_welcome_email
+from app.utils.email_outbox import enqueue_email
+from app.utils.id_sequence import next_id
+from app.utils.profile_cache import VERSION_BUMP, store_profiles, user_profiles
+from app.utils.pagination import Page, find_page, shape_row
+from app.services.super_admin_dashboard import invalidate_dashboard_overview
+from app.services.category_catalog import category_catalog
 
 # ───────────────────────── ID helper
 async def _next_id(col, field_: str, prefix: str) -> str:
-    last = await col.find_one({field_: {"$regex": f"^{prefix}\\d+$"}}, sort=[(field_, -1)])
-    if not last:
-        return f"{prefix}001"
-    next_num = int(last[field_][len(prefix):]) + 1
-    return f"{prefix}{str(next_num).zfill(3)}"
+    return await next_id(col, field_, prefix)
 
 # ───────────────────────── AUTH
 async def signup(data:SignupModel) -> Dict[str, Any]:
@@ -29,7 +30,7 @@ async def signup(data:SignupModel) -> Dict[str, Any]:
         return {"error": "Email already registered"}
 
     doc = data.model_dump()
-    doc["password"] = hash_password(doc["password"])
+    doc["password"] = await hash_password_async(doc["password"])
     now = datetime.utcnow().isoformat()
     doc["created_at"] = now
     doc["updated_at"] = now
@@ -52,7 +53,7 @@ async def signup(data:SignupModel) -> Dict[str, Any]:
 async def login(email: str, password: str) -> Optional[Dict[str, Any]]:
     admin = await db.Users.find_one({"email": email})
     role= admin.get("role") if admin else None
-    if not admin or not verify_password(password, admin["password"]):
+    if not admin or not await verify_user_password(admin, password, db.Users):
         return None
 
     token = create_access_token({
@@ -77,7 +78,7 @@ async def login(email: str, password: str) -> Optional[Dict[str, Any]]:
 async def fetch_user(request):
     user = request.state.user
     user_id = user.get("email")
-    res = await db.Users.find_one({"email": user_id}, {"_id":0})
+    res = await user_profiles.get(user_id)
     if not res:
         return HTTPException(401, "User not zFound")
     res.pop("password", None)  #Remove password from response
@@ -92,29 +93,33 @@ async def update_user_by_id(user_id: str, data: UpdateUserModel) -> bool:
         return False
     result = await db.Users.update_one(
         {"id": user_id},
-        {"$set": update_doc}
+        {"$set": update_doc, "$inc": VERSION_BUMP}
     )
+    user_profiles.invalidate_where("id", user_id)
     return result.modified_count > 0
 
 # ───────────────────────── PROFILE
 async def get_profile(email: str):
-    return await db.Users.find_one({"email": email}, {"password": 0, "_id": 0})
+    return await user_profiles.get(email)
 
 async def update_profile(email: str, payload: UpdateProfileModel) -> int:
     res = await db.Users.update_one(
         {"email": email},
-        {"$set": payload.model_dump(exclude_none=True) | {"updated_at": datetime.utcnow().isoformat()}}
+        {"$set": payload.model_dump(exclude_none=True) | {"updated_at": datetime.utcnow().isoformat()}, "$inc": VERSION_BUMP}
     )
+    user_profiles.invalidate(email)
     return res.modified_count
 
 async def change_password(email: str, old_pw: str, new_pw: str) -> Dict[str, str]:
     admin = await db.Users.find_one({"email": email})
-    if not admin or not verify_password(old_pw, admin["password"]):
+    if not admin or not await verify_user_password(admin, old_pw):
         return {"error": "Incorrect current password"}
     await db.Users.update_one(
         {"email": email},
-        {"$set": {"password": hash_password(new_pw), "updated_at": datetime.utcnow().isoformat()}}
+        {"$set": {"password": await hash_password_async(new_pw), "updated_at": datetime.utcnow().isoformat()},
+         "$inc": VERSION_BUMP}
     )
+    user_profiles.invalidate(email)
     return {"message": "Password updated"}
 
 # ───────────────────────── DASHBOARD
@@ -126,8 +131,9 @@ async def get_dashboard_overview(_: Dict[str, Any]):
     return {"total": total, "active": active, "disabled": disabled, "draft": draft}
 
 # ───────────────────────── STORE
-async def get_stores():                        # list
-    return await db.Stores.find({}, {"_id": 0}).to_list(1000)
+async def get_stores(page: Optional[Page] = None):   # list
+    return await find_page(page, db.Stores, {}, {"_id": 0},
+                           sort_fields=("store_id", "store_name", "created_at"))
 
 # async def create_store(data: CreateStoreModel) -> str:
 #     doc = data.model_dump()
@@ -168,6 +174,7 @@ async def create_store(data: CreateStoreModel, send_email) :
     doc["created_at"] = now
     doc["updated_at"] = now
     result = await db.Stores.insert_one(doc)
+    invalidate_dashboard_overview()
     store_id = doc["store_id"]
     password = doc.get("password", "")
 
@@ -175,7 +182,7 @@ async def create_store(data: CreateStoreModel, send_email) :
         id=doc.get("admin_id"),
         org_id=str(org_id) ,
         store_id=store_id,
-        password=hash_password(password),
+        password=await hash_password_async(password),
         phone=doc.get("address", {}).get("phone"),  # ✅ Fix,
         email=doc.get("store_email"),
         name=doc.get("admin_name"),
@@ -184,13 +191,10 @@ async def create_store(data: CreateStoreModel, send_email) :
 
     await db.Users.insert_one(user_model.model_dump())
 
-    # If email is True, send credentials
+    # If email is True, queue the credentials mail (delivered and retried by the outbox workers)
     if send_email:
         try:
-            res = send_welcome_email(to_email=doc.get("store_email"), password=doc.get("password"))
-            print("Email sent status:", res)
-            if not res:
-                raise HTTPException(status_code=500, detail="Failed to send welcome email")
+            await enqueue_email("welcome", doc.get("store_email"), password=doc.get("password"))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to send credentials: {str(e)}")
     
@@ -239,30 +243,25 @@ async def create_store(data: CreateStoreModel, send_email) :
     # return store
 
 async def get_store_by_id(store_id: str):
-    store = await db.Stores.find_one({"store_id": store_id}, {"_id": 0})
+    store = await store_profiles.get(store_id)
     if not store:
         return None
 
     category_ids = store.get("category_ids", [])
     subcategory_ids = store.get("subcategory_ids", [])
+    catalog = await category_catalog.snapshot()
 
-    # Fetch relevant category documents
-    categories_cursor = db.Categories.find(
-        {"category_id": {"$in": category_ids}}, {"_id": 0, "sub_categories": 1, "category_name": 1, "category_id": 1}
-    )
-    categories = await categories_cursor.to_list(length=None)
-
-    # Extract only matching subcategories
-    filtered_subcategories = []
-    filtered_categories = []
-    for cat in categories:
-        filtered_categories.append({
-            "category_id": cat["category_id"],
-            "category_name": cat["category_name"]
-        })
-        for sub in cat.get("sub_categories", []):
-            if sub["sub_category_id"] in subcategory_ids:
-                filtered_subcategories.append(sub)
+    filtered_categories = [
+        {"category_id": cat["category_id"], "category_name": cat["category_name"]}
+        for cat in catalog.many(category_ids)
+    ]
+
+    # Only subcategories that belong to one of the store's categories
+    store_category_ids = set(category_ids)
+    filtered_subcategories = [
+        catalog.subcategory(sub_id) for sub_id in subcategory_ids
+        if catalog.parent_of(sub_id) in store_category_ids
+    ]
 
     # Add full category objects + filtered subcategories to response
     store["categories"] = filtered_categories
@@ -279,24 +278,35 @@ async def edit_store(store_id: str, data: StoreUpdate) -> int:
         "$set": update_data  # ✅ Set everything including empty arrays
     }
 
+    update_query["$inc"] = VERSION_BUMP
+
     res = await db.Stores.update_one({"store_id": store_id}, update_query)
+    store_profiles.invalidate(store_id)
+    invalidate_dashboard_overview()
     return res.modified_count
 
 async def delete_store(store_id: str) -> int:
     res = await db.Stores.delete_one({"store_id": store_id})
+    store_profiles.invalidate(store_id)
+    invalidate_dashboard_overview()
     return res.deleted_count
 
 async def delete_multiple_stores(store_ids: List[str]) -> int:
     res = await db.Stores.delete_many({"store_id": {"$in": store_ids}})
+    for store_id in store_ids:
+        store_profiles.invalidate(store_id)
+    invalidate_dashboard_overview()
     return res.deleted_count
 
 async def update_store_status(store_id: str, status: int)-> int:
-    res = await db.Stores.update_one({"store_id": store_id}, {"$set": {"status": status}})
+    res = await db.Stores.update_one({"store_id": store_id}, {"$set": {"status": status}, "$inc": VERSION_BUMP})
+    store_profiles.invalidate(store_id)
+    invalidate_dashboard_overview()
     return res.modified_count
 
 # ───────────────────────── CATEGORY / SUBCATEGORY
 async def get_categories(store_id: str) -> List[Dict[str, Any]]:
-    store = await db.Stores.find_one({"store_id": store_id})
+    store = await store_profiles.get(store_id)
     if not store:
         return []
 
@@ -307,19 +317,16 @@ async def get_categories(store_id: str) -> List[Dict[str, Any]]:
     if not category_ids:
         return []
 
-    # Query the categories collection
-    categories = await db.Categories.find(
-        {"category_id": {"$in": category_ids}},
-        {"_id": 0}
-    ).to_list(length=None)
-
-    return categories
+    catalog = await category_catalog.snapshot()
+    return catalog.many(category_ids)
 
 async def get_category_by_id(category_id: str) -> Optional[Dict[str, Any]]:
-    return await db.Categories.find_one({"category_id": category_id}, {"_id": 0})
+    catalog = await category_catalog.snapshot()
+    return catalog.get(category_id)
 
 async def get_all_categories() -> List[Dict[str, Any]]:
-    categories = await db.Categories.find({}, {"_id": 0}).to_list(1000)
+    catalog = await category_catalog.snapshot()
+    categories = catalog.list()
 
     for category in categories:
         category["sub_category_count"] = len(category.get("sub_categories", []))
@@ -360,6 +367,8 @@ async def create_category(data: AddCategoryModel) -> str:
     doc["updated_at"] = ts
 
     await db.Categories.insert_one(doc)
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
     return doc["category_id"]
 
 async def edit_category(category_id: str, data: EditCategoryModel) -> int:
@@ -375,6 +384,8 @@ async def edit_category(category_id: str, data: EditCategoryModel) -> int:
         {"category_id": category_id},
         {"$set": update_data}
     )
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
     return res.modified_count
 
 # async def edit_category(category_id: str, data: EditCategoryModel) -> int:
@@ -386,6 +397,8 @@ async def edit_category(category_id: str, data: EditCategoryModel) -> int:
 
 async def delete_category(category_id: str) -> int:
     res = await db.Categories.delete_one({"category_id": category_id})
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
     return res.deleted_count
 
 async def add_subcategory(category_id: str, data: AddSubcategoryModel) -> str:
@@ -405,6 +418,8 @@ async def add_subcategory(category_id: str, data: AddSubcategoryModel) -> str:
         {"$push": {"sub_categories": sub_doc},
          "$set": {"updated_at": sub_doc["updated_at"]}}
     )
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
     return sub_id
 
 async def edit_subcategory(sub_id: str, data: EditSubcategoryModel) -> int:
@@ -414,12 +429,16 @@ async def edit_subcategory(sub_id: str, data: EditSubcategoryModel) -> int:
         {"sub_categories.sub_category_id": sub_id},
         {"$set": update_fields}
     )
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
     return res.modified_count
 
 async def delete_subcategory(sub_id: str) -> int:
     res = await db.Categories.update_one(
         {}, {"$pull": {"sub_categories": {"sub_category_id": sub_id}}}
     )
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
     return res.modified_count
 
 async def delete_subcategory_from_category(category_id: str, sub_category_id: str) -> bool:
@@ -446,6 +465,8 @@ async def delete_subcategory_from_category(category_id: str, sub_category_id: st
             }
         }
     )
+    category_catalog.invalidate()
+    invalidate_dashboard_overview()
 
     return True
 
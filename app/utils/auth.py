@@ -1,9 +1,26 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, BCRYPT_ROUNDS, PASSWORD_HASH_CONCURRENCY
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL while hashing, so a small thread pool keeps the event loop free
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_CONCURRENCY, thread_name_prefix="password-hash")
+_hash_slots = asyncio.Semaphore(PASSWORD_HASH_CONCURRENCY)
+hash_metrics = {
+    "waiting": 0,
+    "running": 0,
+    "max_waiting": 0,
+    "completed": 0,
+    "rehashed": 0,
+    "total_seconds": 0.0,
+    "max_seconds": 0.0
+}
 
 def decode_token(token: str):
     try:
@@ -18,8 +35,48 @@ def hash_password(password: str):
 def verify_password(plain_password: str, hashed_password: str):
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_hash(fn, *args):
+    hash_metrics["waiting"] += 1
+    hash_metrics["max_waiting"] = max(hash_metrics["max_waiting"], hash_metrics["waiting"])
+    async with _hash_slots:
+        hash_metrics["waiting"] -= 1
+        hash_metrics["running"] += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+        finally:
+            elapsed = time.perf_counter() - start
+            hash_metrics["running"] -= 1
+            hash_metrics["completed"] += 1
+            hash_metrics["total_seconds"] += elapsed
+            hash_metrics["max_seconds"] = max(hash_metrics["max_seconds"], elapsed)
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hash(pwd_context.hash, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated cost
+    return await _run_hash(pwd_context.verify_and_update, plain_password, hashed_password)
+
+async def verify_user_password(user: dict, plain_password: str, collection=None) -> bool:
+    valid, new_hash = await verify_password_async(plain_password, user["password"])
+    if valid and new_hash and collection is not None:
+        # Same password, new hash; profile caches never hold the hash, so no version bump
+        await collection.update_one({"_id": user["_id"]}, {"$set": {"password": new_hash}})
+        hash_metrics["rehashed"] += 1
+    return valid
+
+def get_hash_metrics() -> dict:
+    completed = hash_metrics["completed"]
+    return {
+        **hash_metrics,
+        "avg_seconds": hash_metrics["total_seconds"] / completed if completed else 0.0,
+        "concurrency": PASSWORD_HASH_CONCURRENCY,
+        "bcrypt_rounds": BCRYPT_ROUNDS
+    }
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM) 
\ No newline at end of file
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM) 
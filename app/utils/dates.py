@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+
+def to_bson_date(value) -> Optional[datetime]:
+    """Parse an ISO-8601 or YYYY-MM-DD string into a naive UTC datetime, as Mongo stores it."""
+    if isinstance(value, datetime):
+        dt = value
+    elif isinstance(value, str) and value:
+        try:
+            dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            try:
+                dt = datetime.strptime(value, "%Y-%m-%d")
+            except ValueError:
+                return None
+    else:
+        return None
+
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+
+from app.config import EMAIL_MAX_ATTEMPTS, EMAIL_POLL_SECONDS, EMAIL_RETRY_BASE_SECONDS, EMAIL_WORKERS
+from app.db import db
+from app.utils.email_utils import MESSAGE_BUILDERS, open_mail_connection
+
+logger = logging.getLogger(__name__)
+
+# {
+#   "kind": "welcome", "to": email, "params": {...} (removed once sent),
+#   "status": "pending" | "sending" | "sent" | "failed",
+#   "attempts": int, "next_attempt_at": datetime, "locked_until": datetime, "last_error": str,
+#   "created_at": datetime, "sent_at": datetime, "failed_at": datetime
+# }
+outbox_collection = db.EmailOutbox
+
+# A worker that dies mid-send leaves the job in "sending"; it is picked up again after this lease
+SEND_LEASE = timedelta(minutes=5)
+MAX_RETRY_DELAY_SECONDS = 3600
+
+
+async def enqueue_email(kind: str, to: str, **params) -> str:
+    if kind not in MESSAGE_BUILDERS:
+        raise ValueError(f"Unknown email kind '{kind}'")
+
+    now = datetime.utcnow()
+    result = await outbox_collection.insert_one({
+        "kind": kind,
+        "to": to,
+        "params": params,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now
+    })
+    email_dispatcher.wake()
+    return str(result.inserted_id)
+
+
+def _retry_delay(attempts: int) -> float:
+    return min(EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+
+
+class EmailDispatcher:
+    """Background workers that drain EmailOutbox.
+
+    Each worker owns one persistent mail connection, which is used from a
+    thread so SMTP round trips never block the event loop. Jobs are claimed
+    atomically, so several API workers can share the same outbox.
+    """
+
+    def __init__(self, workers: int = EMAIL_WORKERS):
+        self.workers = max(workers, 1)
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        return await outbox_collection.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "sending", "locked_until": {"$lte": now}}
+            ]},
+            {"$set": {"status": "sending", "locked_until": now + SEND_LEASE}, "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _deliver(self, connection, job: dict):
+        try:
+            msg = MESSAGE_BUILDERS[job["kind"]](job["to"], **(job.get("params") or {}))
+            await asyncio.to_thread(connection.send, msg)
+        except Exception as e:
+            attempts = job["attempts"]
+            if attempts >= EMAIL_MAX_ATTEMPTS:
+                logger.error("Giving up on email %s to %s after %s attempts: %s", job["_id"], job["to"], attempts, e)
+                # Terminal: the params (e.g. a welcome password) are never needed again
+                await outbox_collection.update_one(
+                    {"_id": job["_id"]},
+                    {"$set": {"status": "failed", "last_error": str(e), "failed_at": datetime.utcnow()},
+                     "$unset": {"params": "", "locked_until": ""}}
+                )
+                return
+
+            logger.warning("Email %s to %s failed (attempt %s), retrying: %s", job["_id"], job["to"], attempts, e)
+            await outbox_collection.update_one({"_id": job["_id"]}, {"$set": {
+                "status": "pending",
+                "last_error": str(e),
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=_retry_delay(attempts))
+            }})
+            return
+
+        # Params can hold credentials: drop them as soon as the mail is out
+        await outbox_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "sent", "sent_at": datetime.utcnow()}, "$unset": {"params": "", "locked_until": ""}}
+        )
+
+    async def _worker(self):
+        connection = open_mail_connection()
+        try:
+            while True:
+                try:
+                    job = await self._claim()
+                except Exception as e:
+                    logger.warning("Email outbox unavailable: %s", e)
+                    job = None
+
+                if job is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), EMAIL_POLL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                try:
+                    await self._deliver(connection, job)
+                except Exception as e:
+                    # The job stays "sending" and is picked up again once its lease runs out
+                    logger.warning("Could not record the outcome of email %s: %s", job["_id"], e)
+        finally:
+            await asyncio.to_thread(connection.close)
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+email_dispatcher = EmailDispatcher()
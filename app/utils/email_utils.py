@@ -1,11 +1,14 @@
 import smtplib
 import os
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
+from functools import lru_cache
+from typing import List, Optional
 from dotenv import load_dotenv
 
-from app.config import EMAIL_HOST, EMAIL_PASSWORD, EMAIL_PORT, EMAIL_USER
+from app.config import EMAIL_BACKEND, EMAIL_HOST, EMAIL_IDLE_NOOP_SECONDS, EMAIL_PASSWORD, EMAIL_PORT, EMAIL_USER
 
 # 👇 Your new HTML template function
 def get_welcome_template(email: str, password: str, login_url: str) -> str:
@@ -58,38 +61,124 @@ def get_welcome_template(email: str, password: str, login_url: str) -> str:
 </html>
     """
 
+LOGIN_URL = "http://localhost:3000/login"
+
+
+@lru_cache(maxsize=1)
+def _welcome_image() -> MIMEImage:
+    # Read and base64-encode the banner once; the same part is attached to every welcome email
+    with open("assets/image.jpeg", "rb") as image_file:
+        image = MIMEImage(image_file.read(), name="image.jpeg")
+    image.add_header("Content-ID", "<welcome_image>")
+    image.add_header("Content-Disposition", "inline", filename="image.jpeg")
+    return image
+
+
+def build_welcome_message(to_email: str, password: str) -> MIMEMultipart:
+    # ✅ Generate HTML with passed values
+    html = get_welcome_template(
+        email=to_email,
+        password=password,
+        login_url=LOGIN_URL
+    )
+
+    msg = MIMEMultipart("related")
+    msg["Subject"] = "Welcome to Inventory Management System"
+    msg["From"] = EMAIL_USER
+    msg["To"] = to_email
+
+    alternative = MIMEMultipart("alternative")
+    alternative.attach(MIMEText(html, "html"))
+    msg.attach(alternative)
+
+    # Attach the image with CID reference
+    msg.attach(_welcome_image())
+    return msg
+
+
+# kind -> builder(to_email, **params); used by the email outbox workers
+MESSAGE_BUILDERS = {
+    "welcome": build_welcome_message,
+}
+
+
+class SMTPConnection:
+    """One long-lived, logged-in SMTP session.
+
+    Blocking: call it from a worker thread. Reconnects when the server has
+    dropped the session or it sat idle longer than EMAIL_IDLE_NOOP_SECONDS.
+    """
+
+    def __init__(self):
+        self._server: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def _connect(self):
+        self.close()
+        server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT, timeout=30)
+        server.starttls()
+        server.login(EMAIL_USER, EMAIL_PASSWORD)
+        self._server = server
+
+    def _ensure_connected(self):
+        if self._server is None:
+            self._connect()
+        elif time.monotonic() - self._last_used > EMAIL_IDLE_NOOP_SECONDS:
+            try:
+                if self._server.noop()[0] != 250:
+                    self._connect()
+            except smtplib.SMTPException:
+                self._connect()
+
+    def send(self, msg: MIMEMultipart):
+        self._ensure_connected()
+        try:
+            self._server.send_message(msg, from_addr=EMAIL_USER)
+        except smtplib.SMTPServerDisconnected:
+            self._connect()
+            self._server.send_message(msg, from_addr=EMAIL_USER)
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryConnection:
+    """EMAIL_BACKEND=memory: keeps messages in `sent_messages` instead of talking to a server (tests/local dev)."""
+
+    sent_messages: List[MIMEMultipart] = []
+
+    def send(self, msg: MIMEMultipart):
+        self.sent_messages.append(msg)
+
+    def close(self):
+        pass
+
+
+def open_mail_connection():
+    return MemoryConnection() if EMAIL_BACKEND == "memory" else SMTPConnection()
+
+
 def send_welcome_email(to_email: str, password: str) -> bool:
+    # Synchronous one-off send; request handlers enqueue through app.utils.email_outbox instead
     try:
-        # ✅ Generate HTML with passed values
-        html = get_welcome_template(
-            email=to_email,
-            password=password,
-            login_url="http://localhost:3000/login"
-        )
-
         print("📧 Sending email to:", to_email)
-        # Create email
-        msg = MIMEMultipart("related")
-        msg["Subject"] = "Welcome to Inventory Management System"
-        msg["From"] = EMAIL_USER
-        msg["To"] = to_email
-
-        alternative = MIMEMultipart("alternative")
-        alternative.attach(MIMEText(html, "html"))
-        msg.attach(alternative)
-
-        # Attach the image with CID reference
-        with open("assets/image.jpeg", "rb") as image_file:
-            image = MIMEImage(image_file.read(), name="image.jpeg")
-            image.add_header("Content-ID", "<welcome_image>")
-            image.add_header("Content-Disposition", "inline", filename="image.jpeg")
-            msg.attach(image)
-
-        # Send
-        with smtplib.SMTP(EMAIL_HOST, EMAIL_PORT) as server:
-            server.starttls()
-            server.login(EMAIL_USER, EMAIL_PASSWORD)
-            server.sendmail(EMAIL_USER, to_email, msg.as_string())
+        connection = open_mail_connection()
+        try:
+            connection.send(build_welcome_message(to_email, password))
+        finally:
+            connection.close()
 
         print("✅ Email sent successfully to", to_email)
 
@@ -97,4 +186,4 @@ def send_welcome_email(to_email: str, password: str) -> bool:
 
     except Exception as e:
         print("❌ Error sending email:", e)
-        return False
\ No newline at end of file
+        return False
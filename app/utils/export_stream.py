@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+import logging
+import zlib
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+DEFAULT_BATCH_SIZE = 500
+
+
+class _ChunkSink(io.RawIOBase):
+    # File-like target for the Parquet writer; bytes are drained after every row group
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.extend(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+async def _batches(cursor, row_fn: Callable[[dict], list], batch_size: int):
+    batch = []
+    async for doc in cursor:
+        batch.append(row_fn(doc))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _csv_chunks(cursor, columns: List[str], row_fn, batch_size: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for batch in _batches(cursor, row_fn, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        # Header only: the store has no rows
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _ndjson_chunks(cursor, columns: List[str], row_fn, batch_size: int):
+    async for batch in _batches(cursor, row_fn, batch_size):
+        lines = [json.dumps(dict(zip(columns, row)), default=str) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def _parquet_chunks(cursor, columns: List[str], row_fn, batch_size: int, compression: Optional[str]):
+    # Every value is written as a string so legacy mixed-type fields keep one schema
+    schema = pa.schema([(column, pa.string()) for column in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression=compression or "snappy")
+    try:
+        async for batch in _batches(cursor, row_fn, batch_size):
+            table = pa.Table.from_pylist(
+                [{c: None if v is None else str(v) for c, v in zip(columns, row)} for row in batch],
+                schema=schema
+            )
+            writer.write_table(table)
+            if chunk := sink.drain():
+                yield chunk
+    finally:
+        writer.close()
+    if chunk := sink.drain():
+        yield chunk
+
+
+async def _gzip(chunks):
+    compressor = zlib.compressobj(wbits=31)  # 31 = gzip container
+    async for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+    yield compressor.flush()
+
+
+async def _log_failures(chunks, filename: str):
+    # Headers are already sent once streaming starts, so a failure can only end the body early
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception:
+        logger.exception("Export %s aborted mid-stream", filename)
+        raise
+
+
+def stream_export(
+    cursor,
+    columns: List[str],
+    row_fn: Callable[[dict], list],
+    filename: str,
+    fmt: str = "csv",
+    compression: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE
+) -> StreamingResponse:
+    """Stream a Motor cursor as csv / ndjson / parquet without buffering the result set.
+
+    Rows are pulled `batch_size` at a time and each batch is flushed to the
+    client as soon as it is encoded. compression="gzip" wraps csv/ndjson in a
+    .gz file; for parquet it selects the column codec instead.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format '{fmt}'")
+    if compression not in (None, "gzip"):
+        raise HTTPException(status_code=400, detail=f"Unsupported compression '{compression}'")
+    if fmt == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow to be installed")
+
+    cursor = cursor.batch_size(batch_size)
+    media_type, extension = EXPORT_FORMATS[fmt]
+    filename = f"{filename}.{extension}"
+
+    if fmt == "csv":
+        chunks = _csv_chunks(cursor, columns, row_fn, batch_size)
+    elif fmt == "ndjson":
+        chunks = _ndjson_chunks(cursor, columns, row_fn, batch_size)
+    else:
+        chunks = _parquet_chunks(cursor, columns, row_fn, batch_size, compression)
+
+    if compression == "gzip" and fmt != "parquet":
+        chunks = _gzip(chunks)
+        media_type = "application/gzip"
+        filename = f"{filename}.gz"
+
+    return StreamingResponse(_log_failures(chunks, filename), media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename={filename}"
+    })
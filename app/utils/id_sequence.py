@@ -0,0 +1,134 @@
+import asyncio
+import re
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import ID_BLOCK_SIZE
+from app.db import db
+
+# One document per sequence: {"_id": "<collection>.<field>.<prefix>[:<store_id>]", "seq": <last issued number>}
+counters_collection = db.Counters
+
+
+async def _max_existing_number(col, field_: str, prefix: str, store_id: Optional[str] = None) -> int:
+    # Used only once per sequence to carry on from IDs created before the counters existed
+    query = {field_: {"$regex": f"^{prefix}\\d+$"}}
+    if store_id:
+        query["store_id"] = store_id
+
+    pipeline = [
+        {"$match": query},
+        {"$project": {"_id": 0, "n": {"$toLong": {"$substrCP": [f"${field_}", len(prefix), 18]}}}},
+        {"$group": {"_id": None, "n": {"$max": "$n"}}}
+    ]
+    result = await col.aggregate(pipeline).to_list(length=1)
+    return int(result[0]["n"]) if result and result[0].get("n") is not None else 0
+
+
+class IdSequence:
+    """Atomic ID allocator backed by the Counters collection.
+
+    Every call reserves numbers with a single find_one_and_update($inc), so
+    concurrent requests never receive the same ID. With block_size > 1 a
+    worker reserves a range once and hands out IDs from memory until the
+    range is used up (unused numbers are skipped after a restart).
+    """
+
+    def __init__(self, block_size: int = 1):
+        self.block_size = max(int(block_size), 1)
+        self._blocks: Dict[str, Tuple[int, int]] = {}  # key -> (next number, last reserved number)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._seeded = set()
+
+    @staticmethod
+    def _key(col, field_: str, prefix: str, store_id: Optional[str]) -> str:
+        key = f"{col.name}.{field_}.{prefix}"
+        return f"{key}:{store_id}" if store_id else key
+
+    async def _seed(self, key: str, col, field_: str, prefix: str, store_id: Optional[str]):
+        if key in self._seeded:
+            return
+
+        if not await counters_collection.find_one({"_id": key}, {"_id": 1}):
+            last = await _max_existing_number(col, field_, prefix, store_id)
+            try:
+                # $max keeps this safe when several workers seed the same counter at once
+                await counters_collection.update_one({"_id": key}, {"$max": {"seq": last}}, upsert=True)
+            except DuplicateKeyError:
+                await counters_collection.update_one({"_id": key}, {"$max": {"seq": last}})
+
+        self._seeded.add(key)
+
+    async def _reserve(self, key: str, count: int) -> Tuple[int, int]:
+        doc = await counters_collection.find_one_and_update(
+            {"_id": key},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        last = int(doc["seq"])
+        return last - count + 1, last
+
+    async def allocate(self, col, field_: str, prefix: str, count: int = 1, store_id: Optional[str] = None) -> List[str]:
+        key = self._key(col, field_, prefix, store_id)
+        await self._seed(key, col, field_, prefix, store_id)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        numbers = []
+        async with lock:
+            next_num, last_num = self._blocks.get(key, (1, 0))
+
+            # Hand out whatever is left of the in-memory block first
+            available = min(count, last_num - next_num + 1)
+            if available > 0:
+                numbers.extend(range(next_num, next_num + available))
+                next_num += available
+
+            missing = count - len(numbers)
+            if missing > 0:
+                start, last_num = await self._reserve(key, max(missing, self.block_size))
+                numbers.extend(range(start, start + missing))
+                next_num = start + missing
+
+            self._blocks[key] = (next_num, last_num)
+
+        return [f"{prefix}{num:03d}" for num in numbers]
+
+    async def advance(self, col, field_: str, prefix: str, ids: List[str], store_id: Optional[str] = None):
+        # IDs chosen outside the counter (e.g. imported rows): never hand those numbers out later
+        pattern = re.compile(f"^{re.escape(prefix)}(\\d+)$")
+        numbers = [int(m.group(1)) for m in (pattern.match(i or "") for i in ids) if m]
+        if not numbers:
+            return
+        highest = max(numbers)
+
+        key = self._key(col, field_, prefix, store_id)
+        await self._seed(key, col, field_, prefix, store_id)
+        await counters_collection.update_one({"_id": key}, {"$max": {"seq": highest}}, upsert=True)
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Skip past them in this worker's block too; other workers' blocks are caught by the unique index
+            next_num, last_num = self._blocks.get(key, (1, 0))
+            if next_num <= highest:
+                self._blocks[key] = (highest + 1, last_num)
+
+
+id_sequence = IdSequence(block_size=ID_BLOCK_SIZE)
+
+
+async def next_id(col, field_: str, prefix: str, store_id: Optional[str] = None) -> str:
+    ids = await id_sequence.allocate(col, field_, prefix, 1, store_id)
+    return ids[0]
+
+
+async def advance_ids(col, field_: str, prefix: str, ids: List[str], store_id: Optional[str] = None):
+    await id_sequence.advance(col, field_, prefix, ids, store_id)
+
+
+async def reserve_ids(col, field_: str, prefix: str, count: int, store_id: Optional[str] = None) -> List[str]:
+    if count <= 0:
+        return []
+    return await id_sequence.allocate(col, field_, prefix, count, store_id)
@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.config import IDEMPOTENCY_LOCK_SECONDS
+from app.db import db
+
+logger = logging.getLogger(__name__)
+
+# One document per (endpoint, user, key); removed by the created_at TTL index (see app/utils/indexes.py)
+idempotency_collection = db.IdempotencyKeys
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Delays between attempts to record a finished request; a lost record would let a retry run the handler again
+COMPLETION_RETRY_DELAYS = (0.1, 0.5, 2.0)
+
+
+def _fingerprint(payload: Any) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(record: dict) -> JSONResponse:
+    response = record["response"]
+    return JSONResponse(status_code=response["status_code"], content=response["body"],
+                        headers={REPLAYED_HEADER: "true"})
+
+
+async def _claim(record_id: str, fingerprint: str) -> Optional[dict]:
+    # None once this request owns the key; the stored record when there is a response to replay
+    now = datetime.utcnow()
+    try:
+        await idempotency_collection.insert_one({
+            "_id": record_id,
+            "fingerprint": fingerprint,
+            "status": "in_progress",
+            "locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            "created_at": now,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    existing = await idempotency_collection.find_one({"_id": record_id})
+    if existing is None:
+        # Expired between the insert and the read; the client can simply retry
+        raise HTTPException(status_code=409, detail="Idempotency-Key is being reset, please retry.")
+    if existing["fingerprint"] != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request.")
+    if existing["status"] == "completed":
+        return existing
+
+    # In progress: the first request is still running, unless its worker died and the lock ran out
+    taken = await idempotency_collection.update_one(
+        {"_id": record_id, "status": "in_progress", "locked_until": {"$lte": now}},
+        {"$set": {"locked_until": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)}}
+    )
+    if taken.modified_count == 0:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed.")
+    return None
+
+
+async def _keep_locked(record_id: str):
+    # Renews the lock while the handler runs, so a slow request is never taken over by a retry
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_LOCK_SECONDS / 3)
+        try:
+            await idempotency_collection.update_one(
+                {"_id": record_id, "status": "in_progress"},
+                {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)}}
+            )
+        except PyMongoError as e:
+            logger.warning("Could not renew idempotency lock %s: %s", record_id, e)
+
+
+async def _complete(record_id: str, result: Any):
+    update = {
+        "$set": {"status": "completed", "response": {"status_code": 200, "body": jsonable_encoder(result)}},
+        "$unset": {"locked_until": ""}
+    }
+    for delay in (*COMPLETION_RETRY_DELAYS, None):
+        try:
+            await idempotency_collection.update_one({"_id": record_id}, update)
+            return
+        except PyMongoError as e:
+            if delay is None:
+                logger.error("Could not record idempotent response %s, a retry after the lock expires will run "
+                             "the request again: %s", record_id, e)
+                return
+            logger.warning("Recording idempotent response %s failed, retrying: %s", record_id, e)
+            await asyncio.sleep(delay)
+
+
+async def idempotent(request: Request, scope: str, payload: Any, handler: Callable[[], Awaitable[Any]]):
+    """Runs handler() at most once per Idempotency-Key and replays its response to retries.
+
+    Requests without the header run as before. The key is scoped to the
+    endpoint and the caller; reusing it with a different body is a 422, and
+    retrying while the first request is still running is a 409. Failed
+    requests release the key, so only successful responses are replayed.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters.")
+
+    user = request.state.user or {}
+    record_id = f"{scope}:{user.get('email') or user.get('id')}:{key}"
+
+    record = await _claim(record_id, _fingerprint(payload))
+    if record is not None:
+        return _replay(record)
+
+    heartbeat = asyncio.create_task(_keep_locked(record_id))
+    try:
+        try:
+            result = await handler()
+        except BaseException:
+            try:
+                await idempotency_collection.delete_one({"_id": record_id, "status": "in_progress"})
+            except PyMongoError as e:
+                logger.warning("Could not release idempotency key %s: %s", record_id, e)
+            raise
+
+        # The lock is still renewed while the response is being recorded
+        await _complete(record_id, result)
+    finally:
+        heartbeat.cancel()
+    return result
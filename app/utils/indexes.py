@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import sys
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.config import IDEMPOTENCY_TTL_SECONDS
+from app.db import db
+
+logger = logging.getLogger(__name__)
+
+# ───────────────────────── INDEX REGISTRY
+# Every hot query in app/services filters on store_id plus one of these keys.
+# Names are fixed so create_index is idempotent across restarts.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "SalesOrders": [
+        IndexModel([("store_id", ASCENDING), ("order_id", ASCENDING)], name="store_order_id", unique=True),
+        IndexModel([("store_id", ASCENDING), ("order_status", ASCENDING), ("order_date", ASCENDING)], name="store_status_order_date"),
+    ],
+    "Inventory": [
+        # One SKU per store; replaces the non-unique "store_product_id" (see REPLACED_INDEXES)
+        IndexModel([("store_id", ASCENDING), ("product_id", ASCENDING)], name="store_product_id_unique", unique=True),
+        IndexModel([("store_id", ASCENDING), ("product_name", ASCENDING)], name="store_product_name"),
+        IndexModel([("product_id", ASCENDING)], name="product_id"),
+        # Stock range queries (low stock); quantity is a stored int since the numeric migration
+        IndexModel([("store_id", ASCENDING), ("quantity", ASCENDING)], name="store_quantity"),
+    ],
+    "ReturnOrders": [
+        IndexModel([("store_id", ASCENDING), ("return_id", ASCENDING)], name="store_return_id", unique=True),
+        IndexModel([("store_id", ASCENDING), ("sent_to_procurement", ASCENDING)], name="store_sent_to_procurement"),
+        IndexModel([("store_id", ASCENDING), ("return_date_at", ASCENDING)], name="store_return_date_at"),
+    ],
+    "RequestedOrders": [
+        IndexModel([("request_id", ASCENDING)], name="request_id", unique=True),
+        IndexModel([("store_id", ASCENDING), ("request_id", ASCENDING)], name="store_request_id"),
+    ],
+    "Contracts": [
+        IndexModel([("store_id", ASCENDING), ("contract_id", ASCENDING)], name="store_contract_id", unique=True),
+        IndexModel([("store_id", ASCENDING), ("request_id", ASCENDING)], name="store_request_id"),
+        IndexModel([("store_id", ASCENDING), ("status", ASCENDING)], name="store_status"),
+        IndexModel([("store_id", ASCENDING), ("created_at", DESCENDING)], name="store_created_at"),
+    ],
+    "PurchaseOrders": [
+        IndexModel([("order_id", ASCENDING)], name="order_id"),
+        IndexModel([("contract_id", ASCENDING)], name="contract_id"),
+        IndexModel([("store_id", ASCENDING), ("validation_status", ASCENDING)], name="store_validation_status"),
+        # Procurement dashboard: per-store month buckets over BSON delivery dates
+        IndexModel([("store_id", ASCENDING), ("delivery_date_at", ASCENDING)], name="store_delivery_date_at"),
+    ],
+    "ReturnToVendor": [
+        IndexModel([("store_id", ASCENDING), ("return_id", ASCENDING)], name="store_return_id"),
+    ],
+    "LossOrders": [
+        IndexModel([("store_id", ASCENDING), ("org_id", ASCENDING)], name="store_org_id"),
+        IndexModel([("store_id", ASCENDING), ("product_id", ASCENDING)], name="store_product_id"),
+    ],
+    "Notifications": [
+        IndexModel([("receiver.id", ASCENDING), ("status", ASCENDING)], name="receiver_id_status"),
+        IndexModel([("receiver.email", ASCENDING), ("status", ASCENDING)], name="receiver_email_status"),
+        # Inbox pages: newest first per receiver, _id breaks created_at ties
+        IndexModel([("receiver.id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="receiver_id_created_at"),
+        IndexModel([("receiver.email", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="receiver_email_created_at"),
+    ],
+    "Users": [
+        IndexModel([("email", ASCENDING)], name="email", unique=True),
+        IndexModel([("id", ASCENDING)], name="id"),
+        IndexModel([("store_id", ASCENDING), ("role", ASCENDING)], name="store_role"),
+        # Covers the profile cache's version check
+        IndexModel([("email", ASCENDING), ("profile_version", ASCENDING)], name="email_profile_version"),
+    ],
+    "Stores": [
+        IndexModel([("store_id", ASCENDING)], name="store_id", unique=True),
+        IndexModel([("status", ASCENDING)], name="status"),
+        IndexModel([("store_id", ASCENDING), ("profile_version", ASCENDING)], name="store_id_profile_version"),
+    ],
+    "Categories": [
+        IndexModel([("category_id", ASCENDING)], name="category_id", unique=True),
+        IndexModel([("sub_categories.sub_category_id", ASCENDING)], name="sub_category_id"),
+    ],
+    "EmailOutbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_locked_until"),
+        # Sent mails are purged after a week; failed ones (params already removed) stay a month for inspection
+        IndexModel([("sent_at", ASCENDING)], name="sent_at_ttl", expireAfterSeconds=7 * 24 * 3600),
+        IndexModel([("failed_at", ASCENDING)], name="failed_at_ttl", expireAfterSeconds=30 * 24 * 3600),
+    ],
+    "IdempotencyKeys": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=IDEMPOTENCY_TTL_SECONDS),
+    ],
+}
+
+# Old index name -> the registry entry that supersedes it on the same keys. MongoDB refuses a
+# second index on identical keys, so the old one is dropped right before its replacement is built
+# (and only when existing data cannot block the build).
+REPLACED_INDEXES: Dict[str, Dict[str, str]] = {
+    "Inventory": {"store_product_id": "store_product_id_unique"},
+}
+
+# Duplicate key groups listed per blocked unique index
+MAX_REPORTED_DUPLICATES = 5
+
+# Representative shapes of the queries the services run, replayed through explain()
+QUERY_SHAPES = [
+    ("SalesOrders", {"store_id": "ST001", "order_status": "0"}, None),
+    ("SalesOrders", {"order_id": "ORD001", "store_id": "ST001"}, None),
+    ("Inventory", {"store_id": "ST001", "product_id": {"$in": ["P001", "P002"]}}, None),
+    ("Inventory", {"product_name": "Pen", "store_id": "ST001"}, None),
+    ("Inventory", {"product_id": "P001"}, None),
+    ("Inventory", {"store_id": "ST001", "quantity": {"$lt": 10}}, None),
+    ("ReturnOrders", {"store_id": "ST001", "sent_to_procurement": 0}, None),
+    ("ReturnOrders", {"return_id": "RET001", "store_id": "ST001"}, None),
+    ("RequestedOrders", {"store_id": "ST001"}, None),
+    ("Contracts", {"request_id": "REQ001", "store_id": "ST001"}, None),
+    ("Contracts", {"store_id": "ST001"}, [("created_at", DESCENDING)]),
+    ("PurchaseOrders", {"contract_id": "C001"}, None),
+    ("PurchaseOrders", {"store_id": "ST001", "validation_status": "Pending"}, None),
+    ("PurchaseOrders", {"store_id": "ST001"}, [("delivery_date_at", ASCENDING)]),
+    ("ReturnToVendor", {"store_id": "ST001", "return_id": "RV001"}, None),
+    ("LossOrders", {"store_id": "ST001", "org_id": "ORG001"}, None),
+    ("Notifications", {"$or": [{"receiver.id": "U001"}, {"receiver.email": "a@b.com"}]}, None),
+    ("Notifications", {"$or": [{"receiver.id": "U001"}, {"receiver.email": "a@b.com"}]}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("Users", {"email": "a@b.com"}, None),
+    ("Stores", {"store_id": "ST001"}, None),
+    ("Categories", {"category_id": "CAT001"}, None),
+    ("EmailOutbox", {"status": "pending", "next_attempt_at": {"$lte": 0}}, [("next_attempt_at", ASCENDING)]),
+]
+
+
+async def find_duplicates(collection_name: str, model: IndexModel, limit: int = MAX_REPORTED_DUPLICATES) -> List[dict]:
+    # Key groups that would stop a unique index from being built
+    fields = list(model.document["key"])
+    pipeline = [
+        {"$group": {"_id": {field.replace(".", "_"): f"${field}" for field in fields}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+    ]
+    return [
+        {**row["_id"], "count": row["count"]}
+        async for row in db[collection_name].aggregate(pipeline, allowDiskUse=True)
+    ]
+
+
+async def _replace_index(collection_name: str, old_name: str, model: IndexModel) -> bool:
+    # False while the old index has to stay (its replacement cannot be built yet)
+    collection = db[collection_name]
+    existing = {index["name"] async for index in collection.list_indexes()}
+    if old_name not in existing or model.document["name"] in existing:
+        return True
+
+    if model.document.get("unique"):
+        duplicates = await find_duplicates(collection_name, model)
+        if duplicates:
+            logger.error("Keeping %s.%s: %s needs these duplicates resolved first: %s",
+                         collection_name, old_name, model.document["name"], duplicates)
+            return False
+
+    await collection.drop_index(old_name)
+    try:
+        await collection.create_indexes([model])
+    except OperationFailure:
+        # e.g. a duplicate written since the check; put the old index back so queries keep one
+        await collection.create_indexes([IndexModel(list(model.document["key"].items()), name=old_name)])
+        raise
+    logger.info("Replaced index %s.%s with %s", collection_name, old_name, model.document["name"])
+    return True
+
+
+async def ensure_indexes():
+    # create_index is a no-op when an identical index exists, so this is safe on every startup
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        replaced = REPLACED_INDEXES.get(collection_name, {})
+        for model in models:
+            name = model.document["name"]
+            try:
+                blocked = False
+                for old_name in [old for old, new in replaced.items() if new == name]:
+                    blocked = blocked or not await _replace_index(collection_name, old_name, model)
+                if not blocked:
+                    await collection.create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicate data blocking a unique index - report it, don't block startup
+                logger.warning("Could not create index %s.%s: %s (see `python -m app.utils.indexes report`)",
+                               collection_name, name, e)
+
+
+async def index_report() -> Dict[str, list]:
+    missing = []
+    unused = []
+    # Missing unique indexes blocked by existing data, with the offending key groups
+    duplicates = []
+
+    for collection_name, models in INDEXES.items():
+        collection = db[collection_name]
+        existing = set()
+        async for index in collection.list_indexes():
+            existing.add(index["name"])
+
+        for model in models:
+            if model.document["name"] not in existing:
+                missing.append(f"{collection_name}.{model.document['name']}")
+                if model.document.get("unique"):
+                    groups = await find_duplicates(collection_name, model)
+                    if groups:
+                        duplicates.append({"index": f"{collection_name}.{model.document['name']}", "duplicates": groups})
+
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and stat.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append(f"{collection_name}.{stat['name']}")
+        except OperationFailure as e:
+            logger.warning("$indexStats not available for %s: %s", collection_name, e)
+
+    return {"missing": missing, "unused": unused, "duplicates": duplicates}
+
+
+def _find_stages(plan: dict, stage: str) -> bool:
+    if plan.get("stage") == stage:
+        return True
+    children = plan.get("inputStages", [])
+    if "inputStage" in plan:
+        children = children + [plan["inputStage"]]
+    return any(_find_stages(child, stage) for child in children)
+
+
+async def verify_query_plans() -> List[str]:
+    # Raises if any of the service query shapes still needs a collection scan
+    collscans = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        find_cmd = {"find": collection_name, "filter": query}
+        if sort:
+            find_cmd["sort"] = dict(sort)
+
+        explain = await db.command({"explain": find_cmd, "verbosity": "queryPlanner"})
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        # Newer servers nest the classic plan under queryPlan
+        winning_plan = winning_plan.get("queryPlan", winning_plan)
+
+        if _find_stages(winning_plan, "COLLSCAN"):
+            collscans.append(f"{collection_name} {query}")
+
+    if collscans:
+        raise RuntimeError(f"COLLSCAN detected for: {collscans}")
+    return collscans
+
+
+async def bootstrap_indexes(mode: str = ""):
+    await ensure_indexes()
+
+    if mode in ("report", "explain"):
+        report = await index_report()
+        if report["missing"]:
+            logger.warning("Missing indexes: %s", report["missing"])
+        for blocked in report["duplicates"]:
+            logger.warning("Unique index %s is blocked by duplicate keys: %s", blocked["index"], blocked["duplicates"])
+        if report["unused"]:
+            logger.info("Unused indexes since last restart: %s", report["unused"])
+
+    if mode == "explain":
+        await verify_query_plans()
+
+
+# python -m app.utils.indexes [report|explain]
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(bootstrap_indexes(sys.argv[1] if len(sys.argv) > 1 else "report"))
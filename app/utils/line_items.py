@@ -0,0 +1,60 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+from app.db import db
+from app.utils.numeric_fields import to_float, to_int
+
+
+@dataclass(frozen=True)
+class LineItem:
+    """Price, tax, stock and returnability of one SKU in one store, with the raw Inventory row."""
+
+    product_id: str
+    inventory_item: dict
+    unit_price: Optional[float]  # None when the stored price is not a number
+    tax: float
+    quantity: int
+    is_consumer_returnable: bool = False
+    consumer_return_conditions: List[str] = field(default_factory=list)
+    is_seller_returnable: bool = False
+    seller_return_conditions: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_inventory(cls, doc: dict) -> "LineItem":
+        return cls(
+            product_id=doc["product_id"],
+            inventory_item=doc,
+            unit_price=to_float(doc.get("unit_price"), None),
+            tax=to_float(doc.get("tax", 0)),
+            quantity=to_int(doc.get("quantity", 0)),
+            is_consumer_returnable=bool(doc.get("is_consumer_returnable", False)),
+            consumer_return_conditions=doc.get("consumer_return_conditions") or [],
+            is_seller_returnable=bool(doc.get("is_seller_returnable", False)),
+            seller_return_conditions=doc.get("seller_return_conditions") or [],
+        )
+
+
+async def resolve_line_items(product_ids: Iterable[str], store_id: str) -> Dict[str, LineItem]:
+    # One Inventory query for every SKU of an order, always scoped to the store
+    ids = list(dict.fromkeys(pid for pid in product_ids if pid))
+    if not ids:
+        return {}
+
+    items: Dict[str, LineItem] = {}
+    cursor = db.Inventory.find({"store_id": store_id, "product_id": {"$in": ids}}, {"_id": 0})
+    async for doc in cursor:
+        # Keep the first match, same as find_one did
+        items.setdefault(doc["product_id"], LineItem.from_inventory(doc))
+    return items
+
+
+def require_priced_item(items: Dict[str, LineItem], product_id: str) -> LineItem:
+    item = items.get(product_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found in inventory.")
+    if item.unit_price is None:
+        raise HTTPException(status_code=500, detail=f"Invalid unit price for product ID {product_id}.")
+    return item
+
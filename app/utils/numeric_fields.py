@@ -0,0 +1,53 @@
+from typing import Optional
+
+from fastapi import HTTPException
+
+# Stored type of every numeric field, per collection. Writers pass their documents
+# through typed_doc() so these are always BSON int / double, never strings.
+NUMERIC_FIELDS = {
+    "Inventory": {
+        "quantity": int, "unit_price": float, "tax": float, "warranty_tenure": int,
+        "reorder_point": int, "reorder_quantity": int,
+    },
+    "LossOrders": {"quantity_lost": int, "unit_price": float},
+}
+
+
+def parse_number(value, kind: type):
+    # None when the value is not a number of that kind ("12" -> 12, "12.0" -> 12, "12.5" -> None for int)
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value.strip() if isinstance(value, str) else value)
+    except (ValueError, TypeError):
+        return None
+    if number != number or number in (float("inf"), float("-inf")):
+        return None
+    if kind is int:
+        return int(number) if number.is_integer() else None
+    return number
+
+
+def to_int(value, default: int = 0) -> int:
+    number = parse_number(value, int)
+    return default if number is None else number
+
+
+def to_float(value, default: Optional[float] = 0.0) -> Optional[float]:
+    number = parse_number(value, float)
+    return default if number is None else number
+
+
+def typed_doc(collection_name: str, doc: dict) -> dict:
+    # Returns a copy of doc with its numeric fields converted; None values are left alone
+    typed = dict(doc)
+    for field, kind in NUMERIC_FIELDS[collection_name].items():
+        value = typed.get(field)
+        if value is None:
+            continue
+        number = parse_number(value, kind)
+        if number is None:
+            expected = "a whole number" if kind is int else "a number"
+            raise HTTPException(status_code=422, detail=f"'{field}' must be {expected}, got {value!r}")
+        typed[field] = number
+    return typed
@@ -0,0 +1,168 @@
+import base64
+import re
+from typing import Iterable, List, Optional, Sequence
+
+from bson import json_util
+from fastapi import HTTPException, Query, Response
+from pymongo import ASCENDING, DESCENDING
+
+from app.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+FIELD_NAME = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+MAX_FIELDS = 50
+
+
+def encode_cursor(values: dict) -> str:
+    # json_util keeps datetimes and ObjectIds typed across the round trip
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _top_level(field: str) -> str:
+    return field.split(".", 1)[0]
+
+
+class Page:
+    """Keyset pagination, sort and sparse fieldsets for list routes.
+
+    Used as a dependency (`page: Page = Depends()`): reads ?limit=, ?cursor=,
+    ?sort=[-]field and ?fields=a,b. The next page's cursor is sent in the
+    X-Next-Cursor header, so response bodies keep their existing shape.
+    Rows are ordered by the sort field and then by _id, so a cursor is
+    always a unique position.
+
+    Paging is opt-in: without ?limit= or ?cursor= the full list is returned,
+    as before, so existing clients that never read the header lose nothing.
+    """
+
+    def __init__(
+        self,
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=PAGE_SIZE_MAX),
+        cursor: Optional[str] = Query(None),
+        sort: Optional[str] = Query(None, description="Field to sort by; prefix with - for descending"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return")
+    ):
+        self.response = response
+        self.cursor = cursor
+        # A cursor without a limit continues with the default page size
+        self.limit = limit or (PAGE_SIZE_DEFAULT if cursor else None)
+        self.sort = sort
+        self.fields = self._parse_fields(fields)
+        self.next_cursor: Optional[str] = None
+
+    @staticmethod
+    def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+        if not fields:
+            return None
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        if len(names) > MAX_FIELDS or not all(FIELD_NAME.match(name) for name in names):
+            raise HTTPException(status_code=400, detail="Invalid fields parameter")
+        return names
+
+    def _sort_spec(self, sort_fields: Sequence[str], default_sort: str):
+        sort = self.sort or default_sort
+        key = sort.lstrip("-")
+        if key != "_id" and key not in sort_fields:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by '{key}'. Allowed: {', '.join(['_id', *sort_fields])}")
+        return key, DESCENDING if sort.startswith("-") else ASCENDING
+
+    def _projection(self, projection: Optional[dict], required: Iterable[str], sort_key: str) -> Optional[dict]:
+        if self.fields:
+            # _id is included by default; it anchors the cursor and is stripped afterwards if hidden
+            return {field: 1 for field in {*self.fields, *required, sort_key}}
+        if projection:
+            return {k: v for k, v in projection.items() if k != "_id"} or None
+        return None
+
+    def _after(self, sort_key: str, direction: int) -> dict:
+        values = decode_cursor(self.cursor)
+        if values.get("s") != f"{'-' if direction == DESCENDING else ''}{sort_key}" or "id" not in values:
+            raise HTTPException(status_code=400, detail="Cursor does not match the requested sort")
+
+        op = "$lt" if direction == DESCENDING else "$gt"
+        if sort_key == "_id":
+            return {"_id": {op: values["id"]}}
+
+        last = values.get("v")
+        if last is None:
+            # Missing values sort first ascending / last descending
+            after = [{sort_key: None, "_id": {op: values["id"]}}]
+            if direction == ASCENDING:
+                after.append({sort_key: {"$ne": None}})
+            return {"$or": after}
+
+        after = [{sort_key: {op: last}}, {sort_key: last, "_id": {op: values["id"]}}]
+        if direction == DESCENDING:
+            after.append({sort_key: None})
+        return {"$or": after}
+
+    async def find(
+        self,
+        collection,
+        query: dict,
+        projection: Optional[dict] = None,
+        sort_fields: Sequence[str] = (),
+        default_sort: str = "_id",
+        required: Iterable[str] = ()
+    ) -> List[dict]:
+        """One page of `collection.find(query, projection)`.
+
+        `required` lists fields the caller needs for post-processing even when
+        ?fields= does not ask for them; trim them off with shape().
+        """
+        sort_key, direction = self._sort_spec(sort_fields, default_sort)
+        if self.cursor:
+            query = {"$and": [query, self._after(sort_key, direction)]}
+
+        sort = [("_id", direction)] if sort_key == "_id" else [(sort_key, direction), ("_id", direction)]
+        cursor = collection.find(query, self._projection(projection, required, sort_key)).sort(sort)
+        if self.limit is None:
+            docs = await cursor.to_list(length=None)
+        else:
+            docs = await cursor.limit(self.limit + 1).to_list(length=self.limit + 1)
+
+        self.next_cursor = None
+        if self.limit is not None and len(docs) > self.limit:
+            docs = docs[:self.limit]
+            last = docs[-1]
+            self.next_cursor = encode_cursor({
+                "s": f"{'-' if direction == DESCENDING else ''}{sort_key}",
+                "v": last.get(sort_key) if sort_key != "_id" else None,
+                "id": last["_id"]
+            })
+            self.response.headers[NEXT_CURSOR_HEADER] = self.next_cursor
+
+        hide_id = (projection or {}).get("_id") == 0 or (self.fields is not None and "_id" not in self.fields)
+        if hide_id:
+            for doc in docs:
+                doc.pop("_id", None)
+        return docs
+
+    def shape(self, doc: dict) -> dict:
+        # Apply ?fields= after post-processing, so derived fields (e.g. status) can be requested too
+        if not self.fields:
+            return doc
+        wanted = {_top_level(field) for field in self.fields}
+        return {key: value for key, value in doc.items() if key in wanted}
+
+
+async def find_page(page: Optional[Page], collection, query: dict, projection: Optional[dict] = None, **options) -> List[dict]:
+    # Internal callers pass no page and keep getting the full list
+    if page is None:
+        return await collection.find(query, projection).to_list(length=None)
+    return await page.find(collection, query, projection, **options)
+
+
+def shape_row(page: Optional[Page], doc: dict) -> dict:
+    return page.shape(doc) if page is not None else doc
@@ -0,0 +1,76 @@
+import copy
+import time
+from typing import Hashable, Optional
+
+from app.config import PROFILE_CACHE_REVALIDATE_SECONDS, PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS
+from app.db import db
+from app.utils.cache import TTLCache
+
+# Bumped with $inc on every write to a cached profile, so other workers can tell their copy is stale
+VERSION_FIELD = "profile_version"
+VERSION_BUMP = {VERSION_FIELD: 1}
+
+
+class ProfileCache:
+    """Process-local cache of profile documents (Users, Stores) keyed by their lookup field.
+
+    Writers in this worker call invalidate(). Writers in other workers only
+    bump profile_version, so an entry older than PROFILE_CACHE_REVALIDATE_SECONDS
+    is checked against the stored version (an indexed, version-only read)
+    before it is served again.
+    """
+
+    def __init__(self, collection_name: str, key_field: str, projection: dict):
+        self.collection_name = collection_name
+        self.key_field = key_field
+        self.projection = projection
+        self._entries = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL_SECONDS)
+
+    def _serve(self, entry: dict) -> dict:
+        # Callers decorate the result; never hand out the cached object itself
+        doc = copy.deepcopy(entry["doc"])
+        doc.pop(VERSION_FIELD, None)
+        return doc
+
+    async def get(self, key: Hashable) -> Optional[dict]:
+        collection = db[self.collection_name]
+        now = time.monotonic()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry["checked_at"] < PROFILE_CACHE_REVALIDATE_SECONDS:
+                return self._serve(entry)
+
+            current = await collection.find_one({self.key_field: key}, {"_id": 0, VERSION_FIELD: 1})
+            if current is None:
+                self._entries.pop(key)
+                return None
+            if current.get(VERSION_FIELD, 0) == entry["version"]:
+                entry["checked_at"] = now
+                return self._serve(entry)
+
+        doc = await collection.find_one({self.key_field: key}, self.projection)
+        if doc is None:
+            self._entries.pop(key)
+            return None
+
+        entry = {"doc": doc, "version": doc.get(VERSION_FIELD, 0), "checked_at": now}
+        self._entries.set(key, entry)
+        return self._serve(entry)
+
+    def invalidate(self, key: Hashable):
+        self._entries.pop(key)
+
+    def invalidate_where(self, field: str, value):
+        # For writes addressed by a secondary field (e.g. Users.id); the cache is small, a scan is fine
+        for key in self._entries.keys():
+            entry = self._entries.get(key)
+            if entry is not None and entry["doc"].get(field) == value:
+                self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+
+
+user_profiles = ProfileCache("Users", "email", {"_id": 0, "password": 0})
+store_profiles = ProfileCache("Stores", "store_id", {"_id": 0})
@@ -1,23 +1,10 @@
-import re
 from fastapi import HTTPException
 from app.db import db  # Adjust import if your db connection is elsewhere
+from app.utils.id_sequence import next_id
+from app.utils.line_items import resolve_line_items
 
 async def generate_order_id():
-    last_order = await db.SalesOrders.find_one(
-        {"order_id": {"$regex": "^ORD\\d{3}$"}},{"_id": 0},
-        sort=[("order_id", -1)]
-    )
-
-    if last_order and last_order.get("order_id", "").startswith("ORD"):
-        try:
-            last_number = int(last_order["order_id"][3:])
-            new_number = last_number + 1
-        except ValueError:
-            new_number = 1
-    else:
-        new_number = 1
-
-    return f"ORD{new_number:03d}"
+    return await next_id(db.SalesOrders, "order_id", "ORD")
 
 def build_product_detail(inventory_item: dict, product_id: str, unit_price: float,
                          product_tax: float, order_quantity: int, inventory_quantity: int):
@@ -39,43 +26,14 @@ def build_product_detail(inventory_item: dict, product_id: str, unit_price: floa
 
 
 # -----------------------------------------
-# Function to generate sequential customer_id starting from CUT001
+# Function to generate sequential customer_id starting from CUST001
 # -----------------------------------------
 async def generate_customer_id():
-    # Find the last customer_id starting with CUT
-    last_order = await db.SalesOrders.find_one(
-        {"customer_id": {"$regex": "^CUST"}},
-        sort=[("customer_id", -1)]
-    )
-    
-    if last_order and "customer_id" in last_order:
-        # Extract numeric part
-        match = re.search(r"CUST(\d+)", last_order["customer_id"])
-        if match:
-            next_num = int(match.group(1)) + 1
-        else:
-            next_num = 1
-    else:
-        next_num = 1
-
-    return f"CUST{str(next_num).zfill(3)}"
+    return await next_id(db.SalesOrders, "customer_id", "CUST")
 
 
 async def generate_request_id():
-    last_request = await db.RequestedOrders.find_one(
-        {"request_id": {"$regex": "^REQ\\d{3}$"}},{"_id": 0},
-        sort=[("request_id", -1)]
-    )
-    if last_request and last_request.get("request_id", "").startswith("REQ"):
-        try:
-            last_number = int(last_request["request_id"][3:])
-            new_number = last_number + 1
-        except ValueError:
-            new_number = 1
-    else:
-        new_number = 1
-
-    return f"REQ{new_number:03d}"
+    return await next_id(db.RequestedOrders, "request_id", "REQ")
 
 
 def parse_status_string(status: str) -> str:
@@ -88,50 +46,54 @@ def parse_status_string(status: str) -> str:
 def parse_return_status(status: int) -> str:
     return "return" if status == 0 else "procurement"
 
-async def fetch_inventory_details(product_id: str, store_id: str):
-    inventory_item = await db.Inventory.find_one({
-        "product_id": product_id,
-        "store_id": store_id
-    }, {"_id": 0})
+# --- Helper to resolve Stock-in / Stock-out for every product line of many orders ---
+async def attach_product_status(orders: list, store_id: str):
+    # Collect every product_id across the result set so inventory is read once
+    product_ids = {
+        product.get("product_id")
+        for order in orders
+        for product in order.get("products", [])
+        if product.get("product_id")
+    }
 
-    if not inventory_item:
-        raise HTTPException(status_code=404, detail=f"Product with ID {product_id} not found in inventory.")
+    stock = {}
+    if product_ids:
+        cursor = db.Inventory.find(
+            {"store_id": store_id, "product_id": {"$in": list(product_ids)}},
+            {"_id": 0, "product_id": 1, "quantity": 1}
+        )
+        async for item in cursor:
+            # Keep the first match, same as find_one did
+            stock.setdefault(item["product_id"], item.get("quantity", 0))
 
-    try:
-        unit_price = float(inventory_item["unit_price"])
-    except (ValueError, TypeError, KeyError):
-        raise HTTPException(status_code=500, detail=f"Invalid unit price for product ID {product_id}.")
+    for order in orders:
+        for product in order.get("products", []):
+            ordered_quantity = int(product.get("order_quantity", 0))
 
-    try:
-        product_tax = float(inventory_item.get("tax", 0))
-    except (ValueError, TypeError):
-        product_tax = 0
+            try:
+                inventory_quantity = int(stock.get(product.get("product_id"), 0))
+            except (ValueError, TypeError):
+                inventory_quantity = 0
 
-    inventory_quantity = int(inventory_item.get("quantity", 0)) if inventory_item else 0
+            # Compare and determine product_status
+            product["product_status"] = "Stock-out" if inventory_quantity < ordered_quantity else "Stock-in"
 
-    return {
-        "inventory_item": inventory_item,
-        "unit_price": unit_price,
-        "product_tax": product_tax,
-        "inventory_quantity": inventory_quantity
-    }
+    return orders
 
 # --- Helper function to generate new return_id ---
 async def generate_return_id():
-    latest = await db.ReturnOrders.find_one({},{"_id": 0}, sort=[("return_id", -1)])
-    if latest and "return_id" in latest:
-        last_num = int(latest["return_id"].replace("RET", ""))
-        return f"RET{last_num + 1:03d}"
-    else:
-        return "RET001"
+    return await next_id(db.ReturnOrders, "return_id", "RET")
     
 # --- Helper function to enrich products and calculate total returned amount ---
-async def enrich_products(products: list, return_quantity: int, reason: str):
+async def enrich_products(products: list, return_quantity: int, reason: str, store_id: str):
     print("Incoming products:", products)
     enriched_products = []
     skipped_products = []  # Track products that are skipped
     total_amount = 0.0
 
+    # Returnability of every line in one query, from this store's inventory only
+    items = await resolve_line_items((product.get("product_id") for product in products), store_id)
+
     for product in products:
         product_id = product.get("product_id")
         product_name = product.get("product_name")
@@ -145,17 +107,16 @@ async def enrich_products(products: list, return_quantity: int, reason: str):
             })
             continue
 
-        # Fetch additional inventory info
-        inventory = await db.Inventory.find_one({"product_id": product_id}, {"_id": 0})
-        if not inventory:
+        item = items.get(product_id)
+        if not item:
             skipped_products.append({
                 "product_id": product_id,
                 "reason": "Product not found in Inventory"
             })
             continue
 
-        is_customer_returnable = inventory.get("is_consumer_returnable", False)
-        consumer_conditions = inventory.get("consumer_return_conditions", [])
+        is_customer_returnable = item.is_consumer_returnable
+        consumer_conditions = item.consumer_return_conditions
 
         print(f"Checking {product_id}: is_customer_returnable={is_customer_returnable}, conditions={consumer_conditions}, reason={reason}")
 
@@ -195,8 +156,8 @@ async def enrich_products(products: list, return_quantity: int, reason: str):
             "tax": tax,
             "is_customer_returnable": is_customer_returnable,
             "consumer_return_conditions": consumer_conditions,
-            "is_seller_returnable": inventory.get("is_seller_returnable", False),
-            "seller_return_conditions": inventory.get("seller_return_conditions", [])
+            "is_seller_returnable": item.is_seller_returnable,
+            "seller_return_conditions": item.seller_return_conditions
         })
 
     print("Enriched Products:", enriched_products)
@@ -0,0 +1,100 @@
+"""Per-request overhead of the JWT auth middleware.
+
+Drives the ASGI app directly (no sockets) so only the middleware cost is
+measured. Compares no auth, the previous BaseHTTPMiddleware version and
+the pure ASGI middleware with a cold and a warm token cache.
+
+Run from the repository root (so `app` is importable):
+
+    DATABASE_NAME=x MONGO_URI=mongodb://localhost SECRET_KEY=bench ALGORITHM=HS256 \
+        python -m benchmarks.jwt_middleware_bench [requests]
+
+or `PYTHONPATH=. python benchmarks/jwt_middleware_bench.py [requests]` with the
+same variables. SECRET_KEY and ALGORITHM are required to sign and verify the
+test tokens; DATABASE_NAME and MONGO_URI only need to be set, no server is
+contacted. A .env file in the repository root is picked up as well.
+"""
+import asyncio
+import sys
+import time
+
+from fastapi import FastAPI, HTTPException, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.middlewares import jwt_middleware
+from app.middlewares.jwt_middleware import JWTAuthMiddleware
+from app.utils.auth import create_access_token, decode_token
+
+
+class LegacyJWTAuthMiddleware(BaseHTTPMiddleware):
+    # The BaseHTTPMiddleware implementation this benchmark replaced
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path in ["/", "/docs", "/openapi.json", "/redoc"] or "/login" in request.url.path:
+            return await call_next(request)
+        token = request.headers.get("Authorization")
+        if not token or not token.startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="Token missing or invalid.")
+        request.state.user = decode_token(token.split(" ")[1])
+        return await call_next(request)
+
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/admin/ping")
+    async def ping(request: Request):
+        return {"user": request.state.user.get("email") if hasattr(request.state, "user") else None}
+
+    if middleware:
+        app.add_middleware(middleware)
+    return app
+
+
+async def run(app, token: str, requests: int) -> float:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/admin/ping", "raw_path": b"/api/admin/ping", "root_path": "",
+        "query_string": b"", "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start" and message["status"] != 200:
+            raise RuntimeError(f"unexpected status {message['status']}")
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+async def main(requests: int):
+    token = create_access_token({"email": "bench@example.com", "id": "U1", "role": "admin", "store_id": "ST001"})
+
+    baseline = await run(build_app(), token, requests)
+    legacy = await run(build_app(LegacyJWTAuthMiddleware), token, requests)
+
+    cold_app = build_app(JWTAuthMiddleware)
+    cold = 0.0
+    for _ in range(requests):
+        jwt_middleware._token_cache.clear()
+        cold += await run(cold_app, token, 1)
+    cold /= requests
+
+    warm = await run(build_app(JWTAuthMiddleware), token, requests)
+
+    print(f"{requests} requests, microseconds per request (overhead vs no auth)")
+    for label, value in (
+        ("no auth", baseline),
+        ("BaseHTTPMiddleware", legacy),
+        ("ASGI, cold cache", cold),
+        ("ASGI, cached token", warm),
+    ):
+        print(f"  {label:<20} {value:8.1f}  (+{value - baseline:.1f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
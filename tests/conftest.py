@@ -0,0 +1,7 @@
+import os
+
+# app.config reads these at import time; tests never open a real Mongo or SMTP connection
+os.environ.setdefault("DATABASE_NAME", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
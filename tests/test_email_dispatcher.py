@@ -0,0 +1,181 @@
+import asyncio
+import copy
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.config import EMAIL_MAX_ATTEMPTS, EMAIL_RETRY_BASE_SECONDS
+from app.utils import email_outbox, email_utils
+from app.utils.email_outbox import EmailDispatcher, enqueue_email
+from app.utils.email_utils import MemoryConnection
+
+
+class FakeOutbox:
+    """Just enough of a Motor collection for the outbox: equality, $lte and $or filters, $set/$unset/$inc."""
+
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        for field, condition in query.items():
+            if field == "$or":
+                if not any(self._matches(doc, branch) for branch in condition):
+                    return False
+            elif isinstance(condition, dict) and "$lte" in condition:
+                if doc.get(field) is None or doc[field] > condition["$lte"]:
+                    return False
+            elif doc.get(field) != condition:
+                return False
+        return True
+
+    def _apply(self, doc, update):
+        doc.update(update.get("$set", {}))
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+
+    async def insert_one(self, doc):
+        doc = {"_id": ObjectId(), **doc}
+        self.docs[doc["_id"]] = doc
+
+        class Result:
+            inserted_id = doc["_id"]
+        return Result()
+
+    async def find_one_and_update(self, query, update, sort=None, return_document=None):
+        candidates = [doc for doc in self.docs.values() if self._matches(doc, query)]
+        if sort:
+            field, _ = sort[0]
+            candidates.sort(key=lambda doc: doc.get(field) or datetime.min)
+        if not candidates:
+            return None
+        self._apply(candidates[0], update)
+        return copy.deepcopy(candidates[0])
+
+    async def update_one(self, query, update):
+        for doc in self.docs.values():
+            if self._matches(doc, query):
+                self._apply(doc, update)
+                return
+
+    def only(self):
+        (doc,) = self.docs.values()
+        return doc
+
+
+class FlakyConnection(MemoryConnection):
+    """Fails the first `failures` sends, then delivers like MemoryConnection."""
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def send(self, msg):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("mail server unavailable")
+        super().send(msg)
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    fake = FakeOutbox()
+    monkeypatch.setattr(email_outbox, "outbox_collection", fake)
+    monkeypatch.setattr(email_utils, "EMAIL_BACKEND", "memory")
+    monkeypatch.setattr(MemoryConnection, "sent_messages", [])
+    return fake
+
+
+async def _claim_and_deliver(dispatcher, connection):
+    job = await dispatcher._claim()
+    assert job is not None
+    await dispatcher._deliver(connection, job)
+
+
+def _html_body(msg) -> str:
+    return next(part.get_payload(decode=True).decode() for part in msg.walk() if part.get_content_type() == "text/html")
+
+
+def test_delivers_queued_email_and_drops_params(outbox, monkeypatch):
+    async def run():
+        dispatcher = EmailDispatcher(workers=1)
+        # enqueue_email wakes the module-level dispatcher
+        monkeypatch.setattr(email_outbox, "email_dispatcher", dispatcher)
+        dispatcher.start()
+        try:
+            await asyncio.sleep(0)  # let the worker find the outbox empty and go idle
+            await enqueue_email("welcome", "new.user@example.com", password="s3cret")
+            for _ in range(100):
+                if outbox.only()["status"] == "sent":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await dispatcher.stop()
+
+    asyncio.run(run())
+
+    job = outbox.only()
+    assert job["status"] == "sent"
+    assert job["attempts"] == 1
+    assert "params" not in job and "locked_until" not in job
+    (msg,) = MemoryConnection.sent_messages
+    assert msg["To"] == "new.user@example.com"
+    assert "s3cret" in _html_body(msg)
+
+
+def test_failed_send_is_retried_with_exponential_backoff(outbox):
+    async def run():
+        dispatcher = EmailDispatcher(workers=1)
+        connection = FlakyConnection(failures=2)
+        await enqueue_email("welcome", "new.user@example.com", password="s3cret")
+
+        delays = []
+        for _ in range(2):
+            before = datetime.utcnow()
+            await _claim_and_deliver(dispatcher, connection)
+            job = outbox.only()
+            assert job["status"] == "pending"
+            assert job["last_error"] == "mail server unavailable"
+            assert job["params"] == {"password": "s3cret"}
+            delays.append((job["next_attempt_at"] - before).total_seconds())
+
+            # Not due yet: nothing to claim until the backoff has passed
+            assert await dispatcher._claim() is None
+            job["next_attempt_at"] = datetime.utcnow() - timedelta(seconds=1)
+
+        await _claim_and_deliver(dispatcher, connection)
+        return delays
+
+    delays = asyncio.run(run())
+    assert delays[0] == pytest.approx(EMAIL_RETRY_BASE_SECONDS, abs=1)
+    assert delays[1] == pytest.approx(2 * EMAIL_RETRY_BASE_SECONDS, abs=1)
+
+    job = outbox.only()
+    assert job["status"] == "sent"
+    assert job["attempts"] == 3
+    assert len(MemoryConnection.sent_messages) == 1
+
+
+def test_gives_up_after_max_attempts_and_scrubs_params(outbox):
+    async def run():
+        dispatcher = EmailDispatcher(workers=1)
+        connection = FlakyConnection(failures=EMAIL_MAX_ATTEMPTS)
+        await enqueue_email("welcome", "new.user@example.com", password="s3cret")
+
+        for _ in range(EMAIL_MAX_ATTEMPTS):
+            outbox.only()["next_attempt_at"] = datetime.utcnow() - timedelta(seconds=1)
+            await _claim_and_deliver(dispatcher, connection)
+
+        # Terminal: never claimed again
+        outbox.only()["next_attempt_at"] = datetime.utcnow() - timedelta(seconds=1)
+        assert await dispatcher._claim() is None
+
+    asyncio.run(run())
+
+    job = outbox.only()
+    assert job["status"] == "failed"
+    assert job["attempts"] == EMAIL_MAX_ATTEMPTS
+    assert isinstance(job["failed_at"], datetime)
+    assert "params" not in job and "locked_until" not in job
+    assert MemoryConnection.sent_messages == []